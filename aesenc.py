@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+"""Headless entry point: `python aesenc.py encrypt|decrypt|verify ...` (see backend/cli.py)."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend.cli import main
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,40 +1,244 @@
-from flask import Flask, request, jsonify, send_file
-from .crypto_utils import encrypt_file, decrypt_file, log_event 
+from cryptography.exceptions import InvalidTag
+from flask import Flask, Response, g, request, jsonify, send_file, stream_with_context
+from werkzeug.datastructures import ContentRange
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+from . import metrics
+from .crypto_utils import (encrypt_file, decrypt_file, log_event, open_container, iter_plaintext_range,
+                           encrypt_stream, decrypt_stream, rekey)
+from .ciphers import resolve_cipher
+from .compression import CompressionOptions
+from .container import CIPHER_NAMES
+from .verify import STATUS_CORRUPTED, inspect_file, verify_file
+from .batch import batch_size, decrypt_directory, encrypt_directory, ENCRYPTED_SUFFIX
+from .jobs import JobManager, QueueFull, SUCCEEDED, remove_quietly
+from .resumable import UploadConflict, UploadManager
 import os
+import threading
+import time
+import uuid
 
 app = Flask(__name__)
-UPLOAD_FOLDER = "uploads"
+UPLOAD_FOLDER = os.path.abspath("uploads")  # send_file resolves relative paths against the app package, not the cwd
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+jobs = JobManager()
+uploads = UploadManager(UPLOAD_FOLDER)
+
+STREAM_MIMETYPE = 'application/octet-stream'
+SEND_BLOCK_SIZE = 1024 * 1024
+_draining = threading.Event()
+
+def start_draining():
+    """Fails /readyz and refuses new jobs, so traffic moves elsewhere before a shutdown."""
+    _draining.set()
+    jobs.close()
+
+def upload_path(name):
+    """Resolves a client-supplied path inside the uploads folder; raises ValueError if it would escape."""
+    path = safe_join(UPLOAD_FOLDER, name)
+    if path is None:
+        raise ValueError(f"Path must stay inside the uploads folder: {name}")
+    return path
+
+def scratch_path(filename):
+    """A fresh path in the uploads folder for a file received from a client."""
+    return os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}_{secure_filename(filename) or 'upload'}")
+
+def remove_all(paths):
+    for path in paths:
+        remove_quietly(path)
+
+def send_temporary(path, download_name, temporary):
+    """Sends a file as an attachment, then deletes the request's temporary files (even if the client hangs up)."""
+    def generate():
+        try:
+            with open(path, 'rb') as f:
+                while True:
+                    block = f.read(SEND_BLOCK_SIZE)
+                    if not block:
+                        break
+                    yield block
+        finally:
+            remove_all(temporary)
+
+    response = Response(generate(), mimetype=STREAM_MIMETYPE,
+                        headers={'Content-Disposition': f'attachment; filename="{download_name}"'})
+    response.content_length = os.path.getsize(path)
+    return response
+
+def decrypted_name(filename, extension):
+    """Download name of a decrypted file: "report.txt.enc" becomes "report.txt", as in batch.py."""
+    if filename.endswith(ENCRYPTED_SUFFIX):
+        filename = filename[:-len(ENCRYPTED_SUFFIX)]
+    return os.path.splitext(filename)[0] + extension
+
+def _endpoint_label():
+    """The matched route pattern, so per-file URLs share one metrics series."""
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+@app.before_request
+def start_request_timer():
+    if metrics.enabled():
+        g.request_start = time.perf_counter()
+        if request.content_length:
+            metrics.HTTP_REQUEST_BYTES.observe(request.content_length, request.method, _endpoint_label())
+
+@app.after_request
+def record_request_time(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - start, request.method, _endpoint_label(),
+                                     str(response.status_code))
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Stage timings, operation sizes and throughput, and request latency for Prometheus."""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/healthz', methods=['GET'])
+def health_endpoint():
+    """Liveness probe: the process is up and answering requests."""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz', methods=['GET'])
+def readiness_endpoint():
+    """Readiness probe: 200 while new work is accepted, 503 while draining or the uploads folder is unwritable."""
+    status = 'ready'
+    if _draining.is_set():
+        status = 'draining'
+    elif not os.access(UPLOAD_FOLDER, os.W_OK):
+        status = 'uploads folder not writable'
+    body = {'status': status, 'jobs_active': jobs.active_count()}
+    return jsonify(body), 200 if status == 'ready' else 503
+
+def stream_response(pieces, event_type, filename, download_name):
+    """Wraps a generator of output pieces in a streaming response.
+
+    The first piece is produced before the response starts, so setup errors
+    (bad password, bad header) still become a 400. The event is logged once the
+    stream completes or fails.
+    """
+    try:
+        first = next(pieces, b"")
+    except ValueError as e:
+        log_event(event_type, filename, f"FAILED - {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        try:
+            yield first
+            yield from pieces
+        except Exception as e:
+            log_event(event_type, filename, f"FAILED - {str(e)}")
+            raise
+        log_event(event_type, filename, "SUCCESS", "(streamed)")
+
+    return Response(stream_with_context(generate()), mimetype=STREAM_MIMETYPE,
+                    headers={'Content-Disposition': f'attachment; filename="{download_name}"'})
+
+def compression_options(mode, level):
+    """Builds CompressionOptions from request values; None when compression is not requested.
+
+    Raises ValueError for an unknown mode or a bad level.
+    """
+    if not mode:
+        return None
+    return CompressionOptions(mode, level=int(level) if level else None).resolved()
+
+def encrypt_stream_endpoint():
+    """Encrypts a raw request body on the fly, without temporary files.
+
+    The password comes in the X-Password header and the original file name in
+    X-Filename (used for the stored extension). X-Compression ("auto", "always"
+    or "off") and X-Compression-Level enable compression before encryption.
+    X-Cipher picks the cipher (see backend/ciphers.py).
+    """
+    password = request.headers.get('X-Password')
+    filename = os.path.basename(request.headers.get('X-Filename', 'upload'))
+    if not password:
+        return jsonify({'error': 'Missing password'}), 400
+    try:
+        compression = compression_options(request.headers.get('X-Compression'),
+                                          request.headers.get('X-Compression-Level'))
+        pieces = encrypt_stream(request.stream, password, os.path.splitext(filename)[1].encode(),
+                                size_hint=request.content_length, compression=compression,
+                                cipher=request.headers.get('X-Cipher'))
+    except ValueError as e:
+        log_event("ENCRYPTION", filename, f"FAILED - {str(e)}")
+        return jsonify({'error': str(e)}), 400
+    return stream_response(pieces, "ENCRYPTION", filename, filename + ".enc")
+
+def decrypt_stream_body_endpoint():
+    """Decrypts a raw request body on the fly, without temporary files."""
+    password = request.headers.get('X-Password')
+    filename = os.path.basename(request.headers.get('X-Filename', 'upload.enc'))
+    if not password:
+        return jsonify({'error': 'Missing password'}), 400
+    try:
+        header, pieces = decrypt_stream(request.stream, password)
+    except ValueError as e:
+        log_event("DECRYPTION", filename, f"FAILED - {str(e)}")
+        return jsonify({'error': str(e)}), 400
+    download_name = decrypted_name(filename, header.extension.decode())
+    return stream_response(pieces, "DECRYPTION", filename, download_name)
 
 @app.route('/encrypt', methods=['POST'])
 def encrypt_endpoint():
-    """Handles file encryption request."""
+    """Handles file encryption request.
+
+    A raw application/octet-stream body is encrypted in streaming mode; a
+    multipart upload goes through the uploads folder.
+    """
+    if request.mimetype == STREAM_MIMETYPE:
+        return encrypt_stream_endpoint()
+
     file = request.files.get('file')
     password = request.form.get('password')
     output_path = request.form.get('output_path')
 
     if not file or not password:
         return jsonify({'error': 'Missing file or password'}), 400
+    try:
+        compression = compression_options(request.form.get('compression'),
+                                          request.form.get('compression_level'))
+        cipher = CIPHER_NAMES[resolve_cipher(request.form.get('cipher'))]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    input_path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(input_path)
+    try:
+        output_path = upload_path(output_path) if output_path else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
+    input_path = scratch_path(file.filename)
+    file.save(input_path)
+    temporary = [input_path]
     if not output_path:
         output_path = input_path + ".enc"
+        temporary.append(output_path)
 
     try:
-        encrypt_file(input_path, password, output_path)
+        encrypt_file(input_path, password, output_path, compression=compression, cipher=cipher)
         # Encryption
         log_event("ENCRYPTION", file.filename, "SUCCESS", output_path)
-        return send_file(output_path, as_attachment=True)
+        return send_temporary(output_path, (secure_filename(file.filename) or 'upload') + ".enc", temporary)
     except Exception as e:
+        remove_all(temporary)
         # On failure, you can pass None or the attempted output path
         log_event("ENCRYPTION", file.filename, f"FAILED - {str(e)}", output_path)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/decrypt', methods=['POST'])
 def decrypt_endpoint():
-    """Handles file decryption request and restores the original extension."""
+    """Handles file decryption request and restores the original extension.
+
+    A raw application/octet-stream body is decrypted in streaming mode; a
+    multipart upload goes through the uploads folder.
+    """
+    if request.mimetype == STREAM_MIMETYPE:
+        return decrypt_stream_body_endpoint()
+
     file = request.files.get('file')
     password = request.form.get('password')
     output_path = request.form.get('output_path')
@@ -42,29 +246,369 @@ def decrypt_endpoint():
     if not file or not password:
         return jsonify({'error': 'Missing file or password'}), 400
 
-    input_path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(input_path)
+    try:
+        output_path = upload_path(output_path) if output_path else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    if not output_path:
-        output_path = os.path.join(UPLOAD_FOLDER, "decrypted_file")
+    input_path = scratch_path(file.filename)
+    file.save(input_path)
+    temporary = [input_path]
+    keep_output = output_path is not None
+    if not keep_output:
+        output_path = input_path + ".decrypted"
 
     try:
         result = decrypt_file(input_path, password, output_path)
         if result:
+            if not keep_output:
+                temporary.append(result)
             # Decryption
             log_event("DECRYPTION", file.filename, "SUCCESS", result)
-            # Use the correct filename in the response
-            return send_file(
-                result,
-                as_attachment=True,
-                download_name=os.path.basename(result)  # Flask >=2.0
-            )
+            extension = result[len(output_path):]  # decrypt_file appends the stored extension
+            return send_temporary(result, decrypted_name(secure_filename(file.filename) or 'upload', extension),
+                                  temporary)
         else:
+            remove_all(temporary)
             log_event("DECRYPTION", file.filename, "FAILED - Incorrect password or corrupted file", output_path)
             return jsonify({'error': 'Decryption failed, incorrect password or corrupted file'}), 400
     except Exception as e:
+        remove_all(temporary)
         log_event("DECRYPTION", file.filename, f"FAILED - {str(e)}", output_path)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/decrypt/<path:filename>', methods=['GET'])
+def decrypt_stream_endpoint(filename):
+    """Streams a stored encrypted file as plaintext, honouring HTTP Range requests.
+
+    The password is sent in the X-Password header. Only the chunks covering the
+    requested range are decrypted, so clients can seek into large files.
+    """
+    password = request.headers.get('X-Password')
+    if not password:
+        return jsonify({'error': 'Missing password'}), 400
+
+    input_path = safe_join(UPLOAD_FOLDER, filename)
+    if input_path is None or not os.path.isfile(input_path):
+        return jsonify({'error': 'File not found'}), 404
+
+    infile = open(input_path, 'rb')
+    try:
+        header, aead, index = open_container(infile, password)
+        total_size = index.total_size
+    except ValueError as e:
+        infile.close()
+        log_event("DECRYPTION", filename, f"FAILED - {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+    start, stop = 0, total_size
+    status = 200
+    if request.range:
+        byte_range = request.range.range_for_length(total_size)
+        if byte_range is None:
+            infile.close()
+            return Response(status=416, headers={'Content-Range': f'bytes */{total_size}'})
+        start, stop = byte_range
+        status = 206
+
+    def generate():
+        with infile:
+            try:
+                yield from iter_plaintext_range(infile, header, aead, index, start, stop)
+            except (InvalidTag, ValueError) as e:
+                # The status line is already out; ending short of Content-Length makes the
+                # client see an incomplete transfer instead of a complete response
+                log_event("DECRYPTION", filename, f"FAILED - {str(e) or 'Corrupted chunk'}")
+                return
+        log_event("DECRYPTION", filename, f"SUCCESS - bytes {start}-{stop}")
+
+    download_name = decrypted_name(os.path.basename(filename), header.extension.decode())
+    response = Response(generate(), status=status, mimetype='application/octet-stream')
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    response.content_length = stop - start
+    if status == 206:
+        response.content_range = ContentRange('bytes', start, stop, total_size)
+    return response
+
+@app.route('/rekey/<path:filename>', methods=['POST'])
+def rekey_endpoint(filename):
+    """Changes the password of a stored encrypted file without touching its data.
+
+    Takes `old_password` and `new_password` as JSON or form fields.
+    """
+    params = request.get_json(silent=True) or request.form
+    old_password = params.get('old_password')
+    new_password = params.get('new_password')
+    if not old_password or not new_password:
+        return jsonify({'error': 'Missing old_password or new_password'}), 400
+
+    path = safe_join(UPLOAD_FOLDER, filename)
+    if path is None or not os.path.isfile(path):
+        return jsonify({'error': 'File not found'}), 404
+
+    try:
+        rekey(path, old_password, new_password)
+    except ValueError as e:
+        log_event("REKEY", filename, f"FAILED - {str(e)}")
+        return jsonify({'error': str(e)}), 400
+    log_event("REKEY", filename, "SUCCESS", path)
+    return jsonify({'message': 'Password changed', 'filename': filename})
+
+@app.route('/verify/<path:filename>', methods=['POST'])
+def verify_endpoint(filename):
+    """Authenticates every chunk of a stored encrypted file without writing plaintext.
+
+    Takes `password` as a JSON or form field, or in the X-Password header. Responds
+    with the verify_file report: 200 when the file is intact, 422 when chunks or the
+    index are damaged, and 400 when the password is wrong.
+    """
+    params = request.get_json(silent=True) or request.form
+    password = params.get('password') or request.headers.get('X-Password')
+    if not password:
+        return jsonify({'error': 'Missing password'}), 400
+
+    path = safe_join(UPLOAD_FOLDER, filename)
+    if path is None or not os.path.isfile(path):
+        return jsonify({'error': 'File not found'}), 404
+
+    report = verify_file(path, password)
+    if report['ok']:
+        return jsonify(report)
+    return jsonify(report), 422 if report['status'] == STATUS_CORRUPTED else 400
+
+@app.route('/inspect/<path:filename>', methods=['GET'])
+def inspect_endpoint(filename):
+    """Describes a stored encrypted file from its header; no password or KDF run needed."""
+    path = safe_join(UPLOAD_FOLDER, filename)
+    if path is None or not os.path.isfile(path):
+        return jsonify({'error': 'File not found'}), 404
+    try:
+        return jsonify(inspect_file(path))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/jobs/<kind>', methods=['POST'])
+def create_job_endpoint(kind):
+    """Queues an encryption or decryption job and returns its ID right away.
+
+    The input is either a multipart `file` upload or an `input_path` on the server.
+    `input_path` and `output_path` are relative to the uploads folder; paths that
+    would leave it are rejected. Poll GET /jobs/<id> for progress and fetch
+    GET /jobs/<id>/result when done.
+    """
+    if kind not in ('encrypt', 'decrypt'):
+        return jsonify({'error': f'Unknown job type: {kind}'}), 404
+
+    file = request.files.get('file')
+    password = request.form.get('password')
+    input_path = request.form.get('input_path')
+    output_path = request.form.get('output_path')
+    if not password or not (file or input_path):
+        return jsonify({'error': 'Missing file or password'}), 400
+    try:
+        compression = compression_options(request.form.get('compression'),
+                                          request.form.get('compression_level'))
+        cipher = CIPHER_NAMES[resolve_cipher(request.form.get('cipher'))]
+        if input_path and not file:
+            input_path = upload_path(input_path)
+        if output_path:
+            output_path = upload_path(output_path)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    token = uuid.uuid4().hex
+    uploaded = file is not None
+    if uploaded:
+        filename = secure_filename(file.filename) or 'upload'
+        input_path = os.path.abspath(os.path.join(UPLOAD_FOLDER, f"{token}_{filename}"))
+        file.save(input_path)
+    elif not os.path.isfile(input_path):
+        return jsonify({'error': 'Input file not found'}), 400
+    else:
+        filename = os.path.basename(input_path)
+
+    if kind == 'encrypt':
+        output_path = output_path or input_path + ".enc"
+        event_type = "ENCRYPTION"
+
+        def work(job):
+            encrypt_file(input_path, password, output_path, progress=job.report, compression=compression,
+                         cipher=cipher)
+            return output_path
+    else:
+        output_path = output_path or os.path.abspath(os.path.join(UPLOAD_FOLDER, f"{token}_decrypted"))
+        event_type = "DECRYPTION"
+
+        def work(job):
+            result = decrypt_file(input_path, password, output_path, progress=job.report)
+            if result is None:
+                job.error = 'Decryption failed, incorrect password or corrupted file'
+            return result
+
+    def cleanup(job):
+        if uploaded:
+            remove_quietly(input_path)
+        if job.status == SUCCEEDED:
+            log_event(event_type, filename, "SUCCESS", job.result_path)
+        else:
+            if kind == 'encrypt':
+                remove_quietly(output_path)  # Drop partial output
+            log_event(event_type, filename, f"{job.status.upper()} - {job.error or ''}", output_path)
+
+    try:
+        job = jobs.submit(kind, filename, os.path.getsize(input_path), work, cleanup)
+    except QueueFull as e:
+        if uploaded:
+            remove_quietly(input_path)
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+    return jsonify(job.to_dict()), 202, {'Location': f'/jobs/{job.id}'}
+
+@app.route('/batch/<kind>', methods=['POST'])
+def create_batch_endpoint(kind):
+    """Queues a batch job that encrypts or decrypts a whole directory tree on the server.
+
+    Takes `source_dir`, `dest_dir` and `password`; both directories are relative to the
+    uploads folder and may not leave it. The job's `details` hold the batch summary
+    once it finishes; re-submitting an interrupted batch resumes it.
+    """
+    if kind not in ('encrypt', 'decrypt'):
+        return jsonify({'error': f'Unknown batch type: {kind}'}), 404
+
+    params = request.get_json(silent=True) or request.form
+    source_dir = params.get('source_dir')
+    dest_dir = params.get('dest_dir')
+    password = params.get('password')
+    if not source_dir or not dest_dir or not password:
+        return jsonify({'error': 'Missing source_dir, dest_dir or password'}), 400
+    try:
+        source_dir = upload_path(source_dir)
+        dest_dir = upload_path(dest_dir)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not os.path.isdir(source_dir):
+        return jsonify({'error': 'Source directory not found'}), 400
+
+    run_batch = encrypt_directory if kind == 'encrypt' else decrypt_directory
+    suffix = None if kind == 'encrypt' else ENCRYPTED_SUFFIX
+
+    def work(job):
+        job.details = run_batch(source_dir, password, dest_dir, progress=job.report,
+                                cancel_event=job.cancel_event)
+        return dest_dir
+
+    try:
+        job = jobs.submit(f"batch-{kind}", source_dir, batch_size(source_dir, dest_dir, suffix), work)
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+    return jsonify(job.to_dict()), 202, {'Location': f'/jobs/{job.id}'}
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status_endpoint(job_id):
+    """Reports a job's status, bytes processed and throughput."""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result_endpoint(job_id):
+    """Downloads the output of a finished job."""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status != SUCCEEDED:
+        return jsonify({'error': f'Job is {job.status}'}), 409
+    if not os.path.isfile(job.result_path):
+        return jsonify({'error': f'Results were written to {job.result_path}'}), 409
+    return send_file(job.result_path, as_attachment=True,
+                     download_name=os.path.basename(job.result_path))
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job_endpoint(job_id):
+    """Cancels a queued or running job."""
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/uploads', methods=['POST'])
+def create_upload_endpoint():
+    """Starts a resumable upload that is encrypted part by part as it arrives.
+
+    Takes `filename`, `password` and the plaintext `size`, plus optional `part_size`,
+    `cipher` and `output_path` (inside the uploads folder). Send the parts with
+    PUT /uploads/<id>/parts/<n>, in any order and in parallel, check GET /uploads/<id>
+    for the missing ones, then POST /uploads/<id>/complete and download
+    GET /uploads/<id>/result.
+    """
+    params = request.get_json(silent=True) or request.form
+    password = params.get('password')
+    filename = secure_filename(params.get('filename') or '') or 'upload'
+    if not password or params.get('size') is None:
+        return jsonify({'error': 'Missing password or size'}), 400
+    try:
+        upload = uploads.create(filename, password, int(params['size']), params.get('output_path'),
+                                int(params['part_size']) if params.get('part_size') else None,
+                                params.get('cipher'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(upload.to_dict()), 201, {'Location': f'/uploads/{upload.id}'}
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def upload_status_endpoint(upload_id):
+    """Reports which parts of an upload have been received and which are missing."""
+    upload = uploads.get(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify(upload.to_dict())
+
+@app.route('/uploads/<upload_id>/parts/<int:number>', methods=['PUT'])
+def upload_part_endpoint(upload_id, number):
+    """Encrypts one part, sent as the raw request body, into the upload's container."""
+    upload = uploads.get(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    try:
+        return jsonify(upload.write_part(number, request.stream))
+    except UploadConflict as e:
+        return jsonify({'error': str(e)}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload_endpoint(upload_id):
+    """Writes the sealed index once every part has arrived."""
+    upload = uploads.get(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    try:
+        upload.complete()
+    except UploadConflict as e:
+        return jsonify({'error': str(e), **upload.to_dict()}), 409
+    except Exception as e:
+        log_event("ENCRYPTION", upload.filename, f"FAILED - {str(e)}", upload.output_path)
+        return jsonify({'error': str(e)}), 500
+    return jsonify(upload.to_dict())
+
+@app.route('/uploads/<upload_id>/result', methods=['GET'])
+def upload_result_endpoint(upload_id):
+    """Downloads the encrypted file of a completed upload; Range requests resume a download."""
+    upload = uploads.get(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    if not upload.completed:
+        return jsonify({'error': 'Upload is not complete'}), 409
+    return send_file(upload.output_path, as_attachment=True, download_name=upload.filename + ".enc",
+                     conditional=True)
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+def abort_upload_endpoint(upload_id):
+    """Aborts an upload and deletes its partial container, or discards a downloaded result."""
+    upload = uploads.abort(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify(upload.to_dict())
+
 if __name__ == '__main__':
     app.run(debug=True)
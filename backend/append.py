@@ -0,0 +1,119 @@
+"""Appending data to existing encrypted files in place.
+
+append_encrypted authenticates the sealed index and the final chunk, then writes
+new chunks over the old index, numbered on from the last chunk, and seals a new
+index after them. Only the appended data (plus the index) is written, whatever
+the size of the file.
+
+A partially filled final chunk cannot be re-encrypted under its own nonce, so in
+ordinary files it stays as it is and the new data starts a new chunk. Files
+written for incremental updates (FLAG_CHUNK_HASHES) track a generation per chunk,
+so there the final chunk is filled up and rewritten under a new generation, which
+keeps the fixed chunk layout that update_encrypted_file relies on.
+"""
+import io
+import os
+
+from cryptography.exceptions import InvalidTag
+
+from . import container
+from .ciphers import make_aead
+from .compression import ChunkCompressor, CompressionOptions
+from .container import CHUNK_FINAL, ChunkIndex
+from .crypto_utils import (chunk_hash_key, header_key, log_event, max_in_flight, open_chunk,
+                           open_index, read_chunks_into, seal_chunks, write_index)
+
+
+class _PrefixedReader:
+    """Reads `prefix` and then the rest of `stream`."""
+
+    def __init__(self, prefix: bytes, stream):
+        self._prefix = memoryview(prefix)
+        self._stream = stream
+
+    def readinto(self, buffer) -> int:
+        if self._prefix:
+            count = min(len(buffer), len(self._prefix))
+            buffer[:count] = self._prefix[:count]
+            self._prefix = self._prefix[count:]
+            return count
+        return self._stream.readinto(buffer)
+
+
+def append_encrypted(path: str, password: str, data, workers: int = None, progress=None) -> int:
+    """Appends `data` (bytes or a readable binary stream) to the v2 file at `path`.
+
+    The index and the final chunk are authenticated before anything is written.
+    Compressed files get their new chunks compressed with the default settings.
+    `progress(byte_count)` is called with the plaintext bytes appended. Returns the
+    new plaintext size. The file is unreadable if the append is interrupted.
+    """
+    stream = io.BytesIO(data) if isinstance(data, (bytes, bytearray, memoryview)) else data
+    with open(path, 'r+b') as f:
+        header = container.read_header(f)
+        if header is None:
+            raise ValueError("Legacy v1 files cannot be appended to; re-encrypt the file")
+        if header.flags & container.FLAG_ARCHIVE:
+            raise ValueError("Archives cannot be appended to")
+        try:
+            key = header_key(password, header)
+            aead = make_aead(header.cipher_id, key)
+            old = open_index(f, aead, header)
+        except InvalidTag:
+            raise ValueError("Incorrect password or corrupted file")
+
+        hashed = container.has_chunk_hashes(header)
+        data_offset = len(header.pack())
+        entries = list(old.entries)
+        # New chunks start where the old index (or, in compressed files, the end frame) did
+        offset = entries[-1].offset + entries[-1].length if entries else data_offset
+        first = len(entries)
+        prefix = b""
+        if entries:
+            last = entries[-1]
+            f.seek(last.offset)
+            try:
+                tail = open_chunk(aead, header, header.aad, first - 1, last.flags, f.read(last.length),
+                                  last.plain_size, old.generation_of(first - 1))
+            except InvalidTag:
+                raise ValueError("Corrupted file: final chunk authentication failed")
+            if hashed and len(tail) < header.chunk_size:
+                prefix = tail  # Rewritten together with the new data
+                first -= 1
+                entries.pop()
+            else:
+                entries[-1] = last._replace(flags=last.flags & ~CHUNK_FINAL)
+
+        index = ChunkIndex(entries, sum(entry.plain_size for entry in entries), old.extra,
+                           old.hashes[:first], old.generations[:first], old.generation)
+        hash_key = None
+        if hashed:
+            index.generation += 1
+            if index.generation > container.MAX_GENERATION:
+                raise ValueError("Update limit reached; re-encrypt the file from scratch")
+            hash_key = chunk_hash_key(key)
+            # Reserve the generation before rewriting anything, as update_encrypted_file does
+            reserved = ChunkIndex(old.entries, old.total_size, old.extra, old.hashes, old.generations,
+                                  index.generation)
+            write_index(f, aead, header, reserved, offset)
+            if prefix:
+                offset = last.offset
+        compressor = None
+        if header.flags & container.FLAG_COMPRESSED:
+            compressor = ChunkCompressor(CompressionOptions())
+
+        reader = _PrefixedReader(prefix, stream) if prefix else stream
+        chunks = read_chunks_into(reader, header.chunk_size, max_in_flight(workers) + 1)
+        f.seek(offset)
+        for piece in seal_chunks(aead, header, chunks, index, offset, first, index.generation,
+                                 compressor, hash_key, workers, progress):
+            f.write(piece)
+        if len(index.entries) == first:
+            return old.total_size  # Nothing was appended; the old index is still in place
+        if compressor:
+            f.write(container.pack_frame(0, 0))  # End of chunks
+        index.entries[-1] = index.entries[-1]._replace(flags=index.entries[-1].flags | CHUNK_FINAL)
+        write_index(f, aead, header, index, f.tell())
+
+    log_event("APPEND", os.path.basename(path), f"SUCCESS - {index.total_size - old.total_size} bytes", path)
+    return index.total_size
@@ -0,0 +1,208 @@
+"""Multi-file archives: many files packed into one v2 container.
+
+Members are concatenated into a single chunk stream, so one key derivation and one
+header cover the whole archive. The member table (name, offset, size, mtime) is
+sealed into the container's encrypted index, so listing an archive decrypts only
+the index and extracting a member decrypts only the chunks that overlap it.
+"""
+import os
+import struct
+from typing import List, NamedTuple
+
+from cryptography.exceptions import InvalidTag
+
+from . import container
+from .compression import CompressionOptions
+from .crypto_utils import encrypt_stream, iter_plaintext_range, log_event, open_container
+
+ARCHIVE_EXTENSION = b".archive"
+_TABLE_HEAD = struct.Struct('>I')  # member count
+_MEMBER = struct.Struct('>QQqH')  # offset, size, mtime_ns, name_len
+
+
+class ArchiveMember(NamedTuple):
+    """One file stored in an archive. `offset` is its position in the plaintext."""
+    name: str
+    offset: int
+    size: int
+    mtime_ns: int
+
+
+def pack_members(members: List[ArchiveMember]) -> bytes:
+    parts = [_TABLE_HEAD.pack(len(members))]
+    for member in members:
+        name = member.name.encode()
+        parts.append(_MEMBER.pack(member.offset, member.size, member.mtime_ns, len(name)) + name)
+    return b"".join(parts)
+
+
+def unpack_members(data: bytes) -> List[ArchiveMember]:
+    if len(data) < _TABLE_HEAD.size:
+        raise ValueError("Malformed archive member table")
+    (count,), position = _TABLE_HEAD.unpack_from(data), _TABLE_HEAD.size
+    members = []
+    for _ in range(count):
+        if position + _MEMBER.size > len(data):
+            raise ValueError("Malformed archive member table")
+        offset, size, mtime_ns, name_len = _MEMBER.unpack_from(data, position)
+        position += _MEMBER.size
+        name = data[position:position + name_len].decode()
+        position += name_len
+        members.append(ArchiveMember(name, offset, size, mtime_ns))
+    if position != len(data):
+        raise ValueError("Malformed archive member table")
+    return members
+
+
+def _check_member_name(name: str):
+    """Rejects names that would escape the extraction directory."""
+    parts = name.split("/")
+    if not name or name.startswith("/") or ".." in parts or "\\" in name or ":" in parts[0]:
+        raise ValueError(f"Unsafe archive member name: {name!r}")
+
+
+class _ConcatenatedReader:
+    """Reads the given files back to back as one stream and records where each starts."""
+
+    def __init__(self, sources):
+        self._pending = list(sources)  # (path, archive name)
+        self._current = None
+        self._position = 0
+        self.members = []
+
+    def _next_file(self):
+        path, name = self._pending.pop(0)
+        self._current = open(path, 'rb')
+        stat = os.fstat(self._current.fileno())
+        self.members.append(ArchiveMember(name, self._position, 0, stat.st_mtime_ns))
+
+    def readinto(self, buffer) -> int:
+        while True:
+            if self._current is None:
+                if not self._pending:
+                    return 0
+                self._next_file()
+            count = self._current.readinto(buffer)
+            if count:
+                self._position += count
+                member = self.members[-1]
+                self.members[-1] = member._replace(size=member.size + count)
+                return count
+            self._current.close()
+            self._current = None
+
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+
+
+def _collect_sources(paths):
+    """Expands files and directories into (path, archive name) pairs, in a stable order."""
+    sources = []
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            base = os.path.dirname(path)
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    full = os.path.join(root, name)
+                    sources.append((full, os.path.relpath(full, base).replace(os.sep, "/")))
+        else:
+            sources.append((path, os.path.basename(path)))
+    names = [name for _, name in sources]
+    if len(set(names)) != len(names):
+        raise ValueError("Archive member names must be unique")
+    for name in names:
+        _check_member_name(name)
+    return sources
+
+
+def create_archive(paths, password: str, output_path: str, workers: int = None, progress=None,
+                   compression: CompressionOptions = None, cipher: str = None) -> List[ArchiveMember]:
+    """Packs files (and directory trees) into one encrypted archive at `output_path`.
+
+    Directories are stored with paths relative to their parent. Returns the member table.
+    """
+    sources = _collect_sources(paths)
+    size_hint = sum(os.path.getsize(path) for path, _ in sources)
+    reader = _ConcatenatedReader(sources)
+    try:
+        with open(output_path, 'wb') as outfile:
+            pieces = encrypt_stream(reader, password, ARCHIVE_EXTENSION, size_hint, workers,
+                                    progress=progress, flags=container.FLAG_ARCHIVE,
+                                    index_extra=lambda: pack_members(reader.members),
+                                    compression=compression, cipher=cipher)
+            for piece in pieces:
+                outfile.write(piece)
+    finally:
+        reader.close()
+    log_event("ARCHIVE", os.path.basename(output_path), f"SUCCESS - {len(reader.members)} files", output_path)
+    return reader.members
+
+
+def _open_archive(infile, password: str):
+    header, aead, index = open_container(infile, password)
+    if not header.flags & container.FLAG_ARCHIVE:
+        raise ValueError("File is not an archive")
+    members = unpack_members(index.extra)
+    for member in members:
+        if member.offset + member.size > index.total_size:
+            raise ValueError("Archive member lies outside the data")
+    return header, aead, index, members
+
+
+def list_archive(path: str, password: str) -> List[ArchiveMember]:
+    """Returns the member table. Only the index is decrypted."""
+    with open(path, 'rb') as infile:
+        return _open_archive(infile, password)[3]
+
+
+def _find_member(members, name):
+    for member in members:
+        if member.name == name:
+            return member
+    raise KeyError(f"No member named {name!r} in archive")
+
+
+def iter_member(infile, header, aead, index, member: ArchiveMember, workers: int = None):
+    """Yields the plaintext of one member, decrypting only the chunks that overlap it."""
+    try:
+        yield from iter_plaintext_range(infile, header, aead, index,
+                                        member.offset, member.offset + member.size, workers)
+    except InvalidTag:
+        raise ValueError("Corrupted archive: chunk authentication failed")
+
+
+def read_member(path: str, password: str, name: str, workers: int = None) -> bytes:
+    """Returns the contents of one member."""
+    with open(path, 'rb') as infile:
+        header, aead, index, members = _open_archive(infile, password)
+        return b"".join(iter_member(infile, header, aead, index, _find_member(members, name), workers))
+
+
+def _extract(infile, header, aead, index, member, dest_dir, workers):
+    _check_member_name(member.name)
+    output_path = os.path.join(dest_dir, *member.name.split("/"))
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'wb') as outfile:
+        for piece in iter_member(infile, header, aead, index, member, workers):
+            outfile.write(piece)
+    os.utime(output_path, ns=(member.mtime_ns, member.mtime_ns))
+    return output_path
+
+
+def extract_member(path: str, password: str, name: str, dest_dir: str, workers: int = None) -> str:
+    """Extracts one member under `dest_dir` and returns the path it was written to."""
+    with open(path, 'rb') as infile:
+        header, aead, index, members = _open_archive(infile, password)
+        return _extract(infile, header, aead, index, _find_member(members, name), dest_dir, workers)
+
+
+def extract_archive(path: str, password: str, dest_dir: str, workers: int = None) -> List[str]:
+    """Extracts every member under `dest_dir`. Returns the written paths."""
+    with open(path, 'rb') as infile:
+        header, aead, index, members = _open_archive(infile, password)
+        outputs = [_extract(infile, header, aead, index, member, dest_dir, workers) for member in members]
+    log_event("ARCHIVE EXTRACTION", os.path.basename(path), f"SUCCESS - {len(outputs)} files", dest_dir)
+    return outputs
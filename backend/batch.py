@@ -0,0 +1,184 @@
+"""Batch encryption and decryption of directory trees with a resumable manifest."""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .crypto_utils import DEFAULT_WORKERS, KeySession, decrypt_file, encrypt_file, log_event
+
+SMALL_FILE_THRESHOLD = 8 * 1024 * 1024  # Files below this are grouped; larger ones use every core
+GROUP_MAX_BYTES = 32 * 1024 * 1024
+GROUP_MAX_FILES = 256
+MANIFEST_NAME = ".batch_manifest.jsonl"
+ENCRYPTED_SUFFIX = ".enc"
+
+
+class Manifest:
+    """Append-only JSON-lines record of per-file results, used to resume a batch.
+
+    A file counts as done when its last record succeeded and its size and mtime
+    still match, so files changed since the interrupted run are processed again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._done = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line from an interrupted run
+                    if record.get("status") == "ok":
+                        self._done[record["path"]] = (record["size"], record["mtime"])
+                    else:
+                        self._done.pop(record.get("path"), None)
+        self._file = open(path, "a")
+
+    def is_done(self, rel_path, stat):
+        return self._done.get(rel_path) == (stat.st_size, stat.st_mtime_ns)
+
+    def record(self, rel_path, stat, status, output=None, error=None):
+        line = json.dumps({"path": rel_path, "size": stat.st_size, "mtime": stat.st_mtime_ns,
+                           "status": status, "output": output, "error": error})
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _walk(source_dir, suffix=None, exclude_dir=None):
+    """Yields (absolute path, path relative to source_dir, stat) for regular files.
+
+    `exclude_dir` (the batch output) is skipped when it lies inside the source tree.
+    """
+    exclude_dir = os.path.abspath(exclude_dir) if exclude_dir else None
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != exclude_dir)
+        for name in sorted(files):
+            if name == MANIFEST_NAME or (suffix and not name.endswith(suffix)):
+                continue
+            path = os.path.join(root, name)
+            yield path, os.path.relpath(path, source_dir), os.stat(path)
+
+
+def _group_small_files(files):
+    """Packs small files into groups so one pool task amortizes many of them."""
+    group, group_bytes = [], 0
+    for item in files:
+        group.append(item)
+        group_bytes += item[2].st_size
+        if len(group) >= GROUP_MAX_FILES or group_bytes >= GROUP_MAX_BYTES:
+            yield group
+            group, group_bytes = [], 0
+    if group:
+        yield group
+
+
+def _run_batch(event_type, source_dir, dest_dir, files, process, workers, progress, cancel_event):
+    """Runs `process(path, rel_path, chunk_workers, progress)` over the files and writes the manifest.
+
+    Small files are grouped and spread over the worker pool one file per thread;
+    large files run one at a time, each split across all workers by the chunk engine.
+    """
+    workers = workers or DEFAULT_WORKERS
+    os.makedirs(dest_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(dest_dir, MANIFEST_NAME))
+    summary = {"processed": 0, "skipped": 0, "failed": 0, "bytes": 0, "errors": []}
+    summary_lock = threading.Lock()
+    started = time.time()
+
+    pending = []
+    for path, rel_path, stat in files:
+        if manifest.is_done(rel_path, stat):
+            summary["skipped"] += 1
+        else:
+            pending.append((path, rel_path, stat))
+    small = [item for item in pending if item[2].st_size < SMALL_FILE_THRESHOLD]
+    large = [item for item in pending if item[2].st_size >= SMALL_FILE_THRESHOLD]
+
+    def handle(item, chunk_workers):
+        path, rel_path, stat = item
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        try:
+            output = process(path, rel_path, chunk_workers, progress)
+            manifest.record(rel_path, stat, "ok", output=output)
+            with summary_lock:
+                summary["processed"] += 1
+                summary["bytes"] += stat.st_size
+        except Exception as e:
+            if cancel_event is not None and cancel_event.is_set():
+                raise
+            manifest.record(rel_path, stat, "failed", error=str(e))
+            with summary_lock:
+                summary["failed"] += 1
+                summary["errors"].append({"path": rel_path, "error": str(e)})
+
+    def handle_group(group):
+        for item in group:
+            handle(item, 1)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(handle_group, group) for group in _group_small_files(small)]:
+                future.result()
+        for item in large:
+            handle(item, workers)
+    finally:
+        manifest.close()
+        summary["seconds"] = round(time.time() - started, 3)
+        cancelled = cancel_event is not None and cancel_event.is_set()
+        if cancelled:
+            status = "CANCELLED"
+        elif summary["failed"]:
+            status = "FAILED"
+        else:
+            status = "SUCCESS"
+        log_event(event_type, source_dir,
+                  f"{status} - {summary['processed']} files, {summary['skipped']} skipped, "
+                  f"{summary['failed']} failed in {summary['seconds']}s", dest_dir)
+    return summary
+
+
+def batch_size(source_dir, dest_dir=None, suffix=None):
+    """Total bytes of the files a batch over `source_dir` would visit."""
+    return sum(stat.st_size for _, _, stat in _walk(source_dir, suffix, dest_dir))
+
+
+def encrypt_directory(source_dir, password, dest_dir, workers=None, progress=None, cancel_event=None):
+    """Encrypts every file under `source_dir` into the same tree under `dest_dir`.
+
+    Argon2 runs once for the whole batch (see KeySession); each file gets its own
+    random data key, wrapped under the session key. Re-running after an interruption skips files the manifest
+    marks as done. Returns a summary dict.
+    """
+    with KeySession(password) as session:
+        def process(path, rel_path, chunk_workers, progress):
+            output = os.path.join(dest_dir, rel_path + ENCRYPTED_SUFFIX)
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            encrypt_file(path, password, output, workers=chunk_workers, session=session, progress=progress)
+            return output
+
+        return _run_batch("BATCH ENCRYPTION", source_dir, dest_dir, _walk(source_dir, exclude_dir=dest_dir),
+                          process, workers, progress, cancel_event)
+
+
+def decrypt_directory(source_dir, password, dest_dir, workers=None, progress=None, cancel_event=None):
+    """Decrypts every .enc file under `source_dir` into the same tree under `dest_dir`."""
+    def process(path, rel_path, chunk_workers, progress):
+        base = os.path.splitext(rel_path[:-len(ENCRYPTED_SUFFIX)])[0]  # decrypt_file restores the extension
+        output = os.path.join(dest_dir, base)
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        result = decrypt_file(path, password, output, workers=chunk_workers, progress=progress)
+        if result is None:
+            raise ValueError("Incorrect password or corrupted file")
+        return result
+
+    return _run_batch("BATCH DECRYPTION", source_dir, dest_dir, _walk(source_dir, ENCRYPTED_SUFFIX, dest_dir),
+                      process, workers, progress, cancel_event)
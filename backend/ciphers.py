@@ -0,0 +1,132 @@
+"""Registry of the AEAD ciphers a v2 container can use, with benchmark-driven selection.
+
+Every registered cipher takes a 256-bit key and a 96-bit nonce and adds a 128-bit
+tag, so the container layout, nonce derivation and index sealing are the same for
+all of them; only the cipher id in the header differs. ChaCha20-Poly1305 is much
+faster than AES-GCM on hosts without AES instructions. AES-GCM-SIV is offered when
+the installed `cryptography` and OpenSSL support it.
+
+The "auto" choice times each available cipher once per process, on first use.
+Run `python -m backend.ciphers` for a benchmark report.
+"""
+import os
+import threading
+import time
+from typing import List, Optional, Union
+
+from cryptography.exceptions import UnsupportedAlgorithm
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+
+from .container import CIPHER_AES_256_GCM, CIPHER_AES_256_GCM_SIV, CIPHER_CHACHA20_POLY1305, CIPHER_NAMES
+
+try:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCMSIV
+except ImportError:
+    AESGCMSIV = None
+
+Aead = Union[AESGCM, ChaCha20Poly1305, "AESGCMSIV"]
+
+CIPHER_AUTO = "auto"
+DEFAULT_CIPHER = CIPHER_AES_256_GCM
+CALIBRATION_BYTES = 1024 * 1024  # Plaintext encrypted per timing run
+CALIBRATION_RUNS = 3  # The best run counts
+
+_FACTORIES = {
+    CIPHER_AES_256_GCM: AESGCM,
+    CIPHER_CHACHA20_POLY1305: ChaCha20Poly1305,
+    CIPHER_AES_256_GCM_SIV: AESGCMSIV,
+}
+_available = None
+_calibrated = None
+_lock = threading.Lock()
+
+
+def _works(factory) -> bool:
+    """Whether the backend really implements a cipher (AES-GCM-SIV needs OpenSSL 3.2)."""
+    if factory is None:
+        return False
+    try:
+        factory(bytes(32)).encrypt(bytes(12), b"", None)
+        return True
+    except UnsupportedAlgorithm:
+        return False
+
+
+def available_ciphers() -> List[int]:
+    """Ids of the ciphers this host can use, in registry order."""
+    global _available
+    if _available is None:
+        _available = [cipher_id for cipher_id, factory in _FACTORIES.items() if _works(factory)]
+    return _available
+
+
+def make_aead(cipher_id: int, key: bytes) -> Aead:
+    """Returns the AEAD object for a container's cipher id.
+
+    Raises ValueError when the cipher is unknown or not supported on this host.
+    """
+    if cipher_id not in available_ciphers():
+        name = CIPHER_NAMES.get(cipher_id, str(cipher_id))
+        raise ValueError(f"Cipher {name} is not supported by this installation")
+    return _FACTORIES[cipher_id](key)
+
+
+def measure(cipher_id: int, size: int = CALIBRATION_BYTES, runs: int = CALIBRATION_RUNS) -> float:
+    """Returns the best throughput in bytes per second of encrypting `size` bytes with a cipher."""
+    aead = make_aead(cipher_id, os.urandom(32))
+    data = os.urandom(size)
+    nonce = bytes(12)
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        aead.encrypt(nonce, data, None)
+        best = min(best, time.perf_counter() - start)
+    return size / best if best else float("inf")
+
+
+def calibrate_cipher(apply: bool = True) -> int:
+    """Times every available cipher and returns the id of the fastest one.
+
+    With `apply` the result is kept for the rest of the process and used by "auto".
+    """
+    global _calibrated
+    fastest = max(available_ciphers(), key=measure)
+    if apply:
+        _calibrated = fastest
+    return fastest
+
+
+def calibrated_cipher() -> Optional[int]:
+    """Returns the cipher chosen by the last applied calibration, if any."""
+    return _calibrated
+
+
+def resolve_cipher(name: Optional[str]) -> int:
+    """Maps a cipher name, "auto" or None (the default) to a cipher id.
+
+    "auto" calibrates on first use. Raises ValueError for unknown or unsupported names.
+    """
+    if not name:
+        return DEFAULT_CIPHER
+    if name == CIPHER_AUTO:
+        with _lock:
+            return _calibrated if _calibrated is not None else calibrate_cipher()
+    for cipher_id, cipher_name in CIPHER_NAMES.items():
+        if cipher_name == name:
+            if cipher_id not in available_ciphers():
+                raise ValueError(f"Cipher {name} is not supported by this installation")
+            return cipher_id
+    raise ValueError(f"Unknown cipher: {name!r}")
+
+
+def benchmark_ciphers(size: int = 16 * CALIBRATION_BYTES) -> List[dict]:
+    """Times each available cipher on `size` bytes and returns one record per cipher."""
+    return [{"cipher": CIPHER_NAMES[cipher_id], "throughput": measure(cipher_id, size)}
+            for cipher_id in available_ciphers()]
+
+
+if __name__ == "__main__":
+    print(f"{'cipher':>20} {'MB/s':>9}")
+    for row in benchmark_ciphers():
+        print(f"{row['cipher']:>20} {row['throughput'] / 1e6:>9.1f}")
+    print(f"Fastest: {CIPHER_NAMES[calibrate_cipher(apply=False)]}")
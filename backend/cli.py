@@ -0,0 +1,226 @@
+"""Headless command line for encrypting, decrypting and verifying files or pipes.
+
+    pg_dump mydb | python aesenc.py encrypt > dump.enc
+    python aesenc.py decrypt dump.enc | psql mydb
+    python aesenc.py verify dump.enc
+    cat dump.enc | python aesenc.py verify
+
+Input defaults to stdin and output to stdout, and both stream in chunks, so memory
+stays constant for any size. The password comes from --password-file, the
+AESENC_PASSWORD environment variable or a prompt on the terminal. Only the crypto
+engine is imported, and only once a command runs, so startup is a fraction of a
+second (see the "cli" group of the benchmarks). Nothing is written to the
+encryption history.
+
+Exit status: 0 on success, 1 when the operation fails (wrong password, damaged
+file), 2 for bad arguments.
+"""
+import argparse
+import os
+import sys
+
+PASSWORD_ENV = "AESENC_PASSWORD"
+STDIO = "-"
+
+
+class CliError(Exception):
+    """A failure reported as one line on stderr with exit status 1."""
+
+
+def read_password(args, confirm: bool = False) -> str:
+    if args.password_file:
+        with open(args.password_file) as f:
+            return f.readline().rstrip("\r\n")
+    if os.environ.get(PASSWORD_ENV):
+        return os.environ[PASSWORD_ENV]
+    import getpass
+
+    try:
+        password = getpass.getpass("Password: ")  # Prompts on the terminal, so stdin can stay a pipe
+        if confirm and getpass.getpass("Confirm password: ") != password:
+            raise CliError("Passwords do not match")
+    except EOFError:
+        raise CliError(f"No password: use --password-file or {PASSWORD_ENV}")
+    if not password:
+        raise CliError("Empty password")
+    return password
+
+
+def open_input(path):
+    return sys.stdin.buffer if path in (None, STDIO) else open(path, 'rb')
+
+
+def write_output(path, pieces):
+    """Writes pieces to `path` or stdout; a file left incomplete by an error is removed."""
+    if path in (None, STDIO):
+        out = sys.stdout.buffer
+        for piece in pieces:
+            out.write(piece)
+        out.flush()
+        return
+    try:
+        with open(path, 'wb') as out:
+            for piece in pieces:
+                out.write(piece)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+
+def kdf_params(args):
+    if args.time_cost is None and args.memory_cost is None and args.parallelism is None:
+        return None
+    from .crypto_utils import ARGON2_MEMORY_COST, ARGON2_PARALLELISM, ARGON2_TIME_COST
+    from .kdf_calibration import KdfParams
+
+    return KdfParams(args.time_cost or ARGON2_TIME_COST, args.memory_cost or ARGON2_MEMORY_COST,
+                     args.parallelism or ARGON2_PARALLELISM)
+
+
+def cmd_encrypt(args) -> int:
+    from .crypto_utils import encrypt_stream
+
+    compression = None
+    if args.compression:
+        from .compression import CompressionOptions
+
+        compression = CompressionOptions(args.compression).resolved()
+    password = read_password(args, confirm=True)
+    infile = open_input(args.input)
+    try:
+        size = os.fstat(infile.fileno()).st_size if infile is not sys.stdin.buffer else None
+        extension = os.path.splitext(args.input)[1].encode() if infile is not sys.stdin.buffer else b""
+        pieces = encrypt_stream(infile, password, extension, size_hint=size, workers=args.workers,
+                                kdf_params=kdf_params(args), compression=compression, cipher=args.cipher)
+        write_output(args.output, pieces)
+    finally:
+        if infile is not sys.stdin.buffer:
+            infile.close()
+    return 0
+
+
+def _decrypt_file_pieces(infile, password, workers):
+    """Plaintext of a v2 file with random access, which also covers incremental and appended files."""
+    from cryptography.exceptions import InvalidTag
+    from . import container
+    from .crypto_utils import iter_plaintext_range, open_container
+
+    header, aead, index = open_container(infile, password)
+    if header.flags & container.FLAG_ARCHIVE:
+        raise CliError("File is an archive; extract it with backend.archive")
+    try:
+        yield from iter_plaintext_range(infile, header, aead, index, 0, index.total_size, workers)
+    except InvalidTag:
+        raise CliError("Corrupted file: chunk authentication failed")
+
+
+def cmd_decrypt(args) -> int:
+    from .crypto_utils import decrypt_stream
+    from .container import read_header
+
+    password = read_password(args)
+    if args.input in (None, STDIO):
+        try:
+            _, pieces = decrypt_stream(sys.stdin.buffer, password)
+            write_output(args.output, pieces)
+        except ValueError as e:
+            raise CliError(str(e))
+        return 0
+
+    with open(args.input, 'rb') as infile:
+        legacy = read_header(infile) is None
+        infile.seek(0)
+        if not legacy:
+            try:
+                write_output(args.output, _decrypt_file_pieces(infile, password, args.workers))
+            except ValueError as e:
+                raise CliError(str(e))
+            return 0
+
+    # Legacy v1 files can only be decrypted into a file
+    if args.output in (None, STDIO):
+        raise CliError("Legacy v1 files need an output file (-o)")
+    from .crypto_utils import decrypt_file
+
+    result = decrypt_file(args.input, password, args.output, workers=args.workers)
+    if result is None:
+        raise CliError("Incorrect password or corrupted file")
+    if result != args.output:
+        os.replace(result, args.output)  # decrypt_file appends the stored extension
+    return 0
+
+
+def cmd_verify(args) -> int:
+    from .verify import verify_file, verify_stream
+
+    password = read_password(args)
+    if args.input in (None, STDIO):
+        report = verify_stream(sys.stdin.buffer, password)
+    else:
+        report = verify_file(args.input, password, workers=args.workers, log=False)  # No history database
+    if args.json:
+        import json
+
+        print(json.dumps(report, indent=2))
+        return 0 if report["ok"] else 1
+    name = "<stdin>" if args.input in (None, STDIO) else args.input
+    if report["ok"]:
+        print(f"{name}: OK ({report['chunks']} chunks, {report['verified_bytes']} bytes)")
+    else:
+        print(f"{name}: {report['status'].upper()} - {report['error']}", file=sys.stderr)
+    return 0 if report["ok"] else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="aesenc", description="Encrypt, decrypt and verify files or pipes.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def common(command, input_help, output=True):
+        command.add_argument("input", nargs="?", default=STDIO, help=input_help)
+        if output:
+            command.add_argument("-o", "--output", default=STDIO, help="Output file (default: stdout)")
+        command.add_argument("--password-file", help=f"Read the password from the first line of this file "
+                                                     f"(default: ${PASSWORD_ENV}, else a prompt)")
+        command.add_argument("-j", "--workers", type=int, help="Threads for the chunk pipeline (default: CPUs)")
+
+    encrypt = commands.add_parser("encrypt", help="Encrypt a file or stdin")
+    common(encrypt, "File to encrypt (default: stdin)")
+    encrypt.add_argument("--cipher", help='aes-256-gcm (default), chacha20-poly1305, aes-256-gcm-siv or "auto"')
+    encrypt.add_argument("--compression", choices=("auto", "always"), help="Compress chunks before encrypting")
+    encrypt.add_argument("--time-cost", type=int, help="Argon2 iterations")
+    encrypt.add_argument("--memory-cost", type=int, help="Argon2 memory in KiB")
+    encrypt.add_argument("--parallelism", type=int, help="Argon2 lanes")
+    encrypt.set_defaults(run=cmd_encrypt)
+
+    decrypt = commands.add_parser("decrypt", help="Decrypt a file or stdin")
+    common(decrypt, "File to decrypt (default: stdin)")
+    decrypt.set_defaults(run=cmd_decrypt)
+
+    verify = commands.add_parser("verify", help="Authenticate every chunk of a file without writing plaintext")
+    common(verify, "File to verify (default: stdin)", output=False)
+    verify.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    verify.set_defaults(run=cmd_verify)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.run(args)
+    except (CliError, OSError) as e:
+        if isinstance(e, BrokenPipeError):
+            # The reader went away (e.g. `| head`); keep Python from complaining at exit
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        else:
+            print(f"aesenc: {e}", file=sys.stderr)
+        return 1
+    except ValueError as e:
+        print(f"aesenc: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
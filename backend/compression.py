@@ -0,0 +1,166 @@
+"""Optional per-chunk compression applied before encryption.
+
+Compression has to happen before AES-GCM, since ciphertext does not compress.
+Each chunk is compressed on its own so random access and parallel encryption keep
+working, and chunks that would not shrink are stored as they are. In "auto" mode a
+sample of each chunk is checked for entropy first, so media and archives that are
+already compressed skip the compressor entirely.
+
+zlib is always available; zstd is used when the `zstandard` package is installed.
+"""
+import math
+import zlib
+from collections import Counter
+from typing import NamedTuple, Optional, Tuple
+
+from .container import CHUNK_CODEC_MASK, CHUNK_ZLIB, CHUNK_ZSTD
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MODE_OFF = "off"
+MODE_AUTO = "auto"  # Compress chunks whose sample looks compressible
+MODE_ALWAYS = "always"  # Try every chunk; keep the result only if it is smaller
+MODES = (MODE_OFF, MODE_AUTO, MODE_ALWAYS)
+
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+DEFAULT_LEVELS = {CODEC_ZLIB: 3, CODEC_ZSTD: 3}  # Near-best ratio on text at several times the speed of zlib 6
+
+SAMPLE_SIZE = 2048  # Bytes of each chunk inspected by the entropy check
+SAMPLE_STRIPES = 4  # The sample is taken from this many places across the chunk
+ENTROPY_THRESHOLD = 7.5  # Bits per byte; above this a chunk is treated as incompressible
+MIN_SAVING = 1 / 32  # A compressed chunk must be at least this much smaller to be kept
+
+_COUNT_LOG2 = [0.0] + [count * math.log2(count) for count in range(1, SAMPLE_SIZE + 1)]
+
+
+def default_codec() -> str:
+    return CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+
+class CompressionOptions(NamedTuple):
+    """How encrypt_stream compresses chunks. `level` None means the codec default."""
+    mode: str = MODE_AUTO
+    codec: Optional[str] = None
+    level: Optional[int] = None
+
+    def resolved(self) -> "CompressionOptions":
+        """Fills in the codec and level defaults and checks the values."""
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown compression mode: {self.mode!r}")
+        codec = self.codec or default_codec()
+        if codec not in DEFAULT_LEVELS:
+            raise ValueError(f"Unknown compression codec: {codec!r}")
+        if codec == CODEC_ZSTD and zstandard is None:
+            raise ValueError("zstd compression needs the 'zstandard' package")
+        level = DEFAULT_LEVELS[codec] if self.level is None else self.level
+        return CompressionOptions(self.mode, codec, level)
+
+
+def sample_entropy(chunk) -> float:
+    """Shannon entropy in bits per byte of a striped sample of the chunk."""
+    view = memoryview(chunk)
+    if len(view) <= SAMPLE_SIZE:
+        sample = bytes(view)
+    else:
+        stripe = SAMPLE_SIZE // SAMPLE_STRIPES
+        step = (len(view) - stripe) // (SAMPLE_STRIPES - 1)
+        sample = b"".join(bytes(view[i * step:i * step + stripe]) for i in range(SAMPLE_STRIPES))
+    if not sample:
+        return 0.0
+    total = len(sample)
+    return math.log2(total) - sum(_COUNT_LOG2[count] for count in Counter(sample).values()) / total
+
+
+class ChunkCompressor:
+    """Compresses chunks for one container; safe to share between worker threads."""
+
+    def __init__(self, options: CompressionOptions):
+        self.options = options.resolved()
+        if self.options.codec == CODEC_ZSTD:
+            self._flag = CHUNK_ZSTD
+            self._zstd_level = self.options.level
+        else:
+            self._flag = CHUNK_ZLIB
+
+    def _compress(self, chunk) -> bytes:
+        if self._flag == CHUNK_ZSTD:
+            # ZstdCompressor objects are not thread-safe, so each call makes its own
+            return zstandard.ZstdCompressor(level=self._zstd_level).compress(chunk)
+        return zlib.compress(chunk, self.options.level)
+
+    def compress(self, chunk) -> Tuple[int, bytes]:
+        """Returns (codec flags, data); flags are 0 when the chunk is stored as is."""
+        mode = self.options.mode
+        if mode == MODE_OFF or not len(chunk):
+            return 0, chunk
+        if mode == MODE_AUTO and sample_entropy(chunk) > ENTROPY_THRESHOLD:
+            return 0, chunk
+        compressed = self._compress(chunk)
+        if len(compressed) > len(chunk) * (1 - MIN_SAVING):
+            return 0, chunk
+        return self._flag, compressed
+
+
+def decompress_chunk(flags: int, data, max_size: int) -> bytes:
+    """Reverses ChunkCompressor.compress, refusing output larger than `max_size`."""
+    codec = flags & CHUNK_CODEC_MASK
+    if codec == CHUNK_ZLIB:
+        decompressor = zlib.decompressobj()
+        plaintext = decompressor.decompress(data, max_size)
+        if decompressor.unconsumed_tail or not decompressor.eof:
+            raise ValueError("Corrupted compressed chunk")
+        return plaintext
+    if codec == CHUNK_ZSTD:
+        if zstandard is None:
+            raise ValueError("This file uses zstd compression; install the 'zstandard' package")
+        try:
+            return zstandard.ZstdDecompressor().decompress(data, max_output_size=max_size)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Corrupted compressed chunk: {e}")
+    raise ValueError(f"Unknown chunk codec flags: {flags:#x}")
+
+
+def benchmark_compression(path: str, modes=MODES, codec: Optional[str] = None,
+                          level: Optional[int] = None, repeat: int = 3) -> list:
+    """Encrypts `path` with each mode and reports the best throughput and the output size.
+
+    A cheap KDF setting is used so the numbers reflect the chunk pipeline only.
+    """
+    import os
+    import tempfile
+    import time
+    from .crypto_utils import encrypt_file
+    from .kdf_calibration import KdfParams
+
+    size = os.path.getsize(path)
+    report = []
+    with tempfile.TemporaryDirectory() as scratch:
+        output_path = os.path.join(scratch, "benchmark.enc")
+        for mode in modes:
+            options = CompressionOptions(mode, codec, level)
+            seconds = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                encrypt_file(path, "benchmark", output_path, kdf_params=KdfParams(1, 8, 1), compression=options)
+                seconds = min(seconds, time.perf_counter() - start)
+            report.append({"mode": mode, "seconds": seconds, "output_bytes": os.path.getsize(output_path),
+                           "throughput": size / seconds if seconds else 0.0})
+    return report
+
+
+if __name__ == "__main__":
+    import sys
+
+    for file_path in sys.argv[1:]:
+        rows = benchmark_compression(file_path)
+        baseline = rows[0]  # Compression off
+        print(f"{file_path} ({default_codec()})")
+        print(f"{'mode':>8} {'MB/s':>9} {'vs off':>8} {'size':>7}")
+        for row in rows:
+            print(f"{row['mode']:>8} {row['throughput'] / 1e6:>9.1f} "
+                  f"{row['throughput'] / (baseline['throughput'] or 1.0) - 1:>+8.0%} "
+                  f"{row['output_bytes'] / (baseline['output_bytes'] or 1):>7.2f}")
@@ -0,0 +1,311 @@
+"""Binary layout of the versioned (v2) encrypted container.
+
+A v2 file looks like this:
+
+    [preamble][fixed header][key slot][chunk 0]...[chunk N-1][sealed index][trailer]
+
+The preamble holds the magic, the format version and the lengths of the two
+header sections. The fixed header (flags, cipher id, chunk size, base nonce and the
+original extension) is bound to every chunk as associated data. The key slot
+holds the KDF parameters and salt, and the file's random data key wrapped under
+the password-derived key (older files use the derived key directly, or an HKDF
+subkey of it). Only the key slot changes when the password does.
+
+In compressed containers (FLAG_COMPRESSED) every chunk is preceded by a frame
+holding its ciphertext length and codec flags, and a zero-length frame ends the
+chunk data, so variable-sized chunks can still be read as a stream.
+The sealed index lists the offset and size of every chunk plus the total plaintext
+size, and marks the final chunk. Files written for incremental updates
+(FLAG_CHUNK_HASHES) also keep a keyed hash and a rewrite generation per chunk in
+the index; the generation is mixed into the chunk nonce, so a rewritten chunk never
+reuses a nonce. The trailer stores the index length so readers can find it from
+the end of the file.
+
+Files that do not start with MAGIC are legacy v1 files:
+salt + iv + ext_len + extension followed by raw GCM blobs.
+"""
+import struct
+from dataclasses import dataclass, field
+from typing import List, NamedTuple, Optional, Tuple
+
+MAGIC = b"AESF"
+INDEX_MAGIC = b"AESX"
+FORMAT_VERSION = 2
+
+CIPHER_AES_256_GCM = 1
+CIPHER_CHACHA20_POLY1305 = 2
+CIPHER_AES_256_GCM_SIV = 3
+KDF_ARGON2ID = 1
+KDF_ARGON2ID_HKDF = 2  # Session key from Argon2, per-file key from HKDF over a file salt
+KDF_ARGON2ID_WRAPPED = 3  # Random data key, wrapped with AES-GCM under the Argon2 key
+CIPHER_NAMES = {CIPHER_AES_256_GCM: "aes-256-gcm", CIPHER_CHACHA20_POLY1305: "chacha20-poly1305",
+                CIPHER_AES_256_GCM_SIV: "aes-256-gcm-siv"}  # See ciphers.py
+KDF_NAMES = {KDF_ARGON2ID: "argon2id", KDF_ARGON2ID_HKDF: "argon2id+hkdf", KDF_ARGON2ID_WRAPPED: "argon2id+wrapped-key"}
+
+FLAG_ARCHIVE = 0x01  # Header flag: the plaintext is a multi-file archive (see archive.py)
+FLAG_COMPRESSED = 0x02  # Header flag: chunks are framed and may be compressed (see compression.py)
+FLAG_CHUNK_HASHES = 0x04  # Header flag: the index keeps per-chunk hashes and generations (see incremental.py)
+
+CHUNK_FINAL = 0x01  # Index flag of the last chunk in the file
+CHUNK_ZLIB = 0x02  # Index/frame flag: the chunk plaintext was zlib-compressed before encryption
+CHUNK_ZSTD = 0x04  # Index/frame flag: the chunk plaintext was zstd-compressed before encryption
+CHUNK_CODEC_MASK = CHUNK_ZLIB | CHUNK_ZSTD
+
+WRAPPED_KEY_SIZE = 12 + 32 + 16  # nonce, data key, tag
+KEY_WRAP_AAD = b"key"  # Appended to the header AAD when wrapping the data key
+
+CHUNK_HASH_SIZE = 32
+MAX_GENERATION = 2**32 - 1
+
+MAX_CHUNK_SIZE = 64 * 1024 * 1024  # Sanity limit when parsing headers
+# The key slot is read before anything is authenticated, so a crafted file must not pin the KDF
+MAX_KDF_TIME_COST = 64
+MAX_KDF_MEMORY_COST = 4 * 1024 * 1024  # KiB (4 GiB)
+MAX_KDF_PARALLELISM = 64
+INDEX_AAD = b"index"  # Appended to the header AAD when sealing the index
+
+_PREAMBLE = struct.Struct('>4sBHH')  # magic, version, fixed_len, slot_len
+_FIXED = struct.Struct('>BBI12sB')  # flags, cipher_id, chunk_size, base_nonce, ext_len
+_ARGON2_SLOT = struct.Struct('>BIIB16s')  # kdf_id, time_cost, memory_cost, parallelism, salt
+_HKDF_SLOT = struct.Struct('>BIIB16s16s')  # Argon2 slot + per-file HKDF salt
+_WRAPPED_SLOT = struct.Struct(f'>BIIB16s{WRAPPED_KEY_SIZE}s')  # Argon2 slot + wrapped data key
+_INDEX_HEAD = struct.Struct('>QQ')  # total plaintext size, chunk count
+_INDEX_ENTRY = struct.Struct('>QIIB')  # offset, length, plain_size, flags
+_CHUNK_FRAME = struct.Struct('>IB')  # ciphertext length, codec flags
+_HASH_HEAD = struct.Struct('>I')  # current generation
+_CHUNK_STATE = struct.Struct(f'>I{CHUNK_HASH_SIZE}s')  # generation, keyed plaintext hash
+_TRAILER = struct.Struct('>Q4s')  # sealed index length, INDEX_MAGIC
+
+TRAILER_SIZE = _TRAILER.size
+FRAME_SIZE = _CHUNK_FRAME.size
+
+
+class ChunkEntry(NamedTuple):
+    """Location of one encrypted chunk inside the container."""
+    offset: int
+    length: int
+    plain_size: int
+    flags: int = 0
+
+
+@dataclass
+class ChunkIndex:
+    """Decrypted contents of the sealed index.
+
+    `extra` carries format-specific data stored after the chunk entries, such as the
+    member table of an archive. `hashes` and `generations` (one per chunk) and the
+    current `generation` are only present in containers with FLAG_CHUNK_HASHES.
+    """
+    entries: List[ChunkEntry]
+    total_size: int
+    extra: bytes = b""
+    hashes: List[bytes] = field(default_factory=list)
+    generations: List[int] = field(default_factory=list)
+    generation: int = 0
+
+    def generation_of(self, number: int) -> int:
+        """The generation chunk `number` was last written in (0 when not tracked)."""
+        return self.generations[number] if self.generations else 0
+
+
+@dataclass
+class Header:
+    """Parsed v2 container header."""
+    chunk_size: int
+    base_nonce: bytes
+    extension: bytes
+    salt: bytes
+    time_cost: int
+    memory_cost: int
+    parallelism: int
+    cipher_id: int = CIPHER_AES_256_GCM
+    kdf_id: int = KDF_ARGON2ID
+    subkey_salt: bytes = b""
+    wrapped_key: bytes = b""
+    flags: int = 0
+    version: int = FORMAT_VERSION
+
+    def fixed_bytes(self) -> bytes:
+        return _FIXED.pack(self.flags, self.cipher_id, self.chunk_size,
+                           self.base_nonce, len(self.extension)) + self.extension
+
+    def slot_bytes(self) -> bytes:
+        if self.kdf_id == KDF_ARGON2ID_WRAPPED:
+            return _WRAPPED_SLOT.pack(self.kdf_id, self.time_cost, self.memory_cost,
+                                      self.parallelism, self.salt, self.wrapped_key)
+        if self.kdf_id == KDF_ARGON2ID_HKDF:
+            return _HKDF_SLOT.pack(self.kdf_id, self.time_cost, self.memory_cost,
+                                   self.parallelism, self.salt, self.subkey_salt)
+        return _ARGON2_SLOT.pack(self.kdf_id, self.time_cost, self.memory_cost,
+                                 self.parallelism, self.salt)
+
+    @property
+    def aad(self) -> bytes:
+        """Associated data that authenticates the fixed header with every chunk."""
+        return MAGIC + bytes([self.version]) + self.fixed_bytes()
+
+    def slot_offset(self) -> int:
+        """Position of the key slot in the file; the slot is not part of the AAD."""
+        return _PREAMBLE.size + len(self.fixed_bytes())
+
+    def pack(self) -> bytes:
+        fixed = self.fixed_bytes()
+        slot = self.slot_bytes()
+        return _PREAMBLE.pack(MAGIC, self.version, len(fixed), len(slot)) + fixed + slot
+
+
+def check_kdf_params(time_cost: int, memory_cost: int, parallelism: int):
+    """Raises ValueError for Argon2 parameters outside the limits this format accepts."""
+    if not (1 <= time_cost <= MAX_KDF_TIME_COST and 1 <= parallelism <= MAX_KDF_PARALLELISM
+            and 8 * parallelism <= memory_cost <= MAX_KDF_MEMORY_COST):
+        raise ValueError(f"Key derivation parameters out of range: time_cost={time_cost}, "
+                         f"memory_cost={memory_cost}, parallelism={parallelism}")
+
+
+def read_header(infile) -> Optional[Header]:
+    """Reads a v2 header at the current position.
+
+    Returns None (and rewinds) when the file is a legacy v1 file. Streams that
+    cannot seek back raise ValueError instead.
+    """
+    start = infile.tell() if infile.seekable() else None
+    preamble = infile.read(_PREAMBLE.size)
+    if len(preamble) < _PREAMBLE.size or preamble[:4] != MAGIC:
+        if start is None:
+            raise ValueError("Legacy v1 files cannot be read from a stream")
+        infile.seek(start)
+        return None
+
+    _, version, fixed_len, slot_len = _PREAMBLE.unpack(preamble)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported container version: {version}")
+
+    fixed = infile.read(fixed_len)
+    slot = infile.read(slot_len)
+    if len(fixed) != fixed_len or len(slot) != slot_len or fixed_len < _FIXED.size:
+        raise ValueError("Truncated container header")
+
+    flags, cipher_id, chunk_size, base_nonce, ext_len = _FIXED.unpack_from(fixed)
+    extension = fixed[_FIXED.size:_FIXED.size + ext_len]
+    if cipher_id not in CIPHER_NAMES:
+        raise ValueError(f"Unsupported cipher id: {cipher_id}")
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError(f"Invalid chunk size in header: {chunk_size}")
+
+    subkey_salt = wrapped_key = b""
+    if slot_len >= _ARGON2_SLOT.size and slot[0] == KDF_ARGON2ID:
+        kdf_id, time_cost, memory_cost, parallelism, salt = _ARGON2_SLOT.unpack_from(slot)
+    elif slot_len >= _HKDF_SLOT.size and slot[0] == KDF_ARGON2ID_HKDF:
+        kdf_id, time_cost, memory_cost, parallelism, salt, subkey_salt = _HKDF_SLOT.unpack_from(slot)
+    elif slot_len >= _WRAPPED_SLOT.size and slot[0] == KDF_ARGON2ID_WRAPPED:
+        kdf_id, time_cost, memory_cost, parallelism, salt, wrapped_key = _WRAPPED_SLOT.unpack_from(slot)
+    else:
+        raise ValueError("Unsupported key derivation parameters")
+    check_kdf_params(time_cost, memory_cost, parallelism)
+
+    return Header(chunk_size=chunk_size, base_nonce=base_nonce, extension=extension,
+                  salt=salt, time_cost=time_cost, memory_cost=memory_cost,
+                  parallelism=parallelism, cipher_id=cipher_id, kdf_id=kdf_id,
+                  subkey_salt=subkey_salt, wrapped_key=wrapped_key, flags=flags, version=version)
+
+
+def has_chunk_hashes(header: Header) -> bool:
+    return bool(header.flags & FLAG_CHUNK_HASHES)
+
+
+def pack_index(index: ChunkIndex, with_hashes: bool = False) -> bytes:
+    """Serializes the chunk index (before sealing)."""
+    parts = [_INDEX_HEAD.pack(index.total_size, len(index.entries))]
+    parts.extend(_INDEX_ENTRY.pack(*entry) for entry in index.entries)
+    if with_hashes:
+        parts.append(_HASH_HEAD.pack(index.generation))
+        parts.extend(_CHUNK_STATE.pack(generation, digest)
+                     for generation, digest in zip(index.generations, index.hashes))
+    parts.append(index.extra)
+    return b"".join(parts)
+
+
+def unpack_index(data: bytes, with_hashes: bool = False) -> ChunkIndex:
+    """Parses a decrypted chunk index."""
+    if len(data) < _INDEX_HEAD.size:
+        raise ValueError("Malformed chunk index")
+    total_size, count = _INDEX_HEAD.unpack_from(data)
+    entries_end = _INDEX_HEAD.size + count * _INDEX_ENTRY.size
+    if len(data) < entries_end:
+        raise ValueError("Malformed chunk index")
+    entries = [ChunkEntry(*fields) for fields in
+               _INDEX_ENTRY.iter_unpack(data[_INDEX_HEAD.size:entries_end])]
+    index = ChunkIndex(entries, total_size)
+    if with_hashes:
+        states_start = entries_end + _HASH_HEAD.size
+        entries_end = states_start + count * _CHUNK_STATE.size
+        if len(data) < entries_end:
+            raise ValueError("Malformed chunk index")
+        (index.generation,) = _HASH_HEAD.unpack_from(data, states_start - _HASH_HEAD.size)
+        for generation, digest in _CHUNK_STATE.iter_unpack(data[states_start:entries_end]):
+            index.generations.append(generation)
+            index.hashes.append(digest)
+    index.extra = data[entries_end:]
+    return index
+
+
+def frame_size(header: Header) -> int:
+    """Bytes of framing before each chunk (and after the last one) in this container."""
+    return FRAME_SIZE if header.flags & FLAG_COMPRESSED else 0
+
+
+def pack_frame(length: int, flags: int) -> bytes:
+    return _CHUNK_FRAME.pack(length, flags)
+
+
+def unpack_frame(data: bytes) -> Tuple[int, int]:
+    """Returns (ciphertext length, codec flags); a zero length marks the end of the chunks."""
+    return _CHUNK_FRAME.unpack(data)
+
+
+def pack_trailer(index_len: int) -> bytes:
+    return _TRAILER.pack(index_len, INDEX_MAGIC)
+
+
+def unpack_trailer(data: bytes) -> Tuple[int, bytes]:
+    """Returns (sealed index length, magic) from the trailer bytes."""
+    return _TRAILER.unpack(data)
+
+
+def read_sealed_index(infile) -> Tuple[bytes, int]:
+    """Returns the sealed index blob and the offset at which it starts."""
+    infile.seek(0, 2)
+    file_size = infile.tell()
+    if file_size < TRAILER_SIZE:
+        raise ValueError("Truncated container: missing index")
+    infile.seek(file_size - TRAILER_SIZE)
+    index_len, magic = _TRAILER.unpack(infile.read(TRAILER_SIZE))
+    if magic != INDEX_MAGIC or index_len > file_size - TRAILER_SIZE:
+        raise ValueError("Truncated container: missing index")
+    index_offset = file_size - TRAILER_SIZE - index_len
+    infile.seek(index_offset)
+    return infile.read(index_len), index_offset
+
+
+def validate_index(index: ChunkIndex, header: Header, data_offset: int, index_offset: int):
+    """Checks that the chunks tile the data region and the final chunk is marked."""
+    entries = index.entries
+    frame = frame_size(header)
+    position = data_offset
+    plain_total = 0
+    for number, entry in enumerate(entries):
+        is_last = number == len(entries) - 1
+        position += frame
+        if entry.offset != position or entry.plain_size > header.chunk_size:
+            raise ValueError(f"Corrupted index at chunk {number}")
+        if bool(entry.flags & CHUNK_FINAL) != is_last:
+            raise ValueError(f"Final chunk marker misplaced at chunk {number}")
+        if entry.flags & CHUNK_CODEC_MASK and not frame:
+            raise ValueError(f"Compressed chunk {number} in an uncompressed container")
+        if index.generation_of(number) > index.generation:
+            raise ValueError(f"Chunk {number} is newer than the index")
+        position += entry.length
+        plain_total += entry.plain_size
+    position += frame  # End-of-chunks frame
+    if position != index_offset or plain_total != index.total_size:
+        raise ValueError("Chunk index does not match the container size")
@@ -1,13 +1,41 @@
 import os
-import datetime
 import ctypes
 import base64
+import hmac
+import mmap
+from bisect import bisect_right
+from collections import deque
+from dataclasses import replace
+from concurrent.futures import ThreadPoolExecutor
 from argon2 import PasswordHasher, low_level
+from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.exceptions import InvalidTag
+from . import container, metrics
+from .container import (ChunkEntry, ChunkIndex, Header, CHUNK_CODEC_MASK, CHUNK_FINAL,
+                        KDF_ARGON2ID_HKDF, KDF_ARGON2ID_WRAPPED)
+from .ciphers import Aead, make_aead, resolve_cipher
+from .compression import ChunkCompressor, CompressionOptions, MODE_OFF, decompress_chunk
+from .key_cache import KeyCache
+from .kdf_calibration import KdfParams, calibrated_params
 
-CHUNK_SIZE = 64 * 1024  # 64KB
+CHUNK_SIZE = 64 * 1024  # 64KB, used by legacy v1 files and small inputs
+MEDIUM_CHUNK_SIZE = 1024 * 1024  # 1MB
+LARGE_CHUNK_SIZE = 4 * 1024 * 1024  # 4MB
+NONCE_SIZE = 12  # AES-GCM nonce length
+TAG_SIZE = 16  # AES-GCM authentication tag length
+DEFAULT_WORKERS = os.cpu_count() or 1
+CHUNKS_IN_FLIGHT_PER_WORKER = 4  # Bounds the reorder buffer of the parallel engine
+MMAP_THRESHOLD = 64 * 1024 * 1024  # Inputs at least this large are memory-mapped
+SALT_SIZE = 16
+ARGON2_TIME_COST = 4  # Increased cost for better security
+ARGON2_MEMORY_COST = 2**16  # KiB
+ARGON2_PARALLELISM = 1
+HKDF_INFO = b"aes-file-encryptor file key"
+CHUNK_HASH_INFO = b"aes-file-encryptor chunk hash"
 ph = PasswordHasher()  # Argon2 Password Hasher
+key_cache = KeyCache()  # Argon2 outputs, reused across calls with the same password and salt
 
 def secure_erase(password: str):
     """Overwrites password in memory to prevent leakage."""
@@ -15,108 +43,790 @@ def secure_erase(password: str):
     buf = ctypes.create_string_buffer(length)
     ctypes.memset(buf, 0, length)  # Zero out memory
 
-def derive_key(password: str, salt: bytes) -> bytes:
-    """Derives a key using Argon2 with a fixed output length."""
+def derive_key(password: str, salt: bytes, time_cost: int = ARGON2_TIME_COST,
+               memory_cost: int = ARGON2_MEMORY_COST, parallelism: int = ARGON2_PARALLELISM,
+               use_cache: bool = True) -> bytes:
+    """Derives a key using Argon2 with a fixed output length.
+
+    Results are kept in `key_cache` for a short TTL, so repeated derivations with the
+    same password, salt and parameters skip Argon2.
+    """
+    params = (time_cost, memory_cost, parallelism)
+
+    def run_argon2():
+        with metrics.stage("kdf"):
+            return low_level.hash_secret_raw(
+                secret=password.encode(),
+                salt=salt,
+                time_cost=time_cost,
+                memory_cost=memory_cost,
+                parallelism=parallelism,
+                hash_len=32,  # Ensure 32-byte output for AES-256
+                type=low_level.Type.ID
+            )
+
     try:
-        key = low_level.hash_secret_raw(
-            secret=password.encode(),
-            salt=salt,
-            time_cost=4,  # Increased cost for better security
-            memory_cost=2**16,
-            parallelism=1,
-            hash_len=32,  # Ensure 32-byte output for AES-256
-            type=low_level.Type.ID
-        )
-
-        print(f"[DEBUG] Derived Key: {key.hex()} | Salt: {salt.hex()}")  # Print key for verification
-        return key
+        if use_cache:
+            return key_cache.get_or_derive(password, salt, params, run_argon2)
+        return run_argon2()
     except Exception as e:
         raise ValueError(f"Key derivation failed: {str(e)}")
     finally:
         secure_erase(password)  # Ensure password is erased from memory
 
-def encrypt_file(input_path: str, password: str, output_path: str):
-    """Encrypts a file using AES-256-GCM and stores the original extension."""
-    salt = os.urandom(16)
-    iv = os.urandom(12)  # AES-GCM IV should be 12 bytes
-    key = derive_key(password, salt)
-    aesgcm = AESGCM(key)
+def default_kdf_params() -> KdfParams:
+    """Argon2 parameters for new files: the calibrated ones if calibrate_kdf() ran or saved any."""
+    return calibrated_params() or KdfParams(ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM)
 
-    print(f"[DEBUG] Derived Key: {key.hex()} | Salt: {salt.hex()}")  # Print key for verification
+def derive_file_key(master_key: bytes, file_salt: bytes) -> bytes:
+    """Derives a per-file key from a session master key with HKDF-SHA256."""
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=file_salt, info=HKDF_INFO).derive(master_key)
 
-    original_extension = os.path.splitext(input_path)[1].encode()
-    ext_len = len(original_extension)
+def wrap_data_key(wrap_key: bytes, data_key: bytes, header: Header) -> bytes:
+    """Encrypts a file's data key under the password-derived key, bound to the header."""
+    nonce = os.urandom(NONCE_SIZE)
+    return nonce + AESGCM(wrap_key).encrypt(nonce, data_key, header.aad + container.KEY_WRAP_AAD)
 
-    with open(input_path, 'rb') as infile, open(output_path, 'wb') as outfile:
-        outfile.write(salt + iv + bytes([ext_len]) + original_extension)  # Store metadata
+def unwrap_data_key(wrap_key: bytes, header: Header) -> bytes:
+    """Recovers the data key from the key slot. Raises InvalidTag for a wrong password."""
+    wrapped = header.wrapped_key
+    return AESGCM(wrap_key).decrypt(wrapped[:NONCE_SIZE], wrapped[NONCE_SIZE:],
+                                    header.aad + container.KEY_WRAP_AAD)
+
+class KeySession:
+    """Runs Argon2 once for a batch; each file's random data key is wrapped under the session key.
+
+    Files encrypted with a session store the session salt and Argon2 parameters, so
+    they decrypt on their own with just the password.
+    """
+
+    def __init__(self, password: str, kdf_params: KdfParams = None):
+        self.salt = os.urandom(SALT_SIZE)
+        self.kdf_params = kdf_params or default_kdf_params()
+        self._master_key = bytearray(derive_key(password, self.salt, *self.kdf_params, use_cache=False))
+
+    def wrap_key(self) -> bytes:
+        if self._master_key is None:
+            raise ValueError("Key session is closed")
+        return bytes(self._master_key)
+
+    def close(self):
+        """Zeroes the master key."""
+        if self._master_key is not None:
+            for i in range(len(self._master_key)):
+                self._master_key[i] = 0
+            self._master_key = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def header_key(password: str, header: Header) -> bytes:
+    """Derives (or unwraps) the data key described by a v2 header's key slot.
+
+    Raises InvalidTag when a wrapped key does not open, i.e. the password is wrong.
+    """
+    key = derive_key(password, header.salt, header.time_cost, header.memory_cost, header.parallelism)
+    if header.kdf_id == KDF_ARGON2ID_WRAPPED:
+        return unwrap_data_key(key, header)
+    if header.kdf_id == KDF_ARGON2ID_HKDF:
+        return derive_file_key(key, header.subkey_salt)
+    return key
+
+def chunk_nonce(base_nonce: bytes, index: int, generation: int = 0) -> bytes:
+    """Derives the nonce of chunk `index` by XOR-ing the index into the base nonce.
+
+    The rewrite generation of incrementally updated files goes into the top 32 bits,
+    above any possible chunk index.
+    """
+    value = int.from_bytes(base_nonce, 'big') ^ (generation << 64) ^ index
+    return value.to_bytes(NONCE_SIZE, 'big')
+
+def max_in_flight(workers: int = None) -> int:
+    """Number of chunks parallel_map keeps queued or waiting to be yielded."""
+    workers = max(1, workers or DEFAULT_WORKERS)
+    return 1 if workers == 1 else workers * CHUNKS_IN_FLIGHT_PER_WORKER
+
+def parallel_map(transform, chunks, workers: int = None):
+    """Applies transform(index, chunk) on a thread pool and yields the results in order.
+
+    The AEAD ciphers release the GIL, so threads scale across cores. Results wait in a bounded
+    reorder buffer, which keeps memory at a few chunks per worker for any input size.
+    """
+    workers = max(1, workers or DEFAULT_WORKERS)
+    if workers == 1:
+        for index, chunk in enumerate(chunks):
+            yield transform(index, chunk)
+        return
+
+    limit = max_in_flight(workers)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            for index, chunk in enumerate(chunks):
+                if len(pending) >= limit:
+                    yield pending.popleft().result()
+                pending.append(pool.submit(transform, index, chunk))
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+def read_chunks(infile, size: int):
+    """Yields successive blocks of `size` bytes from an open binary file."""
+    while chunk := infile.read(size):
+        yield chunk
+
+def fill_buffer(stream, buffer) -> int:
+    """Reads from `stream` until `buffer` is full or the stream ends; returns the byte count."""
+    view = memoryview(buffer)
+    filled = 0
+    while filled < len(view):
+        count = stream.readinto(view[filled:])
+        if not count:
+            break
+        filled += count
+    return filled
+
+def read_chunks_into(stream, size: int, ring: int = 2):
+    """Yields memoryview chunks of `size` bytes read into a ring of reused buffers.
+
+    A buffer is refilled `ring` chunks later, so a consumer may still hold the
+    previous ring - 1 chunks while the current one is read.
+    """
+    buffers = [bytearray(size) for _ in range(ring)]
+    number = 0
+    while True:
+        buffer = buffers[number % ring]
+        filled = fill_buffer(stream, buffer)
+        if not filled:
+            return
+        yield memoryview(buffer)[:filled]
+        if filled < size:
+            return
+        number += 1
+
+def choose_chunk_size(file_size: int) -> int:
+    """Picks a chunk size for the input: larger chunks amortize per-chunk cost on big files."""
+    if file_size >= 1024**3:
+        return LARGE_CHUNK_SIZE
+    if file_size >= 64 * 1024**2:
+        return MEDIUM_CHUNK_SIZE
+    return CHUNK_SIZE
 
-        while chunk := infile.read(CHUNK_SIZE):
-            ciphertext = aesgcm.encrypt(iv, chunk, None)
-            outfile.write(ciphertext) # Write encrypted data
+def read_entries(infile, entries):
+    """Yields the ciphertext of each indexed chunk, in order, skipping any chunk frames."""
+    for entry in entries:
+        if infile.tell() != entry.offset:
+            infile.seek(entry.offset)
+        yield infile.read(entry.length)
 
-    print(f"[DEBUG] Encryption Complete - File saved at: {output_path}")  
+def chunk_hash_key(key: bytes) -> bytes:
+    """Derives the key of the per-chunk plaintext hashes from the file key."""
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=CHUNK_HASH_INFO).derive(key)
 
-def decrypt_file(input_path: str, password: str, output_path: str) -> str:
-    """Decrypts a file using AES-256-GCM and restores the original extension."""
+def chunk_digest(hash_key: bytes, chunk) -> bytes:
+    """Keyed hash (HMAC-SHA256) of a chunk's plaintext; without the key it reveals nothing about the data."""
+    return hmac.digest(hash_key, chunk, 'sha256')
+
+def chunk_aad(header: Header, aad: bytes, flags: int) -> bytes:
+    """Per-chunk associated data; compressed containers also bind each chunk's codec flags."""
+    if header.flags & container.FLAG_COMPRESSED:
+        return aad + bytes([flags & CHUNK_CODEC_MASK])
+    return aad
+
+def open_chunk(aead: Aead, header: Header, aad: bytes, number: int, flags: int, chunk,
+               expected_size: int = None, generation: int = 0) -> bytes:
+    """Decrypts chunk `number` and undoes its compression, if any.
+
+    Raises InvalidTag for a bad chunk and ValueError for corrupt compressed data.
+    """
+    plaintext = aead.decrypt(chunk_nonce(header.base_nonce, number, generation), chunk,
+                               chunk_aad(header, aad, flags))
+    if flags & CHUNK_CODEC_MASK:
+        plaintext = decompress_chunk(flags, plaintext, header.chunk_size)
+        if expected_size is not None and len(plaintext) != expected_size:
+            raise ValueError(f"Chunk {number} does not match its indexed size")
+    return plaintext
+
+def map_file(infile):
+    """Memory-maps an open file read-only, hinting sequential access where supported."""
+    mapped = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+    return mapped
+
+def unmap(mapped):
+    """Closes a mapping; after an error, slices still held elsewhere keep it alive until freed."""
     try:
-        with open(input_path, 'rb') as infile:
-            salt = infile.read(16)  # Read stored salt
-            iv = infile.read(12)  # Read stored IV
-            ext_len = int.from_bytes(infile.read(1), 'big')  # Read extension length
-            original_extension = infile.read(ext_len).decode()  # Read original extension
+        mapped.close()
+    except BufferError:
+        pass
+
+def _mapped_slices(mapped, spans, window: int):
+    """Yields memoryview slices of a mapping for each (start, stop) span, without copying.
+
+    Pages of spans more than `window` chunks behind have been processed, so they are
+    dropped from the resident set as the mapping is walked (where madvise is available).
+    """
+    can_release = hasattr(mapped, "madvise") and hasattr(mmap, "MADV_DONTNEED")
+    behind = deque()
+    released = 0
+    with memoryview(mapped) as view:
+        for start, stop in spans:
+            yield view[start:stop]
+            behind.append(stop)
+            if can_release and len(behind) > window:
+                done = behind.popleft() // mmap.PAGESIZE * mmap.PAGESIZE
+                if done > released:
+                    mapped.madvise(mmap.MADV_DONTNEED, released, done - released)
+                    released = done
+
+def mapped_chunks(mapped, size: int, window: int):
+    """Yields `size`-byte slices of a whole mapping; see _mapped_slices."""
+    spans = ((offset, min(offset + size, len(mapped))) for offset in range(0, len(mapped), size))
+    return _mapped_slices(mapped, spans, window)
+
+def mapped_entries(mapped, entries, window: int):
+    """Yields the indexed chunks of a mapped container; see _mapped_slices."""
+    return _mapped_slices(mapped, ((entry.offset, entry.offset + entry.length) for entry in entries), window)
+
+def preallocate(outfile, size: int):
+    """Reserves `size` bytes for an output file up front, where the platform supports it."""
+    if size > 0 and hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(outfile.fileno(), 0, size)
+        except OSError:
+            pass  # Not supported by this filesystem; writes still extend the file
+
+def seal_index(aead: Aead, header: Header, index: ChunkIndex) -> bytes:
+    """Encrypts the chunk index under a fresh random nonce and appends the trailer."""
+    nonce = os.urandom(NONCE_SIZE)
+    sealed = nonce + aead.encrypt(nonce, container.pack_index(index, container.has_chunk_hashes(header)),
+                                    header.aad + container.INDEX_AAD)
+    return sealed + container.pack_trailer(len(sealed))
+
+def write_index(outfile, aead: Aead, header: Header, index: ChunkIndex, index_offset: int):
+    """Writes the sealed index and trailer at `index_offset`, ends the file there and syncs it."""
+    outfile.seek(index_offset)
+    outfile.write(seal_index(aead, header, index))
+    outfile.truncate()
+    outfile.flush()
+    os.fsync(outfile.fileno())
+
+def open_index(infile, aead: Aead, header: Header):
+    """Reads, authenticates and validates the chunk index of a v2 file.
+
+    Returns a ChunkIndex. Raises InvalidTag for a wrong password or a tampered index
+    and ValueError for a truncated or inconsistent container.
+    """
+    data_offset = infile.tell()
+    sealed, index_offset = container.read_sealed_index(infile)
+    if len(sealed) < NONCE_SIZE + TAG_SIZE:
+        raise ValueError("Truncated container: missing index")
+    plaintext = aead.decrypt(sealed[:NONCE_SIZE], sealed[NONCE_SIZE:],
+                               header.aad + container.INDEX_AAD)
+    index = container.unpack_index(plaintext, container.has_chunk_hashes(header))
+    container.validate_index(index, header, data_offset, index_offset)
+    return index
+
+def seal_chunks(aead: Aead, header: Header, chunks, index: ChunkIndex, offset: int, first: int = 0,
+                generation: int = 0, compressor: ChunkCompressor = None, hash_key: bytes = None,
+                workers: int = None, progress=None, operation: metrics.Operation = metrics.NO_OPERATION):
+    """Encrypts plaintext chunks numbered from `first`, yielding the bytes to write at `offset`.
+
+    Each chunk's entry (and, with `hash_key`, its keyed hash and `generation`) is added
+    to `index` as it is yielded. Compressed chunks get their frame; the caller writes
+    the end-of-chunks frame and marks the final chunk. Stage timings go to `operation`.
+    """
+    aad = header.aad
+    # Stage timing hooks; the plain functions when metrics are off
+    compress = operation.timed("compress", compressor.compress) if compressor else None
+    encrypt = operation.timed("encrypt", aead.encrypt)
+    digest_of = operation.timed("hash", chunk_digest)
+
+    def encrypt_chunk(number, chunk):
+        codec, data = compress(chunk) if compressor else (0, chunk)
+        nonce = chunk_nonce(header.base_nonce, first + number, generation)
+        ciphertext = encrypt(nonce, data, chunk_aad(header, aad, codec))
+        digest = digest_of(hash_key, chunk) if hash_key else None
+        return len(chunk), codec, ciphertext, digest
+
+    for plain_size, codec, ciphertext, digest in parallel_map(encrypt_chunk, chunks, workers):
+        if compressor:
+            yield container.pack_frame(len(ciphertext), codec)
+            offset += container.FRAME_SIZE
+        yield ciphertext
+        index.entries.append(ChunkEntry(offset, len(ciphertext), plain_size, codec))
+        if digest is not None:
+            index.hashes.append(digest)
+            index.generations.append(generation)
+        offset += len(ciphertext)
+        index.total_size += plain_size
+        if progress:
+            progress(plain_size)
+
+def new_header(password: str, extension: bytes, chunk_size: int, flags: int = 0, session: KeySession = None,
+               kdf_params: KdfParams = None, cipher: str = None):
+    """Builds the header of a new v2 container and its random data key.
+
+    Returns (header, data key). The data key is wrapped into the key slot under the
+    password-derived key (or the session key), so the KDF runs here.
+    """
+    kdf_params = session.kdf_params if session is not None else kdf_params or default_kdf_params()
+    container.check_kdf_params(*kdf_params)
+    header = Header(
+        chunk_size=chunk_size,
+        base_nonce=os.urandom(NONCE_SIZE),
+        extension=extension,
+        salt=os.urandom(SALT_SIZE),
+        time_cost=kdf_params.time_cost,
+        memory_cost=kdf_params.memory_cost,
+        parallelism=kdf_params.parallelism,
+        cipher_id=resolve_cipher(cipher),
+        flags=flags,
+    )
+    if session is not None:
+        header.salt = session.salt
+        wrap_key = session.wrap_key()
+    else:
+        wrap_key = derive_key(password, header.salt, header.time_cost, header.memory_cost, header.parallelism)
+    # Data is encrypted under a random key, so a password change only re-wraps it (see rekey)
+    key = os.urandom(32)
+    header.kdf_id = KDF_ARGON2ID_WRAPPED
+    header.wrapped_key = wrap_data_key(wrap_key, key, header)
+    return header, key
+
+def encrypt_stream(stream, password: str, extension: bytes = b"", size_hint: int = None,
+                   workers: int = None, chunk_size: int = None, session: KeySession = None,
+                   kdf_params: KdfParams = None, progress=None, flags: int = 0, index_extra=None,
+                   compression: CompressionOptions = None, incremental: bool = False, cipher: str = None,
+                   operation: metrics.Operation = None):
+    """Encrypts a readable binary stream into a v2 container, yielding it piece by piece.
+
+    The key is derived before this returns, so KDF errors surface immediately. Input
+    is read into a ring of reused buffers and passed on as memoryview slices, so peak
+    memory stays at a few chunks whatever the input size. An mmap.mmap `stream` is
+    encrypted in full by slicing the mapping instead. `size_hint` (the expected
+    input size, if known) picks the chunk size. `progress(byte_count)` is called after
+    each chunk with the plaintext bytes it covered. `index_extra()`, if given, is called
+    once the input is exhausted and its bytes are sealed into the index.
+    `compression` (see compression.py) compresses chunks before they are encrypted.
+    `incremental` keeps keyed chunk hashes in the index so the file can later be
+    updated in place (see incremental.py). `cipher` names the AEAD cipher, or "auto"
+    for the fastest one on this host (see ciphers.py); the default is AES-256-GCM.
+    Timings are reported to `operation` (see metrics.py), or to a new "encrypt" one.
+    """
+    operation = operation or metrics.Operation("encrypt")
+    compressor = None
+    if compression is not None and compression.mode != MODE_OFF:
+        compressor = ChunkCompressor(compression)
+        flags |= container.FLAG_COMPRESSED
+    if incremental:
+        if flags & (container.FLAG_COMPRESSED | container.FLAG_ARCHIVE):
+            raise ValueError("Incremental files cannot be compressed or archives")
+        flags |= container.FLAG_CHUNK_HASHES
+    header, key = new_header(password, extension, chunk_size or choose_chunk_size(size_hint or 0), flags,
+                             session, kdf_params, cipher)
+    aead = make_aead(header.cipher_id, key)
+    hash_key = chunk_hash_key(key) if incremental else None
 
-            print(f"[DEBUG] Decryption - Extracted Salt: {salt.hex()} | IV: {iv.hex()} | Original Extension: {original_extension}")
+    def generate():
+        header_bytes = header.pack()
+        yield header_bytes  # Store metadata
 
-            key = derive_key(password, salt)  # Derive key from extracted salt
-            print(f"[DEBUG] Decryption - Derived Key: {key.hex()}")
+        if isinstance(stream, mmap.mmap):
+            chunks = mapped_chunks(stream, header.chunk_size, max_in_flight(workers) + 1)
+        else:
+            chunks = read_chunks_into(stream, header.chunk_size, max_in_flight(workers) + 1)
+        index = ChunkIndex([], 0)
+        try:
+            yield from seal_chunks(aead, header, operation.timed_iter("read", chunks), index, len(header_bytes),
+                                   compressor=compressor, hash_key=hash_key, workers=workers, progress=progress,
+                                   operation=operation)
+            if compressor:
+                yield container.pack_frame(0, 0)  # End of chunks
 
-            aesgcm = AESGCM(key)
+            if index.entries:
+                index.entries[-1] = index.entries[-1]._replace(flags=index.entries[-1].flags | CHUNK_FINAL)
+            index.extra = index_extra() if index_extra else b""
+            yield seal_index(aead, header, index)
+        except Exception:
+            operation.failed()
+            raise
+        operation.done(index.total_size)
 
-            decrypted_output_path = output_path + original_extension  # Restore extension
+    return generate()
 
-            with open(decrypted_output_path, 'wb') as outfile:
-                while chunk := infile.read(CHUNK_SIZE + 16):  # GCM adds 16-byte tag
+def encrypt_file(input_path: str, password: str, output_path: str, workers: int = None,
+                 chunk_size: int = None, session: KeySession = None, kdf_params: KdfParams = None,
+                 progress=None, compression: CompressionOptions = None, incremental: bool = False,
+                 cipher: str = None):
+    """Encrypts a file using AES-256-GCM (or another `cipher`, see ciphers.py) into a v2 container and stores the original extension.
+
+    Chunks are encrypted in parallel on `workers` threads (defaults to the CPU count),
+    each under its own nonce derived from the base nonce and the chunk index. The chunk
+    size is picked from the input size unless given, and recorded in the header.
+    With a KeySession the per-file key comes from HKDF instead of a fresh Argon2 run.
+    The Argon2 parameters used (see default_kdf_params) are stored in the header.
+    `compression` enables per-chunk compression before encryption (see compression.py).
+    `incremental` prepares the file for update_encrypted_file (see incremental.py).
+    """
+    extension = os.path.splitext(input_path)[1].encode()
+    size = os.path.getsize(input_path)
+    operation = metrics.Operation("encrypt")
+    with open(input_path, 'rb') as infile, open(output_path, 'wb') as outfile:
+        # Large inputs are memory-mapped so chunks are sliced from the page cache, not copied
+        source = map_file(infile) if size >= MMAP_THRESHOLD else infile
+        try:
+            pieces = encrypt_stream(source, password, extension, size, workers, chunk_size,
+                                    session, kdf_params, progress, compression=compression,
+                                    incremental=incremental, cipher=cipher, operation=operation)
+            write = operation.timed("write", outfile.write)
+            for piece in pieces:
+                write(piece) # Write encrypted data
+        finally:
+            if source is not infile:
+                unmap(source)
+
+def _decrypt_legacy(infile, password: str, output_path: str, workers: int = None, progress=None,
+                    operation: metrics.Operation = metrics.NO_OPERATION) -> str:
+    """Decrypts a legacy v1 file (salt + iv + extension, one shared IV for all chunks)."""
+    salt = infile.read(SALT_SIZE)  # Read stored salt
+    iv = infile.read(NONCE_SIZE)  # Read stored IV
+    ext_len = int.from_bytes(infile.read(1), 'big')  # Read extension length
+    original_extension = infile.read(ext_len).decode()  # Read original extension
+
+    key = derive_key(password, salt)  # Derive key from extracted salt
+    decrypt = operation.timed("decrypt", AESGCM(key).decrypt)
+
+    def decrypt_chunk(index, chunk):
+        return decrypt(iv, chunk, None)
+
+    decrypted_output_path = output_path + original_extension  # Restore extension
+    with open(decrypted_output_path, 'wb') as outfile:
+        chunks = read_chunks(infile, CHUNK_SIZE + TAG_SIZE)  # GCM adds 16-byte tag
+        write = operation.timed("write", outfile.write)
+        for decrypted_chunk in parallel_map(decrypt_chunk, operation.timed_iter("read", chunks), workers):
+            write(decrypted_chunk)
+            if progress:
+                progress(len(decrypted_chunk) + TAG_SIZE)
+    return decrypted_output_path
+
+def decrypt_file(input_path: str, password: str, output_path: str, workers: int = None,
+                 progress=None) -> str:
+    """Decrypts a v2 or legacy v1 file and restores the original extension.
+
+    The chunk index is authenticated before any plaintext is written, so a wrong
+    password or a truncated file fails fast without decrypting the data.
+    `progress(byte_count)` is called after each chunk with the ciphertext bytes consumed.
+    """
+    operation = metrics.Operation("decrypt")
+    try:
+        with open(input_path, 'rb') as infile:
+            header = container.read_header(infile)
+            try:
+                if header is None:
+                    decrypted_output_path = _decrypt_legacy(infile, password, output_path, workers, progress,
+                                                            operation)
+                else:
+                    if header.flags & container.FLAG_ARCHIVE:
+                        raise ValueError("File is an archive; extract it with backend.archive")
+                    aead, index = unlock_container(infile, password, header)
+                    aad = header.aad
+                    open_ = operation.timed("decrypt", open_chunk)  # Includes decompression
+
+                    def decrypt_chunk(number, chunk):
+                        entry = index.entries[number]
+                        return open_(aead, header, aad, number, entry.flags, chunk, entry.plain_size,
+                                     index.generation_of(number))
+
+                    # Large files are memory-mapped so chunks are sliced from the page cache, not copied
+                    mapped = map_file(infile) if index.total_size >= MMAP_THRESHOLD else None
+                    if mapped is not None:
+                        chunks = mapped_entries(mapped, index.entries, max_in_flight(workers) + 1)
+                    else:
+                        chunks = read_entries(infile, index.entries)
+
+                    decrypted_output_path = output_path + header.extension.decode()  # Restore extension
                     try:
-                        decrypted_chunk = aesgcm.decrypt(iv, chunk, None)
-                        outfile.write(decrypted_chunk)
-                    except InvalidTag:
-                        print("Decryption failed: Incorrect password or corrupted file.")
-                        return None  # Decryption failed
+                        with open(decrypted_output_path, 'wb') as outfile:
+                            preallocate(outfile, index.total_size)
+                            write = operation.timed("write", outfile.write)
+                            chunks = operation.timed_iter("read", chunks)
+                            for decrypted_chunk in parallel_map(decrypt_chunk, chunks, workers):
+                                write(decrypted_chunk)
+                                if progress:
+                                    progress(len(decrypted_chunk) + TAG_SIZE)
+                    finally:
+                        if mapped is not None:
+                            unmap(mapped)
+            except InvalidTag:
+                operation.failed()
+                return None  # Wrong password or corrupted file; callers report it
 
-        print(f"[DEBUG] Decryption Successful - File saved at: {decrypted_output_path}")
+        operation.done(os.path.getsize(decrypted_output_path))
         return decrypted_output_path  # Return correct filename
-    except Exception as e:
-        print(f"[DEBUG] Decryption Error: {str(e)}")
+    except Exception:
+        operation.failed()  # Counted in aes_operation_errors_total; callers log the event
         return None
 
-# Ensure LOG_FILE is defined (it should already be in crypto_utils.py)
-LOG_FILE = "encryption_history.log"  # If not already present, add this line
+MAX_STREAM_TAIL = 16 * 1024 * 1024  # Bound on the index read from the end of a stream
 
-def log_event(event_type, filename, status, output_path=None):
-    """Logs encryption & decryption events to a file, including output path."""
-    with open(LOG_FILE, "a") as log:
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # Include output_path in the log
-        log.write(f"[{timestamp}] {event_type} - {filename} - {status} - {output_path or ''}\n")
-    print(f"Logged event: {event_type} - {filename} - {status} - {output_path or ''}")
-
-def get_full_history():
-    """Fetches the complete encryption history."""
+def _open_stream_tail(tail: bytes, aead: Aead, aad: bytes):
+    """Splits the end of a streamed container into (chunk data length, index).
+
+    `tail` holds everything after the last chunk read so far: any remaining chunk
+    data, the sealed index and the trailer. Raises InvalidTag for a bad index.
+    """
+    if len(tail) < container.TRAILER_SIZE:
+        raise ValueError("Truncated container: missing index")
+    index_len, magic = container.unpack_trailer(tail[-container.TRAILER_SIZE:])
+    data_len = len(tail) - container.TRAILER_SIZE - index_len
+    if magic != container.INDEX_MAGIC or data_len < 0 or index_len < NONCE_SIZE + TAG_SIZE:
+        raise ValueError("Truncated container: missing index")
+    sealed = tail[data_len:data_len + index_len]
+    plaintext = aead.decrypt(sealed[:NONCE_SIZE], sealed[NONCE_SIZE:], aad + container.INDEX_AAD)
+    return data_len, container.unpack_index(plaintext)
+
+def _read_stream_tail(stream) -> bytes:
+    tail = stream.read(MAX_STREAM_TAIL)
+    if stream.read(1):
+        raise ValueError("Incorrect password, corrupted file, or too much appended data to read as a stream")
+    return tail
+
+def decrypt_stream(stream, password: str):
+    """Decrypts a v2 container read from a forward-only stream.
+
+    Returns (header, pieces) where `pieces` yields the plaintext. The index sits at
+    the end of the container, so full-sized chunks are decrypted as they arrive.
+    The first block that does not authenticate as a full chunk starts the tail
+    (final chunk, sealed index and trailer), which is then checked against the
+    index. Appended files whose short chunks are followed by more than
+    MAX_STREAM_TAIL bytes need decrypt_file. Compressed containers frame every chunk, so they are read frame by frame
+    instead. Truncation or tampering raises ValueError from the generator.
+    """
+    header = container.read_header(stream)
+    if header is None:
+        raise ValueError("Legacy v1 files cannot be decrypted as a stream")
+    if header.flags & container.FLAG_ARCHIVE:
+        raise ValueError("File is an archive; extract it with backend.archive")
+    if container.has_chunk_hashes(header):
+        raise ValueError("Incrementally updated files need random access; use decrypt_file")
+    operation = metrics.Operation("decrypt")
+    try:
+        aead = make_aead(header.cipher_id, header_key(password, header))
+    except InvalidTag:
+        raise ValueError("Incorrect password or corrupted file")  # The data key did not unwrap
+    aad = header.aad
+    block_size = header.chunk_size + TAG_SIZE
+    data_offset = len(header.pack())
+    decrypt = operation.timed("decrypt", aead.decrypt)
+    open_ = operation.timed("decrypt", open_chunk)
+
+    def counted(pieces):
+        """Passes plaintext pieces through and records the operation when they run out."""
+        total = 0
+        try:
+            for piece in pieces:
+                total += len(piece)
+                yield piece
+        except Exception:
+            operation.failed()
+            raise
+        operation.done(total)
+
+    def generate():
+        buffer = bytearray(block_size)
+        index = 0
+        while True:
+            filled = fill_buffer(stream, buffer)
+            if filled == block_size:
+                try:
+                    yield decrypt(chunk_nonce(header.base_nonce, index), memoryview(buffer), aad)
+                    index += 1
+                    continue
+                except InvalidTag:
+                    pass  # Either the tail or a bad chunk; the index decides
+            break
+
+        tail = bytes(buffer[:filled]) + _read_stream_tail(stream)
+        try:
+            data_len, chunk_index = _open_stream_tail(tail, aead, aad)
+            tail_offset = data_offset + index * block_size
+            container.validate_index(chunk_index, header, data_offset, tail_offset + data_len)
+            entries = chunk_index.entries
+            if len(entries) < index or any(entry.length != block_size for entry in entries[:index]):
+                raise ValueError("Chunk index does not match the stream")
+            # Usually just the final chunk; appended files (see append.py) can have several short ones
+            for number in range(index, len(entries)):
+                start = entries[number].offset - tail_offset
+                yield decrypt(chunk_nonce(header.base_nonce, number), tail[start:start + entries[number].length],
+                              aad)
+        except InvalidTag:
+            raise ValueError("Incorrect password or corrupted file")
+
+    def generate_framed():
+        frame = bytearray(container.FRAME_SIZE)
+        buffer = bytearray(block_size)
+        seen = []  # (codec flags, plaintext size) per chunk, checked against the index
+        position = data_offset
+        try:
+            while True:
+                if fill_buffer(stream, frame) != len(frame):
+                    raise ValueError("Truncated container")
+                position += len(frame)
+                length, codec = container.unpack_frame(frame)
+                if not length:
+                    break  # End of chunks
+                if length > block_size or fill_buffer(stream, memoryview(buffer)[:length]) != length:
+                    raise ValueError("Truncated or corrupted chunk")
+                plaintext = open_(aead, header, aad, len(seen), codec, memoryview(buffer)[:length])
+                seen.append((codec, len(plaintext)))
+                position += length
+                yield plaintext
+
+            data_len, chunk_index = _open_stream_tail(_read_stream_tail(stream), aead, aad)
+            container.validate_index(chunk_index, header, data_offset, position)
+            indexed = [(entry.flags & CHUNK_CODEC_MASK, entry.plain_size) for entry in chunk_index.entries]
+            if data_len or indexed != seen:
+                raise ValueError("Chunk index does not match the stream")
+        except InvalidTag:
+            raise ValueError("Incorrect password or corrupted file")
+
+    if header.flags & container.FLAG_COMPRESSED:
+        return header, counted(generate_framed())
+    return header, counted(generate())
+
+def unlock_container(infile, password: str, header: Header):
+    """Derives the key of a v2 file and opens its index.
+
+    Returns (aead, index). Raises InvalidTag for a wrong password.
+    """
+    aead = make_aead(header.cipher_id, header_key(password, header))
+    return aead, open_index(infile, aead, header)
+
+def open_container(infile, password: str):
+    """Reads the header and authenticated index of a v2 file.
+
+    Returns (header, aead, index). Raises ValueError for legacy v1
+    files, a wrong password or a corrupted container.
+    """
+    header = container.read_header(infile)
+    if header is None:
+        raise ValueError("Legacy v1 files do not support random access; re-encrypt the file")
     try:
-        with open(LOG_FILE, "r") as f:
-            return f.read().strip()
-    except FileNotFoundError:
+        aead, index = unlock_container(infile, password, header)
+    except InvalidTag:
+        raise ValueError("Incorrect password or corrupted file")
+    return header, aead, index
+
+def iter_plaintext_range(infile, header: Header, aead: Aead, index: ChunkIndex, start: int, stop: int,
+                         workers: int = None):
+    """Yields the plaintext bytes [start, stop) by decrypting only the chunks that overlap it."""
+    if start >= stop:
+        return
+    entries = index.entries
+    chunk_starts = []
+    position = 0
+    for entry in entries:
+        chunk_starts.append(position)
+        position += entry.plain_size
+    first = bisect_right(chunk_starts, start) - 1
+    last = bisect_right(chunk_starts, stop - 1) - 1
+    aad = header.aad
+
+    selected = entries[first:last + 1]
+
+    def decrypt_chunk(position, chunk):
+        entry = selected[position]
+        number = first + position
+        return open_chunk(aead, header, aad, number, entry.flags, chunk, entry.plain_size,
+                          index.generation_of(number))
+
+    for number, plaintext in enumerate(parallel_map(decrypt_chunk, read_entries(infile, selected), workers)):
+        chunk_start = chunk_starts[first + number]
+        yield plaintext[max(start - chunk_start, 0):stop - chunk_start]
+
+def decrypt_range(path: str, password: str, offset: int, length: int, workers: int = None) -> bytes:
+    """Decrypts `length` bytes of plaintext starting at `offset` from a v2 file.
+
+    Only the chunks covering the range are read and authenticated. The range is clipped
+    to the end of the plaintext.
+    """
+    if offset < 0 or length < 0:
+        raise ValueError("Offset and length must be non-negative")
+    with open(path, 'rb') as infile:
+        header, aead, index = open_container(infile, password)
+        stop = min(offset + length, index.total_size)
+        try:
+            return b"".join(iter_plaintext_range(infile, header, aead, index, offset, stop, workers))
+        except InvalidTag:
+            raise ValueError("Corrupted file: chunk authentication failed")
+
+def rekey(path: str, old_password: str, new_password: str, kdf_params: KdfParams = None):
+    """Changes the password of a v2 file by re-wrapping its data key.
+
+    Only the key slot is rewritten (in place, same size), so the cost does not depend
+    on the file size. The new slot gets a fresh salt and the current default Argon2
+    parameters unless `kdf_params` is given. Raises ValueError for a wrong password or
+    for files written before data keys were wrapped, which must be re-encrypted once.
+    """
+    with open(path, 'r+b') as f:
+        header = container.read_header(f)
+        if header is None:
+            raise ValueError("Legacy v1 files cannot be rekeyed; re-encrypt the file")
+        if header.kdf_id != KDF_ARGON2ID_WRAPPED:
+            raise ValueError("File predates key wrapping; re-encrypt it once to enable rekey")
+        try:
+            data_key = header_key(old_password, header)
+        except InvalidTag:
+            raise ValueError("Incorrect password")
+
+        kdf_params = kdf_params or default_kdf_params()
+        container.check_kdf_params(*kdf_params)
+        new_header = replace(header, salt=os.urandom(SALT_SIZE), time_cost=kdf_params.time_cost,
+                             memory_cost=kdf_params.memory_cost, parallelism=kdf_params.parallelism)
+        wrap_key = derive_key(new_password, new_header.salt, *kdf_params)
+        new_header.wrapped_key = wrap_data_key(wrap_key, data_key, new_header)
+        slot = new_header.slot_bytes()
+        if len(slot) != len(header.slot_bytes()):
+            raise ValueError("Key slot size changed; cannot rewrite in place")
+
+        f.seek(header.slot_offset())
+        f.write(slot)
+        f.flush()
+        os.fsync(f.fileno())
+
+def log_event(event_type, filename, status, output_path=None):
+    """Records an encryption/decryption event in the history store, including the output path.
+
+    The event is queued and committed in the background (see history.py).
+    """
+    from . import history  # Loaded on first use; headless tools that never log skip sqlite3
+    history.get_store().record(event_type, filename, status, output_path)
+
+def get_full_history(limit: int = None):
+    """Fetches the encryption history as text, newest last (`limit` caps the events)."""
+    from . import history
+    store = history.get_store()
+    events = store.query(limit=limit if limit is not None else -1)
+    if not events:
         return "No history available."
+    return "\n".join(event.format() for event in reversed(events))
 
 def clear_history():
-    """Clears the history log without deleting the file."""
-    open(LOG_FILE, "w").close()
+    """Deletes every recorded event."""
+    from . import history
+    history.get_store().clear()
 
 def get_recent_events(lines=20):
-    """Fetches the most recent encryption/decryption events."""
-    try:
-        with open(LOG_FILE, "r") as f:
-            content = f.readlines()
-            return "".join(content[-lines:]) if content else "No recent history."
-    except FileNotFoundError:
-        return "No history available."
+    """Fetches the most recent encryption/decryption events as text, newest last."""
+    from . import history
+    events = history.get_store().recent(lines)
+    if not events:
+        return "No recent history."
+    return "\n".join(event.format() for event in reversed(events)) + "\n"
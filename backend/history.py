@@ -0,0 +1,255 @@
+"""Structured encryption/decryption history in SQLite, written in batches off the hot path.
+
+log_event only queues the event; a background thread commits queued events in
+groups, one transaction per group. Events are indexed by time, type, status and
+file name, and newest-first queries walk the primary key, so reading the latest
+page costs the same with ten events or ten million.
+
+A plain-text `encryption_history.log` from earlier versions is imported once, the
+first time the database is created.
+"""
+import atexit
+import datetime
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+HISTORY_DB = "encryption_history.db"
+LEGACY_LOG_FILE = "encryption_history.log"
+BATCH_SIZE = 512  # Events committed in one transaction at most
+FLUSH_INTERVAL = 0.25  # Seconds the writer waits to gather a batch
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    event_type TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    status TEXT NOT NULL,
+    detail TEXT NOT NULL DEFAULT '',
+    output_path TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_type ON events (event_type, id);
+CREATE INDEX IF NOT EXISTS events_status ON events (status, id);
+CREATE INDEX IF NOT EXISTS events_filename ON events (filename, id);
+"""
+_LEGACY_LINE = re.compile(r"^\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\] (\S[^-]*?) - (.*)$")
+_STOP = object()
+
+
+class HistoryEvent(NamedTuple):
+    """One recorded operation. `status` is its outcome word (SUCCESS, FAILED, ...)."""
+    id: int
+    ts: float
+    event_type: str
+    filename: str
+    status: str
+    detail: str
+    output_path: str
+
+    @property
+    def timestamp(self) -> str:
+        return datetime.datetime.fromtimestamp(self.ts).strftime("%Y-%m-%d %H:%M:%S")
+
+    def format(self) -> str:
+        """The event as one line of the old text log."""
+        status = f"{self.status} - {self.detail}" if self.detail else self.status
+        return f"[{self.timestamp}] {self.event_type} - {self.filename} - {status} - {self.output_path}"
+
+
+def split_status(status: str):
+    """Splits "FAILED - reason" into ("FAILED", "reason")."""
+    outcome, _, detail = str(status).partition(" - ")
+    return outcome.strip(), detail.strip()
+
+
+class HistoryStore:
+    """Event history in one SQLite file, with a buffered background writer."""
+
+    def __init__(self, path: str = HISTORY_DB, legacy_log: Optional[str] = LEGACY_LOG_FILE):
+        self.path = os.path.abspath(path)  # Later chdirs must not move the database
+        self._queue = queue.Queue()
+        self._writer = None
+        self._lock = threading.Lock()
+        is_new = not os.path.exists(path)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        if is_new and legacy_log and os.path.exists(legacy_log):
+            self._import_legacy(legacy_log)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")  # Readers never block the writer
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _import_legacy(self, log_path: str):
+        rows = []
+        with open(log_path, "r", errors="replace") as f:
+            for line in f:
+                match = _LEGACY_LINE.match(line.rstrip("\n"))
+                if not match:
+                    continue
+                stamp, event_type, rest = match.groups()
+                # Old lines are "file - OUTCOME[ - detail] - output" and file names may hold " - ",
+                # so the first all-caps part after the file name is taken as the outcome
+                parts = rest.split(" - ")
+                position = next((i for i in range(1, len(parts)) if parts[i].isalpha() and parts[i].isupper()), None)
+                if position is None:
+                    continue
+                filename, outcome = " - ".join(parts[:position]), parts[position]
+                remaining = parts[position + 1:]
+                output_path = remaining[-1] if remaining else ""
+                detail = " - ".join(remaining[:-1])
+                ts = datetime.datetime.strptime(stamp, "%Y-%m-%d %H:%M:%S").timestamp()
+                rows.append((ts, event_type.strip(), filename, outcome, detail.strip(), output_path))
+        with self._connect() as conn:
+            conn.executemany("INSERT INTO events (ts, event_type, filename, status, detail, output_path) "
+                             "VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def record(self, event_type: str, filename: str, status: str, output_path: str = None):
+        """Queues an event; it is committed by the writer thread with the next batch."""
+        outcome, detail = split_status(status)
+        self._queue.put((time.time(), str(event_type), str(filename), outcome, detail, output_path or ""))
+        if self._writer is None or not self._writer.is_alive():
+            self._start_writer()
+
+    def _start_writer(self):
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                if self._writer is None:
+                    atexit.register(self.close)
+                self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        conn = self._connect()
+        try:
+            while True:
+                item = self._queue.get()
+                batch, waiters, stop = [], [], False
+                deadline = time.monotonic() + FLUSH_INTERVAL
+                while True:
+                    if item is _STOP:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)  # A flush request: commit now
+                        deadline = 0
+                    else:
+                        batch.append(item)
+                    if stop or len(batch) >= BATCH_SIZE:
+                        break
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                if batch:
+                    with conn:
+                        conn.executemany("INSERT INTO events (ts, event_type, filename, status, detail, "
+                                         "output_path) VALUES (?, ?, ?, ?, ?, ?)", batch)
+                for waiter in waiters:
+                    waiter.set()
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def flush(self, timeout: float = 5.0):
+        """Waits until every event queued so far is committed."""
+        if self._writer is None or not self._writer.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        """Commits pending events and stops the writer thread."""
+        writer = self._writer
+        if writer is not None and writer.is_alive():
+            self._queue.put(_STOP)
+            writer.join(timeout=5.0)
+
+    def query(self, event_type: str = None, status: str = None, filename: str = None, search: str = None,
+              since: float = None, until: float = None, before_id: int = None,
+              limit: int = 100) -> List[HistoryEvent]:
+        """Returns matching events, newest first.
+
+        Pass the id of the last event of a page as `before_id` to get the next page.
+        `search` matches any part of the file name or output path.
+        """
+        where, args = self._filters(event_type, status, filename, search, since, until)
+        if before_id is not None:
+            where.append("id < ?")
+            args.append(before_id)
+        sql = "SELECT id, ts, event_type, filename, status, detail, output_path FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC LIMIT ?"
+        self.flush()
+        with self._connect() as conn:
+            return [HistoryEvent(*row) for row in conn.execute(sql, args + [limit])]
+
+    def count(self, event_type: str = None, status: str = None, filename: str = None, search: str = None,
+              since: float = None, until: float = None) -> int:
+        """Number of events matching the same filters as query()."""
+        where, args = self._filters(event_type, status, filename, search, since, until)
+        sql = "SELECT COUNT(*) FROM events" + (" WHERE " + " AND ".join(where) if where else "")
+        self.flush()
+        with self._connect() as conn:
+            return conn.execute(sql, args).fetchone()[0]
+
+    @staticmethod
+    def _filters(event_type, status, filename, search, since, until):
+        where, args = [], []
+        for column, value in (("event_type", event_type), ("status", status), ("filename", filename)):
+            if value:
+                where.append(f"{column} = ?")
+                args.append(value)
+        if search:
+            where.append("(filename LIKE ? ESCAPE '\\' OR output_path LIKE ? ESCAPE '\\')")
+            pattern = "%" + re.sub(r"([%_\\])", r"\\\1", search) + "%"
+            args.extend([pattern, pattern])
+        if since is not None:
+            where.append("ts >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("ts < ?")
+            args.append(until)
+        return where, args
+
+    def recent(self, limit: int = 20) -> List[HistoryEvent]:
+        """The latest `limit` events, newest first."""
+        return self.query(limit=limit)
+
+    def distinct(self, column: str) -> List[str]:
+        """Values seen in the event_type or status column, for filter menus."""
+        if column not in ("event_type", "status"):
+            raise ValueError(f"Cannot list values of {column!r}")
+        self.flush()
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute(f"SELECT DISTINCT {column} FROM events ORDER BY 1")]
+
+    def clear(self):
+        """Deletes every event."""
+        self.flush()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM events")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> HistoryStore:
+    """The process-wide history store, opened on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = HistoryStore()
+    return _store
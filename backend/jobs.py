@@ -0,0 +1,196 @@
+"""Asynchronous encryption/decryption jobs with progress polling and cancellation."""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_RUNNING = 2  # Jobs processed at once; each one already uses every core
+DEFAULT_MAX_QUEUED = 64  # Jobs waiting beyond this are rejected
+MAX_FINISHED_JOBS = 1000  # Finished jobs kept around for polling
+CANCEL_GRACE = 5.0  # Seconds a drain waits for cancelled jobs to stop and clean up
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised from a progress callback to stop a job that was cancelled."""
+
+
+class QueueFull(Exception):
+    """Raised when admission control rejects a new job."""
+
+
+class Job:
+    """State of one background job, updated by the worker thread."""
+
+    def __init__(self, kind, filename, total_bytes):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.filename = filename
+        self.total_bytes = total_bytes
+        self.bytes_processed = 0
+        self.status = QUEUED
+        self.error = None
+        self.result_path = None
+        self.details = None  # Extra results, e.g. a batch summary
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.cleanup = None
+
+    def report(self, count):
+        """Progress callback handed to the crypto loops."""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+        self.bytes_processed += count
+
+    def to_dict(self):
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'filename': self.filename,
+            'status': self.status,
+            'bytes_processed': self.bytes_processed,
+            'total_bytes': self.total_bytes,
+            'elapsed_seconds': round(elapsed, 3),
+            'throughput_bytes_per_second': int(self.bytes_processed / elapsed) if elapsed else 0,
+            'error': self.error,
+            'details': self.details,
+        }
+
+
+class JobManager:
+    """Runs jobs on a bounded worker pool with a bounded queue in front of it."""
+
+    def __init__(self, max_running=DEFAULT_MAX_RUNNING, max_queued=DEFAULT_MAX_QUEUED):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self._pool = ThreadPoolExecutor(max_workers=max_running, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, kind, filename, total_bytes, work, cleanup=None):
+        """Queues `work(job)`, which returns the result path.
+
+        `cleanup(job)` runs after the job ends, whatever the outcome. Raises
+        QueueFull when the running and queued jobs already fill the admission limit,
+        or once the manager is closed.
+        """
+        job = Job(kind, filename, total_bytes)
+        job.cleanup = cleanup
+        with self._lock:
+            if self._closed:
+                raise QueueFull("Server is shutting down; try again later")
+            active = self._active_count()
+            if active >= self.max_running + self.max_queued:
+                raise QueueFull(f"Too many jobs in progress ({active}); try again later")
+            self._jobs[job.id] = job
+            self._prune()
+            job.future = self._pool.submit(self._run, job, work)  # Under the lock, so drain() sees every future
+        return job
+
+    def _run(self, job, work):
+        if job.cancel_event.is_set():
+            # Cancelled after the pool picked it up but before it started
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            if job.cleanup:
+                job.cleanup(job)
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result_path = work(job)
+            if job.cancel_event.is_set():
+                job.status = CANCELLED
+            elif job.result_path is None:
+                job.status = FAILED
+                job.error = job.error or "Operation failed"
+            else:
+                job.status = SUCCEEDED
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            if job.cleanup:
+                job.cleanup(job)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Requests cancellation; a queued job never starts, a running one stops at its next chunk."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            if job.cleanup:
+                job.cleanup(job)
+        return job
+
+    def active_count(self) -> int:
+        """Jobs queued or running."""
+        with self._lock:
+            return self._active_count()
+
+    def _active_count(self):
+        return sum(1 for job in self._jobs.values() if job.status in (QUEUED, RUNNING))
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def close(self):
+        """Stops admitting jobs; queued and running ones carry on."""
+        with self._lock:
+            self._closed = True
+
+    def drain(self, timeout=None) -> int:
+        """Closes the manager and waits up to `timeout` seconds for queued and running jobs.
+
+        Jobs still unfinished then are cancelled, which lets their cleanup remove
+        partial output. Returns the number of jobs that had to be cancelled.
+        """
+        with self._lock:
+            self._closed = True
+            pending = [job for job in self._jobs.values() if job.status in (QUEUED, RUNNING)]
+        _, not_done = futures.wait([job.future for job in pending], timeout)
+        unfinished = [job for job in pending if job.future in not_done]
+        for job in unfinished:
+            self.cancel(job.id)
+        futures.wait([job.future for job in unfinished], CANCEL_GRACE)  # Running jobs stop at their next chunk
+        self._pool.shutdown(wait=False)
+        return len(unfinished)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+def remove_quietly(path):
+    """Deletes a file if it exists, ignoring errors."""
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,144 @@
+"""Measures Argon2id on this machine and picks parameters for a target latency.
+
+Run `python -m backend.kdf_calibration` for a benchmark report, and add `--save`
+to store the calibrated parameters in kdf_params.json; new files use them from
+then on, in every process started from that directory.
+"""
+import argparse
+import json
+import os
+import time
+from typing import List, NamedTuple, Optional
+
+from argon2 import low_level
+
+from .container import check_kdf_params, MAX_KDF_TIME_COST
+
+DEFAULT_TARGET_SECONDS = 0.5
+MIN_TIME_COST = 2
+MIN_MEMORY_COST = 19 * 1024  # KiB, the OWASP floor for Argon2id
+DEFAULT_MAX_MEMORY_COST = 1024 * 1024  # KiB (1 GiB)
+MAX_PARALLELISM = 8
+CALIBRATION_FILE = "kdf_params.json"
+
+_CALIBRATION_SALT = b"\0" * 16
+_calibrated = None
+_loaded = False  # Whether CALIBRATION_FILE has been read
+
+
+class KdfParams(NamedTuple):
+    """Argon2id cost parameters, as stored in the container key slot."""
+    time_cost: int
+    memory_cost: int  # KiB
+    parallelism: int
+
+
+def measure(params: KdfParams) -> float:
+    """Returns the wall-clock seconds of one Argon2id derivation with `params`."""
+    start = time.perf_counter()
+    low_level.hash_secret_raw(
+        secret=b"calibration",
+        salt=_CALIBRATION_SALT,
+        time_cost=params.time_cost,
+        memory_cost=params.memory_cost,
+        parallelism=params.parallelism,
+        hash_len=32,
+        type=low_level.Type.ID
+    )
+    return time.perf_counter() - start
+
+
+def calibrate_kdf(target_seconds: float = DEFAULT_TARGET_SECONDS,
+                  max_memory_cost: int = DEFAULT_MAX_MEMORY_COST,
+                  parallelism: int = None, apply: bool = True, save: bool = False) -> KdfParams:
+    """Picks Argon2id parameters that take about `target_seconds` on this machine.
+
+    Parallelism follows the core count. Memory is doubled first, since it is what
+    makes Argon2 expensive for attackers, then passes are added to use the rest of the
+    budget. With `apply` the result becomes the default for new files, and with
+    `save` it is also written to CALIBRATION_FILE for later processes.
+    """
+    global _calibrated
+    lanes = parallelism or min(os.cpu_count() or 1, MAX_PARALLELISM)
+    params = KdfParams(MIN_TIME_COST, max(MIN_MEMORY_COST, 8 * lanes), lanes)
+    elapsed = measure(params)
+
+    while elapsed * 2 <= target_seconds and params.memory_cost * 2 <= max_memory_cost:
+        params = params._replace(memory_cost=params.memory_cost * 2)
+        elapsed = measure(params)
+
+    per_pass = elapsed / params.time_cost
+    extra_passes = int((target_seconds - elapsed) // per_pass) if per_pass > 0 else 0
+    if extra_passes > 0:
+        params = params._replace(time_cost=min(params.time_cost + extra_passes, MAX_KDF_TIME_COST))
+
+    if apply:
+        _calibrated = params
+    if save:
+        save_params(params)
+    return params
+
+
+def save_params(params: KdfParams, path: str = CALIBRATION_FILE):
+    """Writes `params` to `path`, replacing any earlier calibration atomically."""
+    check_kdf_params(*params)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(params._asdict(), f)
+    os.replace(temp_path, path)
+
+
+def load_params(path: str = CALIBRATION_FILE) -> Optional[KdfParams]:
+    """Reads parameters saved by save_params; None when there are none or they are unusable."""
+    try:
+        with open(path) as f:
+            params = KdfParams(**json.load(f))
+        check_kdf_params(*params)
+    except FileNotFoundError:
+        return None
+    except (OSError, TypeError, ValueError):  # Corrupt or hand-edited; the built-in defaults still work
+        return None
+    return params
+
+
+def calibrated_params() -> Optional[KdfParams]:
+    """Returns the calibrated parameters, if any.
+
+    A calibration applied in this process wins; otherwise the one saved in
+    CALIBRATION_FILE is loaded on first use.
+    """
+    global _calibrated, _loaded
+    if _calibrated is None and not _loaded:
+        _loaded = True
+        _calibrated = load_params()
+    return _calibrated
+
+
+def benchmark_kdf(time_costs=(2, 3, 4), memory_costs=(19 * 1024, 2**16, 2**18),
+                  parallelisms=None) -> List[dict]:
+    """Times Argon2id over a grid of parameters and returns one record per setting."""
+    if parallelisms is None:
+        parallelisms = sorted({1, min(os.cpu_count() or 1, MAX_PARALLELISM)})
+    report = []
+    for memory_cost in memory_costs:
+        for parallelism in parallelisms:
+            for time_cost in time_costs:
+                params = KdfParams(time_cost, memory_cost, parallelism)
+                report.append({**params._asdict(), "seconds": measure(params)})
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m backend.kdf_calibration", description=__doc__.split("\n")[0])
+    parser.add_argument("--target", type=float, default=DEFAULT_TARGET_SECONDS,
+                        help=f"Seconds one derivation should take (default: {DEFAULT_TARGET_SECONDS:g})")
+    parser.add_argument("--save", action="store_true", help=f"Store the result in {CALIBRATION_FILE}")
+    args = parser.parse_args()
+    print(f"{'time':>5} {'memory (MiB)':>13} {'lanes':>6} {'ms':>9}")
+    for row in benchmark_kdf():
+        print(f"{row['time_cost']:>5} {row['memory_cost'] // 1024:>13} "
+              f"{row['parallelism']:>6} {row['seconds'] * 1000:>9.1f}")
+    chosen = calibrate_kdf(args.target, apply=False, save=args.save)
+    print(f"Calibrated for {args.target:.2f}s: {chosen}")
+    if args.save:
+        print(f"Saved to {CALIBRATION_FILE}")
@@ -0,0 +1,100 @@
+"""In-memory cache of Argon2-derived keys with a TTL and a bounded LRU."""
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = 128
+DEFAULT_TTL = 300.0  # Seconds a derived key stays usable
+
+
+def _zero(buffer: bytearray):
+    """Overwrites a key buffer before it is dropped."""
+    for i in range(len(buffer)):
+        buffer[i] = 0
+
+
+class KeyCache:
+    """Maps (password, salt, KDF params) to derived keys.
+
+    Entries are looked up by an HMAC of their inputs under a per-process secret, so
+    the cache never holds passwords. Keys are kept in bytearrays and zeroed when they
+    expire, are evicted, or the cache is cleared.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._secret = os.urandom(32)
+        self._entries = OrderedDict()  # lookup id -> (expires_at, key buffer)
+        self._lock = threading.Lock()
+        self._inflight = {}  # lookup id -> lock held while that key is being derived
+
+    def _lookup_id(self, password: str, salt: bytes, params: Tuple) -> bytes:
+        mac = hmac.new(self._secret, digestmod=hashlib.sha256)
+        for part in (password.encode(), salt, repr(params).encode()):
+            mac.update(len(part).to_bytes(4, 'big') + part)
+        return mac.digest()
+
+    def get(self, password: str, salt: bytes, params: Tuple) -> Optional[bytes]:
+        """Returns the cached key, or None when it is missing or expired."""
+        if self.max_entries <= 0:
+            return None
+        lookup_id = self._lookup_id(password, salt, params)
+        with self._lock:
+            entry = self._entries.get(lookup_id)
+            if entry is None:
+                return None
+            expires_at, key = entry
+            if expires_at < time.monotonic():
+                del self._entries[lookup_id]
+                _zero(key)
+                return None
+            self._entries.move_to_end(lookup_id)
+            return bytes(key)
+
+    def put(self, password: str, salt: bytes, params: Tuple, key: bytes):
+        """Stores a derived key, evicting the least recently used entries when full."""
+        if self.max_entries <= 0:
+            return
+        lookup_id = self._lookup_id(password, salt, params)
+        with self._lock:
+            old = self._entries.pop(lookup_id, None)
+            if old is not None:
+                _zero(old[1])
+            self._entries[lookup_id] = (time.monotonic() + self.ttl, bytearray(key))
+            while len(self._entries) > self.max_entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                _zero(evicted)
+
+    def get_or_derive(self, password: str, salt: bytes, params: Tuple, derive) -> bytes:
+        """Returns the cached key or calls `derive()` once, even when many threads ask at once."""
+        key = self.get(password, salt, params)
+        if key is not None:
+            return key
+        lookup_id = self._lookup_id(password, salt, params)
+        with self._lock:
+            lock = self._inflight.setdefault(lookup_id, threading.Lock())
+        try:
+            with lock:
+                key = self.get(password, salt, params)
+                if key is None:
+                    key = derive()
+                    self.put(password, salt, params, key)
+                return key
+        finally:
+            with self._lock:
+                self._inflight.pop(lookup_id, None)
+
+    def clear(self):
+        """Drops every cached key."""
+        with self._lock:
+            for _, key in self._entries.values():
+                _zero(key)
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
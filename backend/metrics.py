@@ -0,0 +1,314 @@
+"""Per-stage timing, byte and throughput histograms, exported in the Prometheus text format.
+
+The pipeline reports its stages (kdf, read, compress, hash, encrypt, decrypt,
+write), whole operations and HTTP requests here; app.py serves the result at /metrics.
+Chunk-level hooks are installed when an operation starts: with metrics disabled
+(set_enabled(False), or AES_METRICS=0 in the environment) the original functions
+and iterators are used unchanged, so the hot path pays nothing. Enabled, a chunk
+stage costs two clock reads and a bucket increment.
+
+profile() additionally runs a block under cProfile for a one-off investigation.
+"""
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+
+KB = 1024
+MB = 1024 * KB
+TIME_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = tuple(KB * 4 ** i for i in range(13))  # 1 KB .. 16 GB
+THROUGHPUT_BUCKETS = tuple(MB * rate for rate in (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000))
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_enabled = os.environ.get("AES_METRICS", "1") != "0"
+_NULL = nullcontext()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(value: bool = True):
+    """Turns collection on or off; operations already running keep their hooks."""
+    global _enabled
+    _enabled = bool(value)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count per label combination."""
+
+    def __init__(self, name: str, help_text: str, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Observations counted into fixed buckets per label combination, with their sum."""
+
+    def __init__(self, name: str, help_text: str, buckets, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.label_names = tuple(label_names)
+        self._series = {}  # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *labels):
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][slot] += 1
+            series[1] += value
+            series[2] += 1
+
+    def observe_many(self, values, *labels):
+        """Observes a batch of values under one lock acquisition."""
+        counts = [0] * (len(self.buckets) + 1)
+        for value in values:
+            counts[bisect_left(self.buckets, value)] += 1
+        self.merge(counts, sum(values), len(values), *labels)
+
+    def merge(self, counts, total: float, count: int, *labels):
+        """Adds per-bucket counts (last is +Inf) collected elsewhere, with their sum and count."""
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0] = [a + b for a, b in zip(series[0], counts)]
+            series[1] += total
+            series[2] += count
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, (list(counts), total, count))
+                            for labels, (counts, total, count) in self._series.items())
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_labels = _labels(self.label_names, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+_registry = []
+
+STAGE_SECONDS = Histogram("aes_stage_seconds", "Seconds per call of a pipeline stage (one chunk for chunk stages).",
+                          TIME_BUCKETS, ("stage",))
+OPERATION_SECONDS = Histogram("aes_operation_seconds", "Wall-clock seconds of a whole operation.",
+                              TIME_BUCKETS, ("operation",))
+OPERATION_BYTES = Histogram("aes_operation_bytes", "Plaintext bytes processed by an operation.",
+                            SIZE_BUCKETS, ("operation",))
+OPERATION_THROUGHPUT = Histogram("aes_operation_throughput_bytes_per_second",
+                                 "Plaintext bytes per second of an operation.", THROUGHPUT_BUCKETS, ("operation",))
+OPERATION_ERRORS = Counter("aes_operation_errors_total", "Operations that ended with an error.", ("operation",))
+HTTP_SECONDS = Histogram("aes_http_request_seconds", "Seconds to handle a request (until the response starts).",
+                         TIME_BUCKETS, ("method", "endpoint", "status"))
+HTTP_REJECTED = Counter("aes_http_rejected_total",
+                        "Connections answered 503 because every worker thread and backlog slot was taken.")
+HTTP_REQUEST_BYTES = Histogram("aes_http_request_bytes", "Declared request body sizes.",
+                               SIZE_BUCKETS, ("method", "endpoint"))
+
+
+def stage(name: str):
+    """Context manager that times one call of a stage; a shared no-op when disabled."""
+    return _Stage(name) if _enabled else _NULL
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, self.name)
+        return False
+
+
+class _StageCounts:
+    """Bucketed timings of one stage within one operation; constant size however many chunks run."""
+    __slots__ = ("counts", "total", "count", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(STAGE_SECONDS.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()  # Private to the operation, so workers rarely wait on it
+
+    def add(self, seconds: float):
+        slot = bisect_left(STAGE_SECONDS.buckets, seconds)
+        with self._lock:
+            self.counts[slot] += 1
+            self.total += seconds
+            self.count += 1
+
+
+class Operation:
+    """Times one operation from its creation; done() or failed() records the outcome once.
+
+    Chunk stages are timed through timed() and timed_iter(), which count each
+    duration into the operation's own buckets for that stage; the counts go into
+    the stage histogram in one step when the operation ends, so worker threads do
+    not contend on the shared histogram lock per chunk and memory does not grow
+    with the file size. Operations include their key setup; the KDF is also timed
+    on its own as a stage.
+    """
+    __slots__ = ("name", "start", "_stages")
+
+    def __init__(self, name: str, enabled: bool = None):
+        self.name = name
+        self.start = time.perf_counter() if (_enabled if enabled is None else enabled) else None
+        self._stages = {}  # stage -> _StageCounts
+
+    def _stage(self, stage_name: str) -> _StageCounts:
+        stage_counts = self._stages.get(stage_name)
+        if stage_counts is None:
+            stage_counts = self._stages.setdefault(stage_name, _StageCounts())
+        return stage_counts
+
+    def timed(self, stage_name: str, func):
+        """Returns `func` wrapped to time each call as `stage_name`, or `func` itself when disabled."""
+        if self.start is None:
+            return func
+        add = self._stage(stage_name).add
+        clock = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                add(clock() - start)
+
+        return wrapper
+
+    def timed_iter(self, stage_name: str, iterable):
+        """Returns `iterable` wrapped to time producing each item as `stage_name`, or unchanged when disabled."""
+        if self.start is None:
+            return iterable
+        return self._timed_iter(self._stage(stage_name).add, iterable)
+
+    @staticmethod
+    def _timed_iter(add, iterable):
+        clock = time.perf_counter
+        iterator = iter(iterable)
+        while True:
+            start = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            add(clock() - start)
+            yield item
+
+    def _finish(self):
+        self.start = None
+        for stage_name, stage_counts in self._stages.items():
+            if stage_counts.count:
+                STAGE_SECONDS.merge(stage_counts.counts, stage_counts.total, stage_counts.count, stage_name)
+        self._stages = {}
+
+    def done(self, byte_count: int):
+        """Records the duration, the plaintext size, the throughput and the stage timings."""
+        if self.start is None:
+            return
+        seconds = time.perf_counter() - self.start
+        self._finish()
+        OPERATION_SECONDS.observe(seconds, self.name)
+        OPERATION_BYTES.observe(byte_count, self.name)
+        if seconds > 0:
+            OPERATION_THROUGHPUT.observe(byte_count / seconds, self.name)
+
+    def failed(self):
+        """Counts the operation as an error; its stage timings are still recorded."""
+        if self.start is None:
+            return
+        self._finish()
+        OPERATION_ERRORS.inc(self.name)
+
+
+NO_OPERATION = Operation("none", enabled=False)  # For callers that do not report timings
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def profile(output: str = None, sort: str = "cumulative", limit: int = 30):
+    """Runs the block under cProfile with metrics enabled.
+
+    The stats are dumped to `output` (for pstats or snakeviz) or, without one, the top
+    `limit` functions are printed to stderr. cProfile only sees the calling thread;
+    chunk work on the worker pool shows up as waiting in parallel_map unless the
+    operation is run with workers=1 (the stage histograms cover the workers either way).
+    """
+    import cProfile
+    import io
+    import pstats
+
+    was_enabled = _enabled
+    set_enabled(True)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        set_enabled(was_enabled)
+        if output:
+            profiler.dump_stats(output)
+        else:
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats(sort).print_stats(limit)
+            sys.stderr.write(text.getvalue())
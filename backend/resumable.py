@@ -0,0 +1,274 @@
+"""Resumable uploads that are encrypted part by part, straight into the final container.
+
+A client initiates an upload with the total plaintext size, sends the file as
+numbered parts (in any order, over as many connections as it likes), asks which
+parts have arrived after a failure, and completes the upload. Parts are whole
+multiples of the chunk size, so the place of every chunk in the container is known
+up front: each part is encrypted while it streams in and written at its own offset,
+and no plaintext is ever staged on disk. Completing writes the sealed index.
+
+The container keeps per-chunk generations (FLAG_CHUNK_HASHES, see incremental.py).
+Every attempt at a part encrypts under a new generation, so re-sending a part after
+a dropped connection never reuses a nonce, even if its bytes differ. The result
+decrypts with decrypt_file and can later be updated in place.
+
+Sessions live in memory: an upload survives dropped connections, not a server restart.
+"""
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from werkzeug.security import safe_join
+
+from . import container, metrics
+from .ciphers import make_aead
+from .container import CHUNK_FINAL, ChunkIndex
+from .crypto_utils import (TAG_SIZE, chunk_hash_key, choose_chunk_size, log_event, max_in_flight, new_header,
+                           preallocate, read_chunks_into, seal_chunks, write_index)
+from .jobs import remove_quietly
+
+DEFAULT_PART_SIZE = 64 * 1024 * 1024  # Rounded down to a multiple of the chunk size
+MAX_PART_SIZE = 1024 * 1024 * 1024
+MAX_UPLOAD_SIZE = 256 * 1024 ** 3  # The container is preallocated, so a size is disk space reserved up front
+DEFAULT_TTL = 24 * 3600.0  # Seconds an idle upload is kept
+PARTIAL_SUFFIX = ".upload"  # The container is renamed to its output path on completion
+
+
+class UploadConflict(Exception):
+    """Raised when a part was already received or is arriving, or the upload is not ready to complete."""
+
+
+class _PartReader:
+    """Reads at most `length` bytes of a stream, so a part cannot spill into the next one."""
+
+    def __init__(self, stream, length):
+        self._stream = stream
+        self.remaining = length
+
+    def readinto(self, buffer):
+        view = memoryview(buffer)[:self.remaining]
+        count = self._stream.readinto(view) if view else 0
+        self.remaining -= count or 0
+        return count
+
+
+class Upload:
+    """One upload in progress: its container, the parts received so far and their chunk entries."""
+
+    def __init__(self, filename, output_path, size, header, key, part_size, owns_output):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.output_path = output_path
+        self.owns_output = owns_output  # The server picked the output path, so it may delete it
+        self.path = output_path + PARTIAL_SUFFIX
+        self.size = size
+        self.header = header
+        self.part_size = part_size
+        self.aead = make_aead(header.cipher_id, key)
+        self.hash_key = chunk_hash_key(key)
+        self.data_offset = len(header.pack())
+        self.block_size = header.chunk_size + TAG_SIZE
+        self.chunks_per_part = part_size // header.chunk_size
+        self.part_count = -(-size // part_size)
+        self.parts = {}  # part number -> ChunkIndex of its chunks
+        self.attempts = {}  # part number -> attempts started, i.e. the next generation
+        self.active = set()
+        self.completed = False
+        self.updated_at = time.time()
+        self._lock = threading.Lock()
+
+    def part_length(self, number: int) -> int:
+        return min(self.part_size, self.size - number * self.part_size)
+
+    def to_dict(self):
+        received = sorted(self.parts)
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'size': self.size,
+            'part_size': self.part_size,
+            'part_count': self.part_count,
+            'chunk_size': self.header.chunk_size,
+            'received_parts': received,
+            'missing_parts': [number for number in range(self.part_count) if number not in self.parts],
+            'bytes_received': sum(self.part_length(number) for number in received),
+            'completed': self.completed,
+        }
+
+    def write_part(self, number: int, stream, workers: int = None, progress=None):
+        """Encrypts part `number` from `stream` into its place in the container.
+
+        The stream must hold exactly part_length(number) bytes. Raises ValueError for a
+        bad part number or length (the part can be sent again) and UploadConflict when
+        the part was already received or is arriving on another connection.
+        """
+        if not 0 <= number < self.part_count:
+            raise ValueError(f"Part number must be between 0 and {self.part_count - 1}")
+        with self._lock:
+            if self.completed:
+                raise UploadConflict("Upload is already complete")
+            if number in self.parts:
+                raise UploadConflict(f"Part {number} was already received")
+            if number in self.active:
+                raise UploadConflict(f"Part {number} is being received on another connection")
+            generation = self.attempts.get(number, 0)
+            if generation > container.MAX_GENERATION:
+                raise ValueError(f"Part {number} failed too often; start a new upload")
+            self.attempts[number] = generation + 1
+            self.active.add(number)
+            self.updated_at = time.time()
+
+        operation = metrics.Operation("upload_part")
+        try:
+            expected = self.part_length(number)
+            first = number * self.chunks_per_part
+            offset = self.data_offset + first * self.block_size
+            reader = _PartReader(stream, expected)
+            chunks = read_chunks_into(reader, self.header.chunk_size, max_in_flight(workers) + 1)
+            index = ChunkIndex([], 0)
+            with open(self.path, 'r+b') as outfile:
+                outfile.seek(offset)
+                write = operation.timed("write", outfile.write)
+                for piece in seal_chunks(self.aead, self.header, operation.timed_iter("read", chunks), index,
+                                         offset, first=first, generation=generation, hash_key=self.hash_key,
+                                         workers=workers, progress=progress, operation=operation):
+                    write(piece)
+            if index.total_size != expected or stream.read(1):
+                raise ValueError(f"Part {number} must be exactly {expected} bytes")
+        except Exception:
+            operation.failed()
+            with self._lock:
+                self.active.discard(number)
+            raise
+        operation.done(expected)
+        with self._lock:
+            self.active.discard(number)
+            self.parts[number] = index
+            self.updated_at = time.time()
+        return {'part': number, 'bytes': expected, 'received_parts': len(self.parts),
+                'part_count': self.part_count}
+
+    def complete(self) -> str:
+        """Seals the index once every part is in and moves the container to its output path."""
+        with self._lock:
+            if self.completed:
+                raise UploadConflict("Upload is already complete")
+            if self.active:
+                raise UploadConflict("Parts are still being received")
+            missing = [number for number in range(self.part_count) if number not in self.parts]
+            if missing:
+                raise UploadConflict(f"{len(missing)} of {self.part_count} parts are missing")
+            self.completed = True  # No part may start while the index is written
+
+        index = ChunkIndex([], self.size)
+        for number in range(self.part_count):
+            part = self.parts[number]
+            index.entries.extend(part.entries)
+            index.hashes.extend(part.hashes)
+            index.generations.extend(part.generations)
+        if index.entries:
+            index.entries[-1] = index.entries[-1]._replace(flags=index.entries[-1].flags | CHUNK_FINAL)
+        index.generation = max(index.generations, default=0)
+        try:
+            with open(self.path, 'r+b') as outfile:
+                write_index(outfile, self.aead, self.header, index,
+                            self.data_offset + self.size + len(index.entries) * TAG_SIZE)
+            os.replace(self.path, self.output_path)
+        except Exception:
+            with self._lock:
+                self.completed = False
+            raise
+        self.aead = self.hash_key = None  # The data key is not needed any more
+        self.updated_at = time.time()
+        log_event("ENCRYPTION", self.filename, "SUCCESS", self.output_path)
+        return self.output_path
+
+
+class UploadManager:
+    """Keeps the uploads in progress and forgets (and cleans up) idle ones after a TTL."""
+
+    def __init__(self, directory: str, ttl: float = DEFAULT_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self._uploads = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, filename: str, password: str, size: int, output_path: str = None, part_size: int = None,
+               cipher: str = None, kdf_params=None) -> Upload:
+        """Starts an upload of `size` plaintext bytes; runs the KDF and writes the container header.
+
+        `part_size` is rounded down to a multiple of the chunk size. `output_path` is
+        relative to the upload directory. Raises ValueError for a bad size, part size,
+        cipher or output path, or when the disk cannot hold the container.
+        """
+        if size < 0:
+            raise ValueError("Size must not be negative")
+        if size > MAX_UPLOAD_SIZE:
+            raise ValueError(f"Size must not exceed {MAX_UPLOAD_SIZE} bytes")
+        if output_path:
+            resolved = safe_join(self.directory, output_path)
+            if resolved is None:
+                raise ValueError(f"Output path must stay inside the upload directory: {output_path}")
+            output_path = resolved
+        if shutil.disk_usage(self.directory).free < size:
+            raise ValueError("Not enough free disk space for this upload")
+        chunk_size = choose_chunk_size(size)
+        part_size = min(part_size or DEFAULT_PART_SIZE, MAX_PART_SIZE)
+        if part_size < chunk_size:
+            raise ValueError(f"Part size must be at least the chunk size ({chunk_size} bytes)")
+        part_size -= part_size % chunk_size
+
+        header, key = new_header(password, os.path.splitext(filename)[1].encode(), chunk_size,
+                                 container.FLAG_CHUNK_HASHES, kdf_params=kdf_params, cipher=cipher)
+        owns_output = not output_path
+        if owns_output:
+            output_path = os.path.join(self.directory, f"{uuid.uuid4().hex}_{filename}.enc")
+        upload = Upload(filename, output_path, size, header, key, part_size, owns_output)
+        chunk_count = -(-size // chunk_size)
+        with open(upload.path, 'wb') as outfile:
+            outfile.write(header.pack())
+            preallocate(outfile, upload.data_offset + size + chunk_count * TAG_SIZE)
+        with self._lock:
+            self._prune()
+            self._uploads[upload.id] = upload
+        return upload
+
+    def get(self, upload_id: str):
+        with self._lock:
+            self._prune()
+            return self._uploads.get(upload_id)
+
+    def abort(self, upload_id: str):
+        """Forgets an upload. An unfinished container is deleted; a finished one only if the server named it."""
+        with self._lock:
+            upload = self._uploads.pop(upload_id, None)
+        if upload is not None:
+            self._discard(upload)
+        return upload
+
+    def close(self):
+        """Forgets every upload on shutdown and deletes the unfinished containers, which cannot be resumed."""
+        with self._lock:
+            unfinished = [upload for upload in self._uploads.values() if not upload.completed]
+            self._uploads.clear()
+        for upload in unfinished:
+            self._discard(upload)
+
+    def _discard(self, upload: Upload):
+        if not upload.completed:
+            remove_quietly(upload.path)
+            log_event("ENCRYPTION", upload.filename, "CANCELLED - upload aborted", upload.output_path)
+        elif upload.owns_output:
+            remove_quietly(upload.output_path)
+
+    def _prune(self):
+        now = time.time()
+        expired = [upload for upload in self._uploads.values()
+                   if now - upload.updated_at > self.ttl and not upload.active]
+        for upload in expired:
+            del self._uploads[upload.id]
+            if not upload.completed:
+                self._discard(upload)
@@ -0,0 +1,248 @@
+"""Production HTTP server for the API: a fixed worker pool, health probes and graceful drain.
+
+    python -m backend.server --host 0.0.0.0 --port 8000 --threads 16
+    python -m backend.server --processes 4 --threads 8
+
+Each process handles requests on a fixed pool of threads. Connections beyond the
+pool wait in a bounded backlog, and past that are answered 503 straight away, so
+load beyond capacity is shed instead of piling up threads. GET /healthz reports
+that the process is alive and GET /readyz that it accepts work.
+
+On SIGTERM or SIGINT the server fails /readyz, keeps serving for --drain-delay
+seconds so a load balancer can stop routing to it, stops accepting connections,
+then waits for requests in flight and background jobs. Jobs still running after
+--drain-timeout are cancelled, which removes their partial output.
+
+With --processes, workers are forked once the socket is bound and share it; a
+worker that dies is replaced. Jobs, resumable uploads and metrics live in each
+worker's memory, so clients that use them need sticky routing to one worker; the
+streaming endpoints are stateless. Process workers need fork (not on Windows).
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from . import metrics
+from .app import app, jobs, start_draining, uploads
+from .history import get_store
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5000
+DEFAULT_THREADS = 8  # Requests handled at once per process
+DEFAULT_BACKLOG = 64  # Connections waiting for a thread; further ones get a 503
+DEFAULT_DRAIN_TIMEOUT = 30.0
+IDLE_TIMEOUT = 10.0  # Seconds a connection may wait before sending its request line
+REQUEST_TIMEOUT = 120.0  # Seconds a started request may stall on the socket
+RESPAWN_DELAY = 1.0  # Seconds before a dead process worker is replaced
+
+_OVERLOADED_BODY = json.dumps({'error': 'Server is overloaded; try again later'}).encode()
+_OVERLOADED = (b"HTTP/1.1 503 Service Unavailable\r\nRetry-After: 1\r\nContent-Type: application/json\r\n"
+               b"Content-Length: %d\r\nConnection: close\r\n\r\n" % len(_OVERLOADED_BODY)) + _OVERLOADED_BODY
+
+
+class _RequestHandler(WSGIRequestHandler):
+    """Gives idle connections a short timeout, so they cannot hold a pool thread; Werkzeug closes
+    every connection after its response, so there are no idle keep-alive connections either."""
+
+    protocol_version = "HTTP/1.1"  # Chunked responses for the streaming endpoints
+    timeout = IDLE_TIMEOUT
+
+    def parse_request(self):
+        self.connection.settimeout(REQUEST_TIMEOUT)  # The request line arrived; the body may be slow
+        return super().parse_request()
+
+    def log_error(self, format, *args):
+        if not format.startswith("Request timed out"):  # An idle connection that never sent a request
+            super().log_error(format, *args)
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """A WSGI server that handles connections on a fixed thread pool behind a bounded backlog."""
+
+    multithread = True
+
+    def __init__(self, host: str, port: int, wsgi_app, threads: int = DEFAULT_THREADS,
+                 backlog: int = DEFAULT_BACKLOG):
+        if threads < 1 or backlog < 0:
+            raise ValueError("Need at least one thread and a backlog of zero or more")
+        self.threads = threads
+        self.backlog = backlog
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="http")
+        self._connections = 0  # Being handled or waiting for a thread
+        self._idle = threading.Condition()
+        super().__init__(host, port, wsgi_app, handler=_RequestHandler)
+
+    def process_request(self, request, client_address):
+        with self._idle:
+            admitted = self._connections < self.threads + self.backlog
+            if admitted:
+                self._connections += 1
+        if not admitted:
+            metrics.HTTP_REJECTED.inc()
+            try:
+                request.sendall(_OVERLOADED)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self._pool.submit(self._handle_connection, request, client_address)
+
+    def _handle_connection(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._idle:
+                self._connections -= 1
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Waits until no connection is being handled; False if `timeout` ran out first."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._connections == 0, timeout)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)  # Connections already admitted still run
+
+
+def make_server(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, threads: int = DEFAULT_THREADS,
+                backlog: int = DEFAULT_BACKLOG) -> PooledWSGIServer:
+    """Binds the API to host:port. Raises OSError when the address is taken."""
+    try:
+        return PooledWSGIServer(host, port, app, threads, backlog)
+    except SystemExit:
+        raise OSError(f"Could not listen on {host}:{port}") from None  # Werkzeug exits after printing why
+
+
+def start(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, threads: int = DEFAULT_THREADS,
+          backlog: int = DEFAULT_BACKLOG) -> PooledWSGIServer:
+    """Serves the API on a background thread.
+
+    The socket is listening when this returns, so clients can connect (and /readyz
+    answers) right away. Stop it with drain().
+    """
+    server = make_server(host, port, threads, backlog)
+    threading.Thread(target=server.serve_forever, name="http-accept", daemon=True).start()
+    return server
+
+
+def drain(server: PooledWSGIServer, delay: float = 0.0, timeout: float = DEFAULT_DRAIN_TIMEOUT) -> bool:
+    """Shuts a started server down gracefully.
+
+    /readyz fails from the start; requests keep being served for `delay` seconds,
+    then no new connections are accepted. Requests in flight and jobs get `timeout`
+    seconds to finish before the remaining jobs are cancelled. Returns True when
+    everything finished in time.
+    """
+    start_draining()
+    time.sleep(delay)
+    deadline = time.monotonic() + timeout
+    server.shutdown()  # Stops the accept loop, which closes the listening socket
+    idle = server.wait_idle(max(0.0, deadline - time.monotonic()))
+    cancelled = jobs.drain(max(0.0, deadline - time.monotonic()))
+    uploads.close()
+    get_store().close()  # Commit queued history events; process workers exit without running atexit
+    return idle and not cancelled
+
+
+def _serve_until_signal(server: PooledWSGIServer, drain_delay: float, drain_timeout: float) -> int:
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+    threading.Thread(target=server.serve_forever, name="http-accept", daemon=True).start()
+    while not stop.wait(1.0):  # A timeout keeps the wait interruptible on every platform
+        pass
+    return 0 if drain(server, drain_delay, drain_timeout) else 1
+
+
+def _supervise(server: PooledWSGIServer, processes: int, drain_delay: float, drain_timeout: float) -> int:
+    """Forks `processes` workers on the bound socket and replaces any that die until a signal arrives."""
+    children = set()
+    stopping = []
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                status = _serve_until_signal(server, drain_delay, drain_timeout)
+            finally:
+                os._exit(status)
+        children.add(pid)
+
+    def stop(signum, frame):
+        stopping.append(signum)
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, stop)
+    for _ in range(processes):
+        spawn()
+    status = 0
+    while children:
+        pid, wait_status = os.wait()
+        children.discard(pid)
+        if os.waitstatus_to_exitcode(wait_status) != 0:
+            status = 1
+        if not stopping:
+            print(f"Worker {pid} exited unexpectedly; starting a new one", file=sys.stderr)
+            time.sleep(RESPAWN_DELAY)
+            spawn()
+    server.server_close()
+    return status
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, threads: int = DEFAULT_THREADS,
+          processes: int = 1, backlog: int = DEFAULT_BACKLOG, drain_delay: float = 0.0,
+          drain_timeout: float = DEFAULT_DRAIN_TIMEOUT) -> int:
+    """Serves the API until SIGTERM or SIGINT, then drains it. Returns the exit status."""
+    if processes > 1 and not hasattr(os, "fork"):
+        raise ValueError("Process workers need fork, which this platform lacks; use --threads")
+    server = make_server(host, port, threads, backlog)
+    print(f"Serving on http://{host}:{server.port} with {max(1, processes)} x {threads} workers", file=sys.stderr)
+    if processes > 1:
+        return _supervise(server, processes, drain_delay, drain_timeout)
+    return _serve_until_signal(server, drain_delay, drain_timeout)
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Adds the server options (shared with run.py)."""
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT})")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS,
+                        help=f"Requests handled at once per process (default: {DEFAULT_THREADS})")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes sharing the socket (default: 1)")
+    parser.add_argument("--backlog", type=int, default=DEFAULT_BACKLOG,
+                        help=f"Connections that may wait for a thread before new ones get a 503 "
+                             f"(default: {DEFAULT_BACKLOG})")
+    parser.add_argument("--drain-delay", type=float, default=0.0,
+                        help="Seconds to keep serving with /readyz failing before shutting down")
+    parser.add_argument("--drain-timeout", type=float, default=DEFAULT_DRAIN_TIMEOUT,
+                        help=f"Seconds to wait for requests and jobs on shutdown (default: {DEFAULT_DRAIN_TIMEOUT:g})")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.server", description=__doc__.split("\n")[0])
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        return serve(args.host, args.port, args.threads, args.processes, args.backlog, args.drain_delay,
+                     args.drain_timeout)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""Integrity checks and header inspection of encrypted files, without writing plaintext.
+
+verify_file authenticates every chunk on the parallel engine and throws the
+plaintext away, so a scan costs one read of the file; verify_stream does the
+same for a pipe. inspect_file only parses the header and trailer and never runs
+the KDF.
+"""
+import os
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from . import container
+from .ciphers import make_aead
+from .container import KDF_ARGON2ID_WRAPPED
+from .crypto_utils import (ARGON2_MEMORY_COST, ARGON2_PARALLELISM, ARGON2_TIME_COST, CHUNK_SIZE, MMAP_THRESHOLD,
+                           NONCE_SIZE, SALT_SIZE, TAG_SIZE, decrypt_stream, derive_key, header_key, log_event,
+                           map_file, mapped_entries, max_in_flight, open_chunk, open_index, parallel_map,
+                           read_chunks, read_entries, unmap)
+
+STATUS_OK = "ok"
+STATUS_WRONG_PASSWORD = "wrong_password"
+STATUS_CORRUPTED = "corrupted"
+STATUS_UNREADABLE = "unreadable"  # Wrong password or damage; the file has no way to tell them apart
+MAX_REPORTED_FAILURES = 1000  # Failed chunk numbers listed in a report
+
+
+def _flag_names(flags: int) -> list:
+    names = {container.FLAG_ARCHIVE: "archive", container.FLAG_COMPRESSED: "compressed",
+             container.FLAG_CHUNK_HASHES: "incremental"}
+    return [name for flag, name in names.items() if flags & flag]
+
+
+def inspect_file(path: str) -> dict:
+    """Describes an encrypted file from its header and trailer alone.
+
+    Reports the format version, cipher, chunk size, KDF and its parameters, flags,
+    stored extension and the sizes of the chunk data and sealed index. No key is
+    derived, so this is instant for any file size.
+    """
+    with open(path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        header = container.read_header(f)
+        if header is None:
+            f.seek(SALT_SIZE + NONCE_SIZE)
+            ext_len = f.read(1)
+            extension = f.read(ext_len[0]).decode(errors="replace") if ext_len else ""
+            return {"format_version": 1, "file_size": file_size, "cipher": container.CIPHER_NAMES[container.CIPHER_AES_256_GCM],
+                    "chunk_size": CHUNK_SIZE, "extension": extension, "flags": [],
+                    "kdf": {"name": "argon2id", "time_cost": ARGON2_TIME_COST,
+                            "memory_cost": ARGON2_MEMORY_COST, "parallelism": ARGON2_PARALLELISM}}
+
+        data_offset = f.tell()
+        try:
+            sealed, index_offset = container.read_sealed_index(f)
+            data_bytes, index_bytes = index_offset - data_offset, len(sealed)
+        except ValueError:
+            data_bytes = index_bytes = None  # Truncated: no trailer
+        return {"format_version": header.version, "file_size": file_size,
+                "cipher": container.CIPHER_NAMES.get(header.cipher_id, str(header.cipher_id)),
+                "chunk_size": header.chunk_size, "extension": header.extension.decode(errors="replace"),
+                "flags": _flag_names(header.flags),
+                "kdf": {"name": container.KDF_NAMES.get(header.kdf_id, str(header.kdf_id)),
+                        "time_cost": header.time_cost, "memory_cost": header.memory_cost,
+                        "parallelism": header.parallelism},
+                "data_bytes": data_bytes, "index_bytes": index_bytes}
+
+
+def _report(status, chunks=0, verified_bytes=0, failed=(), error=None) -> dict:
+    failed = list(failed)
+    return {"ok": status == STATUS_OK, "status": status, "chunks": chunks, "verified_bytes": verified_bytes,
+            "failed_count": len(failed), "failed_chunks": failed[:MAX_REPORTED_FAILURES], "error": error}
+
+
+def _scan(chunks, check, workers, progress):
+    """Runs check(number, chunk) -> (plaintext size or None, ciphertext size) over every chunk.
+
+    Returns (chunk count, plaintext bytes verified, numbers of the failed chunks).
+    """
+    count = verified_bytes = 0
+    failed = []
+    for number, (size, length) in enumerate(parallel_map(check, chunks, workers)):
+        count += 1
+        if size is None:
+            failed.append(number)
+        else:
+            verified_bytes += size
+        if progress:
+            progress(length)
+    return count, verified_bytes, failed
+
+
+def _verify_legacy(infile, password: str, workers: int, progress) -> dict:
+    salt = infile.read(SALT_SIZE)
+    iv = infile.read(NONCE_SIZE)
+    ext_len = infile.read(1)
+    infile.read(ext_len[0] if ext_len else 0)
+    aead = AESGCM(derive_key(password, salt))
+
+    def check(number, chunk):
+        try:
+            return len(aead.decrypt(iv, chunk, None)), len(chunk)
+        except InvalidTag:
+            return None, len(chunk)
+
+    chunk_count, verified_bytes, failed = _scan(read_chunks(infile, CHUNK_SIZE + TAG_SIZE), check, workers,
+                                                progress)
+    if failed and failed[0] == 0:
+        return _report(STATUS_UNREADABLE, chunk_count, verified_bytes, failed, "Incorrect password or corrupted file")
+    if failed:
+        return _report(STATUS_CORRUPTED, chunk_count, verified_bytes, failed, f"Chunk {failed[0]} failed authentication")
+    return _report(STATUS_OK, chunk_count, verified_bytes)
+
+
+def _verify_v2(infile, header, password: str, workers: int, progress) -> dict:
+    try:
+        aead = make_aead(header.cipher_id, header_key(password, header))
+    except InvalidTag:
+        return _report(STATUS_WRONG_PASSWORD, error="Incorrect password")  # The data key did not unwrap
+    try:
+        index = open_index(infile, aead, header)
+    except InvalidTag:
+        if header.kdf_id == KDF_ARGON2ID_WRAPPED:
+            return _report(STATUS_CORRUPTED, error="Chunk index failed authentication")
+        return _report(STATUS_UNREADABLE, error="Incorrect password or corrupted file")
+    except ValueError as e:
+        return _report(STATUS_CORRUPTED, error=str(e))
+
+    aad = header.aad
+
+    def check(number, chunk):
+        entry = index.entries[number]
+        try:
+            open_chunk(aead, header, aad, number, entry.flags, chunk, entry.plain_size,
+                       index.generation_of(number))
+            return entry.plain_size, len(chunk)
+        except (InvalidTag, ValueError):
+            return None, len(chunk)
+
+    # Large files are memory-mapped and their pages dropped behind the scan
+    mapped = map_file(infile) if index.total_size >= MMAP_THRESHOLD else None
+    try:
+        if mapped is not None:
+            chunks = mapped_entries(mapped, index.entries, max_in_flight(workers) + 1)
+        else:
+            chunks = read_entries(infile, index.entries)
+        _, verified_bytes, failed = _scan(chunks, check, workers, progress)
+    finally:
+        if mapped is not None:
+            unmap(mapped)
+    if failed:
+        return _report(STATUS_CORRUPTED, len(index.entries), verified_bytes, failed,
+                       f"Chunk {failed[0]} failed authentication")
+    return _report(STATUS_OK, len(index.entries), verified_bytes)
+
+
+def verify_file(path: str, password: str, workers: int = None, progress=None, log: bool = True) -> dict:
+    """Authenticates every chunk of an encrypted file and discards the plaintext.
+
+    Returns a report with `ok`, a `status` (ok, wrong_password, corrupted or
+    unreadable), the chunk count, the plaintext bytes that verified, the numbers of
+    the chunks that failed (up to MAX_REPORTED_FAILURES) and an error message.
+    The scan continues past bad chunks so every damaged chunk is listed.
+    `progress(byte_count)` is called after each chunk with the ciphertext bytes read.
+    Legacy v1 files have no index, so truncation at a chunk boundary goes unnoticed.
+    With `log` the result is recorded in the history store.
+    """
+    with open(path, 'rb') as infile:
+        try:
+            header = container.read_header(infile)
+        except ValueError as e:
+            report = _report(STATUS_CORRUPTED, error=str(e))
+        else:
+            if header is None:
+                report = _verify_legacy(infile, password, workers, progress)
+            else:
+                report = _verify_v2(infile, header, password, workers, progress)
+    if log:
+        status = "SUCCESS" if report["ok"] else f"FAILED - {report['error']}"
+        log_event("VERIFY", os.path.basename(path), status, path)
+    return report
+
+
+def verify_stream(stream, password: str) -> dict:
+    """Authenticates a v2 container read from a forward-only stream, such as a pipe.
+
+    Built on decrypt_stream, so it has the same limits (no legacy or incremental
+    files) and stops at the first failure: the report names no failed chunks.
+    """
+    try:
+        _, pieces = decrypt_stream(stream, password)
+    except ValueError as e:
+        return _report(STATUS_UNREADABLE, error=str(e))
+    chunks = verified_bytes = 0
+    try:
+        for piece in pieces:
+            chunks += 1
+            verified_bytes += len(piece)
+    except ValueError as e:
+        return _report(STATUS_CORRUPTED, chunks, verified_bytes, error=str(e))
+    return _report(STATUS_OK, chunks, verified_bytes)
@@ -0,0 +1 @@
+"""Offline throughput and latency benchmarks; run `python -m benchmarks --help`."""
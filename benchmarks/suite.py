@@ -0,0 +1,314 @@
+"""Benchmarks for the KDF, the file pipeline, the HTTP API, the GUI workers and CLI startup.
+
+Everything runs offline, on synthetic random data in a scratch directory (which
+also receives the uploads folder and history database of the runs). Results are
+written as JSON; given a baseline, every case is compared by its median time.
+No baseline ships with the repo: record one first, on the machine that runs the
+comparison, since timings are specific to it:
+
+    python -m benchmarks --profile quick --save-baseline baseline.json
+    python -m benchmarks --profile quick --out results.json --baseline baseline.json
+
+A case regresses when its median grows by more than --tolerance. With
+--fail-on-regression the exit status is then 1, so CI catches a slower hot path.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+KB = 1024
+MB = 1024 * KB
+GB = 1024 * MB
+PASSWORD = "benchmark password"
+
+PROFILES = {
+    "quick": {
+        "kdf": [(2, 19 * 1024, 1), (3, 64 * 1024, 1), (4, 64 * 1024, 1)],
+        "sizes": [1 * KB, 1 * MB, 64 * MB],
+        "chunk_sizes": [64 * KB, 1 * MB, 4 * MB],
+        "http_sizes": [1 * KB, 1 * MB, 16 * MB],
+        "repeat": 3,
+    },
+    "full": {
+        "kdf": [(t, m, p) for m in (19 * 1024, 64 * 1024, 256 * 1024) for t in (2, 3, 4) for p in (1, 4)],
+        "sizes": [1 * KB, 1 * MB, 64 * MB, 1 * GB, 4 * GB],
+        "chunk_sizes": [64 * KB, 1 * MB, 4 * MB, 16 * MB],
+        "http_sizes": [1 * KB, 1 * MB, 64 * MB, 256 * MB],
+        "repeat": 5,
+    },
+}
+GROUPS = ("kdf", "file", "http", "gui", "cli")
+DEFAULT_TOLERANCE = 0.15
+
+
+def format_size(size: int) -> str:
+    for unit, scale in (("GB", GB), ("MB", MB), ("KB", KB)):
+        if size >= scale and size % scale == 0:
+            return f"{size // scale}{unit}"
+    return f"{size}B"
+
+
+def make_input(directory: str, size: int) -> str:
+    """Writes `size` random (incompressible) bytes and returns the path."""
+    path = os.path.join(directory, f"input_{format_size(size)}.bin")
+    if not os.path.exists(path):
+        with open(path, "wb") as f:
+            remaining = size
+            while remaining:
+                block = min(remaining, 16 * MB)
+                f.write(os.urandom(block))
+                remaining -= block
+    return path
+
+
+def timed(run, repeat: int, setup=None) -> list:
+    """Wall-clock seconds of `repeat` calls to run(); setup() runs untimed before each."""
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def result(name: str, group: str, params: dict, samples: list, size: int = None) -> dict:
+    median = statistics.median(samples)
+    record = {"name": name, "group": group, "params": params, "samples": samples,
+              "best": min(samples), "median": median}
+    if size:
+        record["bytes"] = size
+        record["throughput_mb_s"] = size / MB / median if median else None
+    return record
+
+
+def bench_kdf(config, repeat, scratch):
+    from backend.crypto_utils import derive_key
+
+    for time_cost, memory_cost, parallelism in config["kdf"]:
+        # A fresh salt each time, so the key cache never answers
+        samples = timed(lambda: derive_key(PASSWORD, os.urandom(16), time_cost, memory_cost, parallelism), repeat)
+        yield result(f"kdf/t={time_cost}/m={memory_cost // 1024}MiB/p={parallelism}", "kdf",
+                     {"time_cost": time_cost, "memory_cost": memory_cost, "parallelism": parallelism}, samples)
+
+
+def bench_file(config, repeat, scratch):
+    from backend.crypto_utils import decrypt_file, encrypt_file
+    from backend.kdf_calibration import KdfParams
+
+    cheap_kdf = KdfParams(1, 8, 1)  # These cases measure the chunk pipeline, not Argon2
+    encrypted = os.path.join(scratch, "file.enc")
+    decrypted = os.path.join(scratch, "file.out")
+    for size in config["sizes"]:
+        source = make_input(scratch, size)
+        for chunk_size in config["chunk_sizes"]:
+            if chunk_size > max(size, config["chunk_sizes"][0]):
+                continue  # Same as the smallest chunk size for this input
+            params = {"size": size, "chunk_size": chunk_size}
+            label = f"size={format_size(size)}/chunk={format_size(chunk_size)}"
+            samples = timed(lambda: encrypt_file(source, PASSWORD, encrypted, chunk_size=chunk_size,
+                                                 kdf_params=cheap_kdf), repeat)
+            yield result(f"encrypt_file/{label}", "file", params, samples, size)
+            samples = timed(lambda: decrypt_file(encrypted, PASSWORD, decrypted), repeat)
+            yield result(f"decrypt_file/{label}", "file", params, samples, size)
+            for path in (encrypted, decrypted + ".bin"):
+                if os.path.exists(path):
+                    os.remove(path)
+        if size >= GB:
+            os.remove(source)  # Keep at most one large input on disk
+
+
+def bench_http(config, repeat, scratch):
+    """The API through the test client, with the default Argon2 parameters.
+
+    Encryption always runs the KDF (a fresh salt per file). Decryption is timed
+    cold, with the key cache cleared before each run, and again as "_cached",
+    where the key derived by the previous run is reused.
+    """
+    from backend.app import app
+    from backend.crypto_utils import key_cache
+
+    client = app.test_client()
+    for size in config["http_sizes"]:
+        source = make_input(scratch, size)
+        with open(source, "rb") as f:
+            data = f.read()
+        encrypted = {}
+
+        def encrypt_multipart():
+            response = client.post("/encrypt", data={"file": (io.BytesIO(data), "bench.bin"),
+                                                     "password": PASSWORD})
+            assert response.status_code == 200, response.data[:200]
+            encrypted["body"] = response.data
+
+        def decrypt_multipart():
+            response = client.post("/decrypt", data={"file": (io.BytesIO(encrypted["body"]), "bench.bin.enc"),
+                                                     "password": PASSWORD})
+            assert response.status_code == 200, response.data[:200]
+
+        def encrypt_stream():
+            response = client.post("/encrypt", data=data, headers={
+                "Content-Type": "application/octet-stream", "X-Password": PASSWORD, "X-Filename": "bench.bin"})
+            assert response.status_code == 200
+            encrypted["stream"] = response.data
+
+        def decrypt_stream():
+            response = client.post("/decrypt", data=encrypted["stream"], headers={
+                "Content-Type": "application/octet-stream", "X-Password": PASSWORD, "X-Filename": "bench.enc"})
+            assert response.status_code == 200
+
+        params = {"size": size}
+        for name, run in (("encrypt", encrypt_multipart), ("encrypt_stream", encrypt_stream)):
+            yield result(f"http/{name}/size={format_size(size)}", "http", params, timed(run, repeat), size)
+        for name, run in (("decrypt", decrypt_multipart), ("decrypt_stream", decrypt_stream)):
+            yield result(f"http/{name}/size={format_size(size)}", "http", params,
+                         timed(run, repeat, setup=key_cache.clear), size)
+            yield result(f"http/{name}_cached/size={format_size(size)}", "http", params, timed(run, repeat), size)
+
+
+def bench_gui(config, repeat, scratch):
+    """Round trip through the GUI workers (run synchronously) and the in-process transport."""
+    try:
+        from frontend.decrypt_tab import DecryptWorker
+        from frontend.encrypt_tab import EncryptWorker
+    except ImportError as e:
+        print(f"Skipping GUI benchmarks: {e}", file=sys.stderr)
+        return
+    from frontend.transport import LocalTransport
+
+    transport = LocalTransport()
+    encrypted = os.path.join(scratch, "gui.enc")
+    decrypted = os.path.join(scratch, "gui.out")
+    for size in config["http_sizes"]:
+        source = make_input(scratch, size)
+
+        def round_trip():
+            EncryptWorker(source, PASSWORD, encrypted, transport).run()
+            DecryptWorker(encrypted, PASSWORD, decrypted, transport).run()
+
+        yield result(f"gui/round_trip/size={format_size(size)}", "gui", {"size": size}, timed(round_trip, repeat),
+                     size)
+
+
+def bench_cli(config, repeat, scratch):
+    """Cold start of the aesenc command: a fresh interpreter per run, as in a shell pipeline."""
+    script = os.path.join(ROOT, "aesenc.py")
+    env = dict(os.environ, AESENC_PASSWORD=PASSWORD)
+    data = os.urandom(1 * KB)
+
+    def run(*args, stdin=b""):
+        subprocess.run([sys.executable, script, *args], input=stdin, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+
+    yield result("cli/help", "cli", {}, timed(lambda: run("--help"), repeat))
+    # A cheap KDF, so the case measures imports and setup rather than Argon2
+    samples = timed(lambda: run("encrypt", "--time-cost", "1", "--memory-cost", "8", stdin=data), repeat)
+    yield result("cli/encrypt/size=1KB", "cli", {"size": 1 * KB}, samples)
+
+
+BENCHMARKS = {"kdf": bench_kdf, "file": bench_file, "http": bench_http, "gui": bench_gui, "cli": bench_cli}
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> dict:
+    """Compares medians with a baseline report; returns the changes per case."""
+    previous = {record["name"]: record for record in baseline.get("results", [])}
+    cases = []
+    for record in results:
+        old = previous.get(record["name"])
+        if old is None or not old.get("median"):
+            continue
+        ratio = record["median"] / old["median"]
+        status = "regression" if ratio > 1 + tolerance else "improvement" if ratio < 1 - tolerance else "unchanged"
+        cases.append({"name": record["name"], "baseline": old["median"], "current": record["median"],
+                      "ratio": ratio, "status": status})
+    return {"tolerance": tolerance, "cases": cases,
+            "regressions": [case["name"] for case in cases if case["status"] == "regression"]}
+
+
+def metadata(profile: str) -> dict:
+    import cryptography
+
+    return {"profile": profile, "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "machine": platform.machine(), "cpu_count": os.cpu_count(),
+            "cryptography": cryptography.__version__}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split("\n")[0])
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--only", nargs="+", choices=GROUPS, help="Run only these groups")
+    parser.add_argument("--repeat", type=int, help="Runs per case (default from the profile)")
+    parser.add_argument("--max-size", type=int, help="Skip inputs larger than this many bytes")
+    parser.add_argument("--out", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="Compare against this JSON report")
+    parser.add_argument("--save-baseline", help="Also write the report here, as a new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative slowdown of a median before it counts as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    config = dict(PROFILES[args.profile])
+    if args.max_size:
+        for key in ("sizes", "http_sizes"):
+            config[key] = [size for size in config[key] if size <= args.max_size]
+    repeat = args.repeat or config["repeat"]
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    out_paths = [os.path.abspath(path) for path in (args.out, args.save_baseline) if path]
+
+    results = []
+    scratch = tempfile.mkdtemp(prefix="aes-bench-")
+    cwd = os.getcwd()
+    os.chdir(scratch)  # The app writes its uploads folder and history next to the working directory
+    try:
+        # Progress goes to stderr; so does anything the code under test prints
+        with contextlib.redirect_stdout(sys.stderr):
+            for group in args.only or GROUPS:
+                for record in BENCHMARKS[group](config, repeat, scratch):
+                    results.append(record)
+                    rate = f" {record['throughput_mb_s']:.1f} MB/s" if record.get("throughput_mb_s") else ""
+                    print(f"{record['name']:<50} {record['median'] * 1000:>10.2f} ms{rate}")
+    finally:
+        if "backend.history" in sys.modules:
+            sys.modules["backend.history"].get_store().close()  # Commit queued events before the scratch dir goes
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    report = {"meta": metadata(args.profile), "results": results}
+    if baseline is not None:
+        report["comparison"] = compare(results, baseline, args.tolerance)
+        for case in report["comparison"]["cases"]:
+            if case["status"] != "unchanged":
+                print(f"{case['status']:>11}: {case['name']} {case['ratio'] - 1:+.0%}", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if not args.out:
+        print(text)
+    for path in out_paths:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+
+    if baseline is not None and args.fail_on_regression and report["comparison"]["regressions"]:
+        return 1
+    return 0
@@ -1,57 +1,32 @@
-import os
 import requests
-import re
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QPushButton, QLineEdit, QFileDialog, QLabel, QProgressBar, QMessageBox, QAction
 from PyQt5.QtCore import QThread, pyqtSignal, Qt
 import qtawesome as qta
+from .transport import get_default_transport
 
 class DecryptWorker(QThread):
     """Worker thread for decryption."""
     progress = pyqtSignal(int)
     finished = pyqtSignal(bool)
     error_message = pyqtSignal(str)  # Signal for errors
+    status = pyqtSignal(str)  # Throughput and ETA of the current transfer
 
-    def __init__(self, file_path, password, save_path):
+    def __init__(self, file_path, password, save_path, transport=None):
         super().__init__()
         self.file_path = file_path
         self.password = password
         self.save_path = save_path
+        self.transport = transport or get_default_transport()
+
+    def report(self, percent, text):
+        self.progress.emit(percent)
+        self.status.emit(text)
 
     def run(self):
-        """Runs decryption in the background and updates progress."""
+        """Runs decryption through the transport in the background and reports progress."""
         try:
-            with open(self.file_path, 'rb') as file:
-                files = {'file': file}
-                data = {'password': self.password, 'output_path': self.save_path}  # Ensure password is correctly sent
-                response = requests.post("http://127.0.0.1:5000/decrypt", files=files, data=data) # Removed stream=True as it's not utilized for content writing
-
-                if response.status_code == 200:
-                    # Get filename from Content-Disposition header
-                    content_disposition = response.headers.get('content-disposition')
-                    filename = None
-                    if content_disposition:
-                        match = re.search(r'filename="?([^"]+)"?', content_disposition)
-                        if match:
-                            filename = match.group(1)
-                        else:
-                            # Try download_name (Flask >=2.0)
-                            match = re.search(r'download_name="?([^"]+)"?', content_disposition)
-                            if match:
-                                filename = match.group(1)
-                    if filename:
-                        save_path = os.path.join(os.path.dirname(self.save_path), filename)
-                    else:
-                        save_path = self.save_path
-                else:
-                    error_msg = response.json().get("error", "Unknown error occurred")
-                    print(f"Decryption error from server: {error_msg}")  # Debugging
-                    self.error_message.emit(error_msg)
-                    self.finished.emit(False)
-
-                with open(save_path, 'wb') as output_file:
-                    output_file.write(response.content)                    
-                self.finished.emit(True)
-
+            self.transport.decrypt(self.file_path, self.password, self.save_path, self.report)
+            self.finished.emit(True)
         except Exception as e:
             # Catch specific request exceptions for better error messages
             if isinstance(e, requests.exceptions.RequestException):
@@ -91,6 +66,7 @@ class DecryptTab(QWidget):
         self.decrypt_button.clicked.connect(self.start_decryption)
 
         self.progress = QProgressBar()
+        self.transfer_label = QLabel("")  # Throughput and ETA while a file is transferred
 
         layout.addWidget(self.file_button)
         layout.addWidget(self.file_label)
@@ -98,6 +74,7 @@ class DecryptTab(QWidget):
         layout.addWidget(self.save_button)
         layout.addWidget(self.decrypt_button)
         layout.addWidget(self.progress)
+        layout.addWidget(self.transfer_label)
         self.setLayout(layout)
 
         self.file_path = None
@@ -116,10 +93,6 @@ class DecryptTab(QWidget):
 
     def start_decryption(self):
         """Start decryption in a separate thread."""
-        print(f"File path: {self.file_path}")
-        print(f"Password: {self.password_input.text()}")
-        print(f"Save path: {self.save_path}")
-
         if not self.file_path or not self.password_input.text() or not self.save_path:
             QMessageBox.warning(self, "Error", "Please select a file, enter a password, and choose a save location.")
             return
@@ -129,6 +102,7 @@ class DecryptTab(QWidget):
 
         self.worker = DecryptWorker(self.file_path, self.password_input.text(), self.save_path)
         self.worker.progress.connect(self.progress.setValue)
+        self.worker.status.connect(self.transfer_label.setText)
         self.worker.finished.connect(self.decryption_complete)
         self.worker.error_message.connect(self.show_error)
         self.worker.start()
@@ -3,34 +3,33 @@ from PyQt5.QtCore import Qt, QThread, pyqtSignal
 import requests # Import requests for network operations
 import os
 import qtawesome as qta
+from .transport import TransportError, get_default_transport
 
 class EncryptWorker(QThread):
     """Worker thread for encryption."""
     progress = pyqtSignal(int)
     finished = pyqtSignal(bool)
+    status = pyqtSignal(str)  # Throughput and ETA of the current transfer
 
-    def __init__(self, file_path, password, save_path):
+    def __init__(self, file_path, password, save_path, transport=None):
         super().__init__()
         self.file_path = file_path
         self.password = password
         self.save_path = save_path
+        self.transport = transport or get_default_transport()
+
+    def report(self, percent, text):
+        self.progress.emit(percent)
+        self.status.emit(text)
 
     def run(self):
-        """Runs encryption in the background and updates progress."""
+        """Runs encryption through the transport in the background and reports progress."""
         try:
-            with open(self.file_path, 'rb') as file:
-                files = {'file': file}
-                data = {'password': self.password, 'output_path': self.save_path}
-                response = requests.post("http://127.0.0.1:5000/encrypt", files=files, data=data) # Removed stream=True as it's not utilized for content writing
-
-                if response.status_code == 200:
-                    with open(self.save_path, 'wb') as output_file:
-                        output_file.write(response.content) # This will now be the encrypted file content
-                    self.finished.emit(True)
-                else:
-                    error_msg = response.json().get("error", "Unknown encryption error occurred")
-                    print(f"Encryption error from server: {error_msg}")
-                    self.finished.emit(False) # Consider adding an error_message signal here too
+            self.transport.encrypt(self.file_path, self.password, self.save_path, self.report)
+            self.finished.emit(True)
+        except TransportError as e:
+            print(f"Encryption error from backend: {e}")
+            self.finished.emit(False) # Consider adding an error_message signal here too
         except requests.exceptions.RequestException as e: # Catch network/request errors
             print(f"Network error during encryption: {e}")
             self.finished.emit(False)
@@ -70,6 +69,7 @@ class EncryptTab(QWidget):
         self.encrypt_button.clicked.connect(self.start_encryption)
 
         self.progress = QProgressBar()
+        self.transfer_label = QLabel("")  # Throughput and ETA while a file is transferred
 
         layout.addWidget(self.file_button)
         layout.addWidget(self.file_label)
@@ -77,6 +77,7 @@ class EncryptTab(QWidget):
         layout.addWidget(self.save_button)
         layout.addWidget(self.encrypt_button)
         layout.addWidget(self.progress)
+        layout.addWidget(self.transfer_label)
         self.setLayout(layout)
 
         self.file_path = None
@@ -114,6 +115,7 @@ class EncryptTab(QWidget):
 
         self.worker = EncryptWorker(self.file_path, self.password_input.text(), self.save_path)
         self.worker.progress.connect(self.progress.setValue)
+        self.worker.status.connect(self.transfer_label.setText)
         self.worker.finished.connect(self.encryption_complete)
         self.worker.start()
 
@@ -1,77 +1,217 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QTextEdit, QPushButton
-from backend.crypto_utils import get_full_history, clear_history, get_recent_events
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QComboBox, QPushButton,
+                             QTableView, QHeaderView, QAbstractItemView)
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, QThread, QTimer, Qt, pyqtSignal
+from PyQt5.QtGui import QColor
+from backend.crypto_utils import clear_history
+from backend.history import get_store
+
+PAGE_SIZE = 200  # Rows fetched from the history store at a time
+SEARCH_DELAY_MS = 250  # Typing pause before the search runs
+ALL = "All"
+
+class HistoryQuery(QThread):
+    """Runs one history store query off the UI thread and emits its result."""
+    result = pyqtSignal(object)
+
+    def __init__(self, query):
+        super().__init__()
+        self.query = query
+
+    def run(self):
+        try:
+            self.result.emit(self.query())
+        except Exception as e:
+            print(f"History query failed: {e}")
+            self.result.emit(None)
+
+class HistoryModel(QAbstractTableModel):
+    """Table of history events, newest first, fetched page by page as the view scrolls.
+
+    Only the rows scrolled into view so far are held in memory. Pages are loaded on
+    a background thread; results of a query that was replaced by newer filters are dropped.
+    """
+    COLUMNS = ("Time", "Type", "File", "Status", "Detail", "Saved at")
+    total_changed = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.filters = {}
+        self.events = []
+        self.has_more = True
+        self.loading = False
+        self.generation = 0  # Bumped whenever the filters change
+        self.threads = set()
+
+    def _run(self, query, callback):
+        thread = HistoryQuery(query)
+        generation = self.generation
+        thread.result.connect(lambda result: callback(generation, result))
+        thread.finished.connect(lambda: self.threads.discard(thread))
+        self.threads.add(thread)
+        thread.start()
+
+    def set_filters(self, **filters):
+        """Replaces the filters and starts again from the newest event."""
+        self.beginResetModel()
+        self.filters = {key: value for key, value in filters.items() if value}
+        self.events = []
+        self.has_more = True
+        self.loading = False
+        self.generation += 1
+        self.endResetModel()
+        filters = dict(self.filters)
+        self._run(lambda: get_store().count(**filters), self._counted)
+        self.fetchMore(QModelIndex())
+
+    def _counted(self, generation, total):
+        if generation == self.generation and total is not None:
+            self.total_changed.emit(total)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.events)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.has_more and not self.loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self.loading = True
+        before_id = self.events[-1].id if self.events else None
+        filters = dict(self.filters)
+        self._run(lambda: get_store().query(before_id=before_id, limit=PAGE_SIZE, **filters), self._page_loaded)
+
+    def _page_loaded(self, generation, events):
+        if generation != self.generation:
+            return  # The filters changed while this page was loading
+        self.loading = False
+        if events is None:
+            self.has_more = False
+            return
+        self.has_more = len(events) == PAGE_SIZE
+        if events:
+            self.beginInsertRows(QModelIndex(), len(self.events), len(self.events) + len(events) - 1)
+            self.events.extend(events)
+            self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        event = self.events[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            return (event.timestamp, event.event_type, event.filename, event.status,
+                    event.detail, event.output_path)[column]
+        if role == Qt.ToolTipRole and column in (2, 4, 5):
+            return (None, None, event.filename, None, event.detail, event.output_path)[column]
+        if role == Qt.ForegroundRole and column == 3:
+            # Color status
+            return QColor("#2ecc40") if event.status == "SUCCESS" else QColor("#e74c3c")
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return None
 
 class HistoryTab(QWidget):
     def __init__(self):
         super().__init__()
         layout = QVBoxLayout()
 
-        # History label and text area
+        # History label and filters
         self.history_label = QLabel("Encryption & Decryption History:")
-        self.history_text = QTextEdit()
-        self.history_text.setReadOnly(True)
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search file names and paths")
+        self.search_input.textChanged.connect(lambda: self.search_timer.start())
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.apply_filters)
+        self.type_filter = QComboBox()
+        self.type_filter.addItem(ALL)
+        self.type_filter.activated.connect(self.apply_filters)
+        self.status_filter = QComboBox()
+        self.status_filter.addItem(ALL)
+        self.status_filter.activated.connect(self.apply_filters)
+
+        filters = QHBoxLayout()
+        filters.addWidget(self.search_input, 1)
+        filters.addWidget(QLabel("Type:"))
+        filters.addWidget(self.type_filter)
+        filters.addWidget(QLabel("Status:"))
+        filters.addWidget(self.status_filter)
+
+        # History table; rows are fetched lazily as it scrolls
+        self.model = HistoryModel(self)
+        self.model.total_changed.connect(lambda total: self.count_label.setText(f"{total:,} events"))
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setWordWrap(False)
+        self.table.verticalHeader().setVisible(False)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)  # No per-row measuring
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.count_label = QLabel("")
 
         # Buttons for history management
         self.refresh_button = QPushButton("Refresh History")
-        self.refresh_button.clicked.connect(self.load_recent_history)
-
-        self.show_history_button = QPushButton("Show History")
-        self.show_history_button.clicked.connect(self.load_full_history)
+        self.refresh_button.clicked.connect(self.refresh)
 
         self.clear_history_button = QPushButton("Clear History")
         self.clear_history_button.clicked.connect(self.clear_history)
 
         # Add widgets to layout
         layout.addWidget(self.history_label)
-        layout.addWidget(self.history_text)
+        layout.addLayout(filters)
+        layout.addWidget(self.table)
+        layout.addWidget(self.count_label)
         layout.addWidget(self.refresh_button)
-        layout.addWidget(self.show_history_button)
         layout.addWidget(self.clear_history_button)
         self.setLayout(layout)
 
+        self.option_threads = set()
         # Load recent history on startup
-        self.load_recent_history()
-
-    def load_recent_history(self):
-        """Loads the most recent encryption/decryption events with color coding."""
-        self.history_text.setHtml(self.format_history(get_recent_events()))
-
-    def load_full_history(self):
-        """Loads the complete encryption history with color coding."""
-        self.history_text.setHtml(self.format_history(get_full_history()))
-
-    def format_history(self, log_text):
-        """Format log entries with color and spacing."""
-        if not log_text:
-            return "<i>No history available.</i>"
-        lines = log_text.strip().split('\n')
-        html_lines = []
-        for line in lines:
-            # Example log: [timestamp] EVENT - filename - STATUS - output_path
-            parts = line.split(' - ')
-            if len(parts) >= 4:
-                timestamp_event = parts[0]
-                filename = parts[1]
-                status = parts[2]
-                output_path = parts[3]
-                # Color status
-                if "SUCCESS" in status:
-                    status_html = f'<span style="color: #2ecc40; font-weight: bold;">{status}</span>'
-                else:
-                    status_html = f'<span style="color: #e74c3c; font-weight: bold;">{status}</span>'
-                html_lines.append(
-                    f'<div style="padding:8px 0 8px 0; margin-bottom:6px;">'
-                    f'<span style="color:#888;">{timestamp_event}</span><br>'
-                    f'<b>File:</b> {filename}<br>'
-                    f'<b>Status:</b> {status_html}<br>'
-                    f'<b>Saved at:</b> <span style="color:#555;">{output_path}</span>'
-                    f'</div>'
-                )
-            else:
-                html_lines.append(f'<div style="padding:8px 0;">{line}</div>')
-        return "<div>" + "".join(html_lines) + "</div>"
+        self.refresh()
+
+    def refresh(self):
+        """Reloads the filter choices and the newest events."""
+        self.load_filter_options()
+        self.apply_filters()
+
+    def apply_filters(self):
+        self.search_timer.stop()
+        event_type = self.type_filter.currentText()
+        status = self.status_filter.currentText()
+        self.model.set_filters(search=self.search_input.text().strip(),
+                               event_type=event_type if event_type != ALL else None,
+                               status=status if status != ALL else None)
+
+    def load_filter_options(self):
+        """Fills the type and status menus with the values in the history, in the background."""
+        thread = HistoryQuery(lambda: (get_store().distinct("event_type"), get_store().distinct("status")))
+        thread.result.connect(self.set_filter_options)
+        thread.finished.connect(lambda: self.option_threads.discard(thread))
+        self.option_threads.add(thread)
+        thread.start()
+
+    def set_filter_options(self, options):
+        if options is None:
+            return
+        for combo, values in zip((self.type_filter, self.status_filter), options):
+            current = combo.currentText()
+            combo.clear()
+            combo.addItems([ALL] + values)
+            combo.setCurrentIndex(max(0, combo.findText(current)))
 
     def clear_history(self):
         """Clears the history log and updates the display."""
-        clear_history()  # Call the backend utility function
-        self.load_recent_history()
\ No newline at end of file
+        thread = HistoryQuery(clear_history)  # Call the backend utility function, off the UI thread
+        thread.result.connect(lambda _: self.refresh())
+        thread.finished.connect(lambda: self.option_threads.discard(thread))
+        self.option_threads.add(thread)
+        thread.start()
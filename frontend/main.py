@@ -109,11 +109,6 @@ class MainWindow(QMainWindow):
         self.set_background()
         super().resizeEvent(event)
 
-    def closeEvent(self, event):
-        """Ensure Flask backend is terminated when UI closes."""
-        self.backend_process.terminate()
-        event.accept()
-
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MainWindow()
@@ -0,0 +1,136 @@
+import os
+import time
+import uuid
+
+TRANSFER_CHUNK_SIZE = 256 * 1024  # Bytes per read when streaming to or from disk
+REPORT_INTERVAL = 0.2  # Seconds between progress reports
+
+class MultipartFileStream:
+    """A multipart/form-data body that streams one file from disk.
+
+    requests reads it like a file, so the upload never holds more than one read
+    in memory. `on_read(count)` is called with the number of body bytes handed out.
+    """
+
+    def __init__(self, fields, file_field, file_path, on_read=None):
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        self.on_read = on_read
+
+        parts = []
+        for name, value in fields.items():
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            )
+        filename = os.path.basename(file_path)
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode()
+        )
+        self._head = b"".join(parts)
+        self._tail = f"\r\n--{boundary}--\r\n".encode()
+        self._file = open(file_path, 'rb')
+        self._length = len(self._head) + os.path.getsize(file_path) + len(self._tail)
+        self._stage = 0  # 0 = head, 1 = file, 2 = tail, 3 = done
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = TRANSFER_CHUNK_SIZE
+        data = b""
+        if self._stage == 0:
+            data, self._stage = self._head, 1
+        elif self._stage == 1:
+            data = self._file.read(size)
+            if not data:
+                self._file.close()
+                data, self._stage = self._tail, 3
+        if data and self.on_read:
+            self.on_read(len(data))
+        return data
+
+    def close(self):
+        self._file.close()
+
+class FileRangeStream:
+    """A request body that streams `length` bytes of a file starting at `offset`.
+
+    `sent` counts the bytes handed out so far; `on_read(count)` is called after each read.
+    """
+
+    def __init__(self, file_path, offset, length, on_read=None):
+        self._file = open(file_path, 'rb')
+        self._file.seek(offset)
+        self._length = length
+        self._remaining = length
+        self.on_read = on_read
+        self.sent = 0
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = TRANSFER_CHUNK_SIZE
+        data = self._file.read(min(size, self._remaining))
+        self._remaining -= len(data)
+        self.sent += len(data)
+        if data and self.on_read:
+            self.on_read(len(data))
+        return data
+
+    def close(self):
+        self._file.close()
+
+class TransferMeter:
+    """Tracks bytes moved against a total and formats throughput and ETA."""
+
+    def __init__(self, total, report):
+        self.total = total
+        self.report = report  # report(done_bytes, total_bytes, status_text)
+        self.done = 0
+        self.started = time.monotonic()
+        self._last_report = 0.0
+
+    def add(self, count):
+        self.done += count
+        now = time.monotonic()
+        if now - self._last_report >= REPORT_INTERVAL or (self.total and self.done >= self.total):
+            self._last_report = now
+            self.report(self.done, self.total, self.status_text(now))
+
+    def status_text(self, now=None):
+        elapsed = max((now or time.monotonic()) - self.started, 1e-6)
+        rate = self.done / elapsed
+        if not self.total:  # Size unknown, e.g. a streamed response
+            return f"{format_bytes(self.done)} at {format_bytes(rate)}/s"
+        text = f"{format_bytes(self.done)} / {format_bytes(self.total)} at {format_bytes(rate)}/s"
+        if rate > 0 and self.total > self.done:
+            text += f", ETA {int((self.total - self.done) / rate)}s"
+        return text
+
+def phase_reporter(report, start, span, label):
+    """Maps one transfer phase onto a slice of the progress bar.
+
+    `report(percent, text)` receives the overall percentage and a status line.
+    """
+    def report_phase(done, total, text):
+        report(start + (span * done // total if total else 0), f"{label}: {text}")
+    return report_phase
+
+def format_bytes(count):
+    for unit in ("B", "KB", "MB", "GB"):
+        if count < 1024:
+            return f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} TB"
+
+def download_to_file(response, save_path, meter=None):
+    """Writes a streamed response body straight to `save_path`, chunk by chunk."""
+    with open(save_path, 'wb') as output_file:
+        for chunk in response.iter_content(chunk_size=TRANSFER_CHUNK_SIZE):
+            output_file.write(chunk)
+            if meter:
+                meter.add(len(chunk))
@@ -0,0 +1,292 @@
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from backend import crypto_utils
+from backend.container import read_header
+from .transfer import FileRangeStream, MultipartFileStream, TransferMeter, download_to_file, phase_reporter
+
+DEFAULT_BACKEND_URL = "http://127.0.0.1:5000"
+RESUMABLE_THRESHOLD = 64 * 1024 * 1024  # Larger files go up as a resumable upload in parallel parts
+PARALLEL_PARTS = 4  # Parts uploaded at once
+MAX_PART_ATTEMPTS = 5
+RETRY_DELAY = 1.0  # Seconds before retrying a failed part; doubles with each attempt
+UPLOAD_STATE_SUFFIX = ".upload.json"  # Next to the save path while a resumable upload is unfinished
+READY_TIMEOUT = 15.0  # Seconds to wait for the backend's /readyz before the first request
+READY_POLL_INTERVAL = 0.25
+
+class TransportError(Exception):
+    """Raised when the backend rejects or fails an operation."""
+
+class HttpTransport:
+    """Sends files to a (possibly remote) Flask backend over HTTP."""
+
+    def __init__(self, base_url=DEFAULT_BACKEND_URL):
+        self.base_url = base_url.rstrip('/')
+        self._ready = False
+
+    def wait_until_ready(self, timeout=READY_TIMEOUT):
+        """Polls GET /readyz until the backend accepts work; raises TransportError after `timeout` seconds.
+
+        A backend that is starting up refuses connections and one that is draining
+        answers 503, so the first request waits here instead of failing.
+        """
+        if self._ready:
+            return
+        deadline = time.monotonic() + timeout
+        status = "not reachable"
+        while True:
+            try:
+                response = requests.get(f"{self.base_url}/readyz", timeout=READY_POLL_INTERVAL * 4)
+                if response.status_code == 200:
+                    self._ready = True
+                    return
+                status = f"HTTP {response.status_code}"
+                status = response.json().get("status", status)
+            except (requests.exceptions.RequestException, ValueError):
+                pass
+            if time.monotonic() >= deadline:
+                raise TransportError(f"Backend at {self.base_url} is not ready ({status})")
+            time.sleep(READY_POLL_INTERVAL)
+
+    def _post(self, endpoint, file_path, password, report):
+        # The backend writes into its own uploads folder; only this client touches save_path
+        data = {'password': password}
+        body = MultipartFileStream(data, 'file', file_path)
+        upload = TransferMeter(len(body), phase_reporter(report, 0, 50, "Uploading"))
+        body.on_read = upload.add
+        try:
+            return requests.post(f"{self.base_url}/{endpoint}", data=body,
+                                 headers={'Content-Type': body.content_type}, stream=True)
+        finally:
+            body.close()
+
+    def _download(self, response, save_path, report):
+        total = int(response.headers.get('content-length', 0))
+        download = TransferMeter(total, phase_reporter(report, 50, 50, "Downloading"))
+        download_to_file(response, save_path, download)
+
+    def _error(self, response, default):
+        try:
+            return response.json().get("error", default)
+        except ValueError:
+            return default
+
+    def encrypt(self, file_path, password, save_path, report):
+        """Encrypts `file_path` on the backend and saves the result at `save_path`."""
+        self.wait_until_ready()
+        if os.path.getsize(file_path) >= RESUMABLE_THRESHOLD:
+            return self.encrypt_resumable(file_path, password, save_path, report)
+        with self._post("encrypt", file_path, password, report) as response:
+            if response.status_code != 200:
+                raise TransportError(self._error(response, "Unknown encryption error occurred"))
+            self._download(response, save_path, report) # Encrypted file content
+        return save_path
+
+    def encrypt_resumable(self, file_path, password, save_path, report):
+        """Encrypts `file_path` through a resumable upload (see backend/resumable.py).
+
+        Parts go up on PARALLEL_PARTS connections and a failed part is retried with
+        backoff. The upload id is kept next to `save_path` until the result is saved,
+        so running the same encryption again after a crash or an outage only sends
+        the parts the backend has not received.
+        """
+        size = os.path.getsize(file_path)
+        state_path = save_path + UPLOAD_STATE_SUFFIX
+        upload = self._resume_upload(state_path, file_path, size)
+        if upload is None:
+            response = requests.post(f"{self.base_url}/uploads", json={
+                'filename': os.path.basename(file_path), 'password': password, 'size': size})
+            if response.status_code != 201:
+                raise TransportError(self._error(response, "Could not start the upload"))
+            upload = response.json()
+            with open(state_path, 'w') as f:
+                json.dump({'url': self.base_url, 'id': upload['id'], 'source': os.path.abspath(file_path),
+                           'size': size, 'mtime': os.path.getmtime(file_path)}, f)
+        upload_url = f"{self.base_url}/uploads/{upload['id']}"
+
+        if not upload['completed']:
+            meter = TransferMeter(size, phase_reporter(report, 0, 50, "Uploading"))
+            meter.done = upload['bytes_received']
+            self._send_parts(upload_url, file_path, upload, meter)
+            response = requests.post(f"{upload_url}/complete")
+            if response.status_code != 200:
+                raise TransportError(self._error(response, "Could not complete the upload"))
+
+        with requests.get(f"{upload_url}/result", stream=True) as response:
+            if response.status_code != 200:
+                raise TransportError(self._error(response, "Could not download the encrypted file"))
+            self._download(response, save_path, report)
+        requests.delete(upload_url)  # Frees the copy on the backend
+        os.remove(state_path)
+        return save_path
+
+    def _resume_upload(self, state_path, file_path, size):
+        """Returns the backend's status of an earlier upload of the same, unchanged file, if it still exists."""
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (state.get('url') == self.base_url and state.get('source') == os.path.abspath(file_path)
+                and state.get('size') == size and state.get('mtime') == os.path.getmtime(file_path)):
+            try:
+                response = requests.get(f"{self.base_url}/uploads/{state['id']}")
+                if response.status_code == 200:
+                    return response.json()
+            except requests.exceptions.RequestException:
+                pass
+        os.remove(state_path)  # Stale: the file changed or the backend forgot the upload
+        return None
+
+    def _send_parts(self, upload_url, file_path, upload, meter):
+        """Uploads the missing parts in parallel, retrying each failed part."""
+        part_size, size = upload['part_size'], upload['size']
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def add(count):
+            with lock:
+                meter.add(count)
+
+        def send(number):
+            offset = number * part_size
+            error = None
+            for attempt in range(MAX_PART_ATTEMPTS):
+                if stop.is_set():
+                    return
+                body = FileRangeStream(file_path, offset, min(part_size, size - offset), add)
+                try:
+                    response = requests.put(f"{upload_url}/parts/{number}", data=body,
+                                            headers={'Content-Type': 'application/octet-stream'})
+                except requests.exceptions.RequestException as e:
+                    response, error = None, str(e)
+                finally:
+                    body.close()
+                if response is not None:
+                    if response.status_code == 200:
+                        return
+                    error = self._error(response, f"Part {number} was rejected")
+                    if response.status_code == 409 and self._has_part(upload_url, number):
+                        return  # An earlier attempt got through; only its response was lost
+                    if response.status_code not in (409, 500, 502, 503, 504):
+                        raise TransportError(error)
+                add(-body.sent)
+                time.sleep(RETRY_DELAY * 2 ** attempt)
+            raise TransportError(f"Part {number} failed after {MAX_PART_ATTEMPTS} attempts: {error}")
+
+        with ThreadPoolExecutor(max_workers=PARALLEL_PARTS) as pool:
+            futures = [pool.submit(send, number) for number in upload['missing_parts']]
+            try:
+                for future in futures:
+                    future.result()
+            except Exception:
+                stop.set()  # Let the other parts finish their current attempt and give up
+                raise
+
+    def _has_part(self, upload_url, number):
+        try:
+            response = requests.get(upload_url)
+            return response.status_code == 200 and number in response.json()['received_parts']
+        except requests.exceptions.RequestException:
+            return False
+
+    def decrypt(self, file_path, password, save_path, report):
+        """Decrypts `file_path` on the backend; returns the path with the restored extension."""
+        self.wait_until_ready()
+        with self._post("decrypt", file_path, password, report) as response:
+            if response.status_code != 200:
+                raise TransportError(self._error(response, "Unknown error occurred"))
+
+            # The download name carries the restored extension, which is added to save_path
+            # like LocalTransport does
+            content_disposition = response.headers.get('content-disposition')
+            if content_disposition:
+                match = re.search(r'filename="?([^"]+)"?', content_disposition)
+                if match:
+                    save_path += os.path.splitext(match.group(1))[1]
+            self._download(response, save_path, report)
+        return save_path
+
+class ProgressReader:
+    """Wraps a binary file and reports how many bytes have been read from it."""
+
+    def __init__(self, file, meter):
+        self._file = file
+        self._meter = meter
+
+    def read(self, size=-1):
+        data = self._file.read(size)
+        self._meter.add(len(data))
+        return data
+
+    def readinto(self, buffer):
+        count = self._file.readinto(buffer)
+        self._meter.add(count or 0)
+        return count
+
+    def seekable(self):
+        return self._file.seekable()
+
+    def tell(self):
+        return self._file.tell()
+
+    def seek(self, offset, whence=0):
+        return self._file.seek(offset, whence)
+
+class LocalTransport:
+    """Runs the crypto engine in-process, for a GUI with an embedded backend.
+
+    No HTTP server, multipart encoding or temporary upload files are involved.
+    """
+
+    def encrypt(self, file_path, password, save_path, report):
+        meter = TransferMeter(os.path.getsize(file_path), phase_reporter(report, 0, 100, "Encrypting"))
+        filename = os.path.basename(file_path)
+        try:
+            with open(file_path, 'rb') as infile, open(save_path, 'wb') as outfile:
+                pieces = crypto_utils.encrypt_stream(ProgressReader(infile, meter), password,
+                                                     os.path.splitext(file_path)[1].encode(),
+                                                     size_hint=meter.total)
+                for piece in pieces:
+                    outfile.write(piece)
+        except Exception as e:
+            crypto_utils.log_event("ENCRYPTION", filename, f"FAILED - {str(e)}", save_path)
+            raise TransportError(str(e))
+        crypto_utils.log_event("ENCRYPTION", filename, "SUCCESS", save_path)
+        return save_path
+
+    def decrypt(self, file_path, password, save_path, report):
+        filename = os.path.basename(file_path)
+        with open(file_path, 'rb') as infile:
+            header = read_header(infile)
+
+        # Local files allow random access, which also covers legacy, incrementally
+        # updated and appended files (see backend/append.py)
+        partial = save_path + header.extension.decode() if header is not None else None
+        existed = partial is not None and os.path.exists(partial)
+        meter = TransferMeter(os.path.getsize(file_path), phase_reporter(report, 0, 100, "Decrypting"))
+        result = crypto_utils.decrypt_file(file_path, password, save_path, progress=meter.add)
+        if not result:
+            if partial and not existed and os.path.exists(partial):
+                os.remove(partial)  # Never leave unauthenticated plaintext behind
+            error = "Decryption failed, incorrect password or corrupted file"
+            crypto_utils.log_event("DECRYPTION", filename, f"FAILED - {error}", save_path)
+            raise TransportError(error)
+        crypto_utils.log_event("DECRYPTION", filename, "SUCCESS", result)
+        return result
+
+_default_transport = None
+
+def set_default_transport(transport):
+    """Selects the transport used by workers that are not given one explicitly."""
+    global _default_transport
+    _default_transport = transport
+
+def get_default_transport():
+    if _default_transport is None:
+        return HttpTransport()
+    return _default_transport
@@ -1,30 +1,66 @@
 import sys
 import os
-from PyQt5.QtWidgets import QApplication
-from PyQt5.QtCore import QThread
-from backend.app import app as flask_app
-from frontend.main import MainWindow
+import argparse
 
-class FlaskThread(QThread):
-    def run(self):
-        # Disable Flask's reloader to avoid thread issues
-        flask_app.run(port=5000, use_reloader=False)
+def parse_args():
+    from backend.server import add_arguments
 
-if __name__ == '__main__':
-    # Add the project root directory to the Python path
-    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="AES File Encryptor")
+    parser.add_argument("--backend-url",
+                        help="Send files to a remote backend over HTTP instead of encrypting in-process")
+    parser.add_argument("--serve", action="store_true",
+                        help="Also start the local HTTP API for other clients")
+    parser.add_argument("--headless", action="store_true",
+                        help="Only run the HTTP API, without the GUI, until SIGTERM or Ctrl+C")
+    add_arguments(parser)
+    return parser.parse_args()
+
+def run_server(args):
+    from backend.server import serve
+
+    try:
+        return serve(args.host, args.port, args.threads, args.processes, args.backlog, args.drain_delay,
+                     args.drain_timeout)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+def run_gui(args):
+    from PyQt5.QtWidgets import QApplication
+    from frontend.main import MainWindow
+    from frontend.transport import HttpTransport, LocalTransport, set_default_transport
 
-    # Start Flask in a separate thread
-    flask_thread = FlaskThread()
-    flask_thread.start()
+    # The GUI talks to the crypto engine directly unless a remote backend is given
+    if args.backend_url:
+        set_default_transport(HttpTransport(args.backend_url))  # Waits for the backend's /readyz on first use
+    else:
+        set_default_transport(LocalTransport())
+
+    server = None
+    if args.serve:
+        from backend.server import drain, start
+
+        # Listening (and ready) once start() returns, so clients never race the startup
+        try:
+            server = start(args.host, args.port, args.threads, args.backlog)
+        except (OSError, ValueError) as e:
+            print(f"Could not start the HTTP API: {e}", file=sys.stderr)
 
     # Start the PyQt application
-    qt_app = QApplication(sys.argv)
+    qt_app = QApplication(sys.argv[:1])
     window = MainWindow()
     window.show()
 
-    # When the GUI closes, stop Flask
+    # When the GUI closes, let requests and jobs in progress finish
     exit_code = qt_app.exec_()
-    flask_thread.terminate()
-    flask_thread.wait()
-    sys.exit(exit_code)
\ No newline at end of file
+    if server:
+        drain(server, timeout=args.drain_timeout)
+    return exit_code
+
+if __name__ == '__main__':
+    # Add the project root directory to the Python path
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    args = parse_args()
+    if args.processes != 1 and not args.headless:
+        sys.exit("--processes needs --headless; the GUI serves the API on threads in its own process")
+    sys.exit(run_server(args) if args.headless else run_gui(args))
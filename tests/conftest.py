@@ -0,0 +1,91 @@
+import os
+import sys
+
+import pytest
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from backend import crypto_utils, kdf_calibration  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Runs each test in its own directory, so the history database and uploads stay out of the tree."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture(autouse=True)
+def cheap_kdf(monkeypatch):
+    """Argon2 at its minimum cost; the tests exercise the format, not the KDF strength."""
+    monkeypatch.setattr(crypto_utils, "ARGON2_TIME_COST", 1)
+    monkeypatch.setattr(crypto_utils, "ARGON2_MEMORY_COST", 8)
+    monkeypatch.setattr(kdf_calibration, "_calibrated", None)
+    monkeypatch.setattr(kdf_calibration, "_loaded", True)  # Never pick up a kdf_params.json from the tree
+    crypto_utils.key_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def history(monkeypatch, tmp_path):
+    """A private history store, so log_event never touches another test's database."""
+    from backend import history as history_module
+
+    store = history_module.HistoryStore(str(tmp_path / "history.db"), legacy_log=None)
+    monkeypatch.setattr(history_module, "_store", store)
+    yield store
+    store.close()
+
+
+def write_file(path, data: bytes) -> str:
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def read_file(path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def flip_byte(path, offset):
+    """Flips the low bit of one byte of a file in place."""
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        byte = f.read(1)
+        f.seek(offset)
+        f.write(bytes([byte[0] ^ 0x01]))
+
+
+def encrypt_legacy(path, password, output_path):
+    """Writes the v1 layout: salt + iv + extension, every chunk sealed under the same IV."""
+    salt, iv = os.urandom(16), os.urandom(12)
+    aesgcm = AESGCM(crypto_utils.derive_key(password, salt, 4, 2**16, 1))
+    extension = os.path.splitext(path)[1].encode()
+    with open(path, "rb") as infile, open(output_path, "wb") as outfile:
+        outfile.write(salt + iv + bytes([len(extension)]) + extension)
+        while chunk := infile.read(crypto_utils.CHUNK_SIZE):
+            outfile.write(aesgcm.encrypt(iv, chunk, None))
+
+
+@pytest.fixture
+def uploads_dir(workdir, monkeypatch):
+    """Points the API's uploads folder (and resumable uploads) at the test directory."""
+    from backend import app as app_module
+
+    folder = workdir / "uploads"
+    folder.mkdir(exist_ok=True)  # Importing backend.app creates it in the working directory
+    monkeypatch.setattr(app_module, "UPLOAD_FOLDER", str(folder))
+    monkeypatch.setattr(app_module.uploads, "directory", str(folder))
+    return folder
+
+
+@pytest.fixture
+def client(uploads_dir):
+    from backend.app import app
+
+    return app.test_client()
@@ -0,0 +1,83 @@
+import io
+import os
+
+from backend import container
+from conftest import PASSWORD, write_file
+
+
+def test_multipart_round_trip_leaves_no_files_behind(client, uploads_dir):
+    data = os.urandom(200_000)
+    response = client.post("/encrypt", data={"file": (io.BytesIO(data), "report.txt"), "password": PASSWORD})
+    assert response.status_code == 200
+    assert 'filename="report.txt.enc"' in response.headers["Content-Disposition"]
+    encrypted = response.get_data()
+
+    response = client.post("/decrypt", data={"file": (io.BytesIO(encrypted), "report.txt.enc"), "password": PASSWORD})
+    assert response.status_code == 200
+    assert 'filename="report.txt"' in response.headers["Content-Disposition"]
+    assert response.get_data() == data
+    assert os.listdir(uploads_dir) == []
+
+
+def test_multipart_decrypt_with_wrong_password(client, uploads_dir):
+    response = client.post("/encrypt", data={"file": (io.BytesIO(b"secret"), "a.txt"), "password": PASSWORD})
+    response = client.post("/decrypt", data={"file": (io.BytesIO(response.get_data()), "a.txt.enc"),
+                                             "password": "wrong password"})
+    assert response.status_code == 400
+    assert os.listdir(uploads_dir) == []
+
+
+def test_multipart_output_path_must_stay_in_uploads(client, workdir):
+    response = client.post("/encrypt", data={"file": (io.BytesIO(b"x"), "a.txt"), "password": PASSWORD,
+                                             "output_path": str(workdir / "elsewhere.enc")})
+    assert response.status_code == 400
+    assert not os.path.exists(workdir / "elsewhere.enc")
+
+
+def _stored(uploads_dir, data, name="report.txt.enc"):
+    from backend.crypto_utils import CHUNK_SIZE, encrypt_file
+    source = write_file(uploads_dir / "report.txt", data)
+    encrypt_file(source, PASSWORD, str(uploads_dir / name), chunk_size=CHUNK_SIZE)
+    os.remove(source)
+    return CHUNK_SIZE
+
+
+def test_range_decrypt_serves_the_slice_and_logs_after_streaming(client, uploads_dir, history):
+    data = os.urandom(300_000)
+    chunk_size = _stored(uploads_dir, data)
+    start, stop = chunk_size - 5, 2 * chunk_size + 7
+    response = client.get("/decrypt/report.txt.enc", headers={"X-Password": PASSWORD,
+                                                              "Range": f"bytes={start}-{stop - 1}"})
+    assert response.status_code == 206
+    assert 'filename="report.txt"' in response.headers["Content-Disposition"]
+    assert history.query(event_type="DECRYPTION") == []  # Nothing is logged before the body is sent
+    assert response.get_data() == data[start:stop]
+    assert [event.status for event in history.query(event_type="DECRYPTION")] == ["SUCCESS"]
+
+
+def test_range_decrypt_of_corrupted_chunk_ends_the_body_early(client, uploads_dir, history):
+    data = os.urandom(300_000)
+    chunk_size = _stored(uploads_dir, data)
+    path = uploads_dir / "report.txt.enc"
+    with open(path, "rb") as f:
+        data_offset = len(container.read_header(f).pack())
+    with open(path, "r+b") as f:
+        f.seek(data_offset + chunk_size + 10)  # Inside the second chunk
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 0x01]))
+
+    response = client.get("/decrypt/report.txt.enc", headers={"X-Password": PASSWORD})
+    assert response.status_code == 200
+    assert len(response.get_data()) < response.content_length
+    assert [event.status for event in history.query(event_type="DECRYPTION")] == ["FAILED"]
+
+
+def test_stream_body_decrypt_strips_enc_suffix(client, uploads_dir):
+    _stored(uploads_dir, b"plain text")
+    with open(uploads_dir / "report.txt.enc", "rb") as f:
+        response = client.post("/decrypt", data=f.read(), content_type="application/octet-stream",
+                               headers={"X-Password": PASSWORD, "X-Filename": "report.txt.enc"})
+    assert response.status_code == 200
+    assert 'filename="report.txt"' in response.headers["Content-Disposition"]
+    assert response.get_data() == b"plain text"
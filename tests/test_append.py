@@ -0,0 +1,57 @@
+import io
+import os
+
+import pytest
+
+from backend.append import append_encrypted
+from backend.compression import CompressionOptions
+from backend.crypto_utils import CHUNK_SIZE, decrypt_file, decrypt_stream, encrypt_file
+from backend.incremental import update_encrypted_file
+from conftest import PASSWORD, read_file, write_file
+
+
+def _encrypt(workdir, data, **options):
+    encrypted = str(workdir / "log.enc")
+    encrypt_file(write_file(workdir / "log.txt", data), PASSWORD, encrypted, chunk_size=CHUNK_SIZE, **options)
+    return encrypted
+
+
+def _decrypted(workdir, encrypted):
+    return read_file(decrypt_file(encrypted, PASSWORD, str(workdir / "out")))
+
+
+@pytest.mark.parametrize("options", [{}, {"compression": CompressionOptions("always")}, {"incremental": True}],
+                         ids=["plain", "compressed", "incremental"])
+def test_appends_accumulate(workdir, options):
+    data = os.urandom(CHUNK_SIZE + 100)
+    encrypted = _encrypt(workdir, data, **options)
+    for extra in (b"x" * 10, os.urandom(2 * CHUNK_SIZE), b""):
+        data += extra
+        assert append_encrypted(encrypted, PASSWORD, extra) == len(data)
+    assert _decrypted(workdir, encrypted) == data
+
+
+def test_append_from_stream_keeps_stream_decryption_working(workdir):
+    data = os.urandom(CHUNK_SIZE)
+    encrypted = _encrypt(workdir, data)
+    append_encrypted(encrypted, PASSWORD, io.BytesIO(b"tail" * 1000))
+    with open(encrypted, "rb") as f:
+        _, pieces = decrypt_stream(f, PASSWORD)
+        assert b"".join(pieces) == data + b"tail" * 1000
+
+
+def test_appended_incremental_file_can_still_be_updated(workdir):
+    data = os.urandom(CHUNK_SIZE + 10)
+    encrypted = _encrypt(workdir, data, incremental=True)
+    append_encrypted(encrypted, PASSWORD, b"more")
+    source = write_file(workdir / "log.txt", data + b"MORE")
+    assert update_encrypted_file(source, PASSWORD, encrypted)["rewritten_chunks"] == 1
+    assert _decrypted(workdir, encrypted) == data + b"MORE"
+
+
+def test_wrong_password_leaves_the_file_untouched(workdir):
+    encrypted = _encrypt(workdir, b"data")
+    before = read_file(encrypted)
+    with pytest.raises(ValueError, match="Incorrect password"):
+        append_encrypted(encrypted, "wrong password", b"more")
+    assert read_file(encrypted) == before
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from backend.archive import (ArchiveMember, create_archive, extract_archive, extract_member, list_archive,
+                             pack_members, read_member, unpack_members)
+from backend.crypto_utils import CHUNK_SIZE, decrypt_file
+from conftest import PASSWORD, read_file, write_file
+
+
+@pytest.fixture
+def tree(workdir):
+    os.makedirs(workdir / "project" / "docs")
+    files = {"project/a.txt": b"alpha", "project/docs/big.bin": os.urandom(3 * CHUNK_SIZE + 7),
+             "project/empty": b""}
+    for name, data in files.items():
+        write_file(workdir / name, data)
+    return files
+
+
+def test_archive_lists_reads_and_extracts_members(workdir, tree):
+    archive = str(workdir / "project.enc")
+    create_archive([str(workdir / "project")], PASSWORD, archive)
+
+    assert sorted(member.name for member in list_archive(archive, PASSWORD)) == sorted(tree)
+    assert read_member(archive, PASSWORD, "project/docs/big.bin") == tree["project/docs/big.bin"]
+    path = extract_member(archive, PASSWORD, "project/a.txt", str(workdir / "one"))
+    assert read_file(path) == b"alpha"
+
+    outputs = extract_archive(archive, PASSWORD, str(workdir / "all"))
+    assert {os.path.relpath(path, workdir / "all").replace(os.sep, "/"): read_file(path)
+            for path in outputs} == tree
+
+
+def test_archive_errors(workdir, tree):
+    archive = str(workdir / "project.enc")
+    create_archive([str(workdir / "project" / "a.txt")], PASSWORD, archive)
+    with pytest.raises(KeyError):
+        read_member(archive, PASSWORD, "missing")
+    with pytest.raises(ValueError):
+        list_archive(archive, "wrong password")
+    assert decrypt_file(archive, PASSWORD, str(workdir / "out")) is None  # Archives need backend.archive
+
+
+def test_member_table_round_trips():
+    members = [ArchiveMember("a/b.txt", 0, 10, 123), ArchiveMember("ü.bin", 10, 0, -1)]
+    assert unpack_members(pack_members(members)) == members
+
+
+@pytest.mark.parametrize("name", ["../evil", "/etc/passwd", "a/../../b", "C:/x", "a\\b", ""])
+def test_unsafe_member_names_are_refused(name):
+    from backend.archive import _check_member_name
+
+    with pytest.raises(ValueError, match="Unsafe"):
+        _check_member_name(name)
@@ -0,0 +1,33 @@
+import os
+
+from backend.batch import decrypt_directory, encrypt_directory
+from conftest import PASSWORD, read_file, write_file
+from test_jobs import wait_finished
+
+
+def test_directory_round_trip(workdir):
+    (workdir / "src" / "sub").mkdir(parents=True)
+    files = {"a.txt": os.urandom(1000), os.path.join("sub", "b.bin"): os.urandom(70_000)}
+    for name, data in files.items():
+        write_file(workdir / "src" / name, data)
+
+    summary = encrypt_directory(str(workdir / "src"), PASSWORD, str(workdir / "enc"))
+    assert summary["failed"] == 0
+    decrypt_directory(str(workdir / "enc"), PASSWORD, str(workdir / "out"))
+    for name, data in files.items():
+        assert read_file(workdir / "out" / name) == data
+
+
+def test_batch_directories_are_confined_to_uploads(client, uploads_dir, workdir):
+    (workdir / "outside").mkdir()
+    for source, dest in ((str(workdir / "outside"), "dest"), ("../outside", "dest"), ("/etc", "dest"),
+                         ("src", str(workdir / "outside")), ("src", "../outside")):
+        response = client.post("/batch/encrypt", json={"source_dir": source, "dest_dir": dest, "password": PASSWORD})
+        assert response.status_code == 400, (source, dest)
+
+    (uploads_dir / "src").mkdir()
+    write_file(uploads_dir / "src" / "a.txt", b"inside")
+    response = client.post("/batch/encrypt", json={"source_dir": "src", "dest_dir": "dest", "password": PASSWORD})
+    assert response.status_code == 202
+    assert wait_finished(client, response.get_json()["id"])["status"] == "succeeded"
+    assert os.path.exists(uploads_dir / "dest" / "a.txt.enc")
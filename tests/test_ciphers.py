@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from backend import ciphers, container
+from backend.crypto_utils import (CHUNK_SIZE, decrypt_file, decrypt_range, decrypt_stream, encrypt_file,
+                                  encrypt_stream)
+from conftest import PASSWORD, read_file, write_file
+
+AVAILABLE = [container.CIPHER_NAMES[cipher_id] for cipher_id in ciphers.available_ciphers()]
+
+
+@pytest.mark.parametrize("cipher", AVAILABLE)
+def test_round_trip_with_each_available_cipher(workdir, cipher):
+    data = os.urandom(2 * CHUNK_SIZE + 9)
+    encrypted = str(workdir / "a.enc")
+    encrypt_file(write_file(workdir / "a.bin", data), PASSWORD, encrypted, chunk_size=CHUNK_SIZE, cipher=cipher)
+    with open(encrypted, "rb") as f:
+        assert container.CIPHER_NAMES[container.read_header(f).cipher_id] == cipher
+    assert read_file(decrypt_file(encrypted, PASSWORD, str(workdir / "out"))) == data
+    assert decrypt_range(encrypted, PASSWORD, CHUNK_SIZE - 1, 2) == data[CHUNK_SIZE - 1:CHUNK_SIZE + 1]
+
+    with open(encrypted, "rb") as f:
+        assert b"".join(decrypt_stream(f, PASSWORD)[1]) == data
+
+
+def test_auto_picks_an_available_cipher_once(monkeypatch, workdir):
+    monkeypatch.setattr(ciphers, "_calibrated", None)
+    calls = []
+    monkeypatch.setattr(ciphers, "measure", lambda cipher_id: calls.append(cipher_id) or cipher_id)
+    chosen = ciphers.resolve_cipher("auto")
+    assert chosen == max(ciphers.available_ciphers())
+    assert ciphers.resolve_cipher("auto") == chosen
+    assert len(calls) == len(ciphers.available_ciphers())
+
+    with open(write_file(workdir / "a.bin", b"data"), "rb") as f:
+        encrypted = b"".join(encrypt_stream(f, PASSWORD, b".bin", cipher="auto"))
+    with open(write_file(workdir / "a.enc", encrypted), "rb") as f:
+        assert container.read_header(f).cipher_id == chosen
+
+
+def test_unknown_or_unsupported_ciphers_are_value_errors(monkeypatch):
+    assert ciphers.resolve_cipher(None) == ciphers.DEFAULT_CIPHER
+    with pytest.raises(ValueError, match="Unknown cipher"):
+        ciphers.resolve_cipher("rot13")
+    monkeypatch.setattr(ciphers, "_available", [container.CIPHER_AES_256_GCM])
+    with pytest.raises(ValueError, match="not supported"):
+        ciphers.resolve_cipher("chacha20-poly1305")
+    with pytest.raises(ValueError, match="not supported"):
+        ciphers.make_aead(container.CIPHER_CHACHA20_POLY1305, bytes(32))
@@ -0,0 +1,58 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import PASSWORD, ROOT, write_file
+
+CHEAP_KDF = ["--time-cost", "1", "--memory-cost", "8", "--parallelism", "1"]
+
+
+def aesenc(*args, stdin: bytes = b""):
+    env = dict(os.environ, AESENC_PASSWORD=PASSWORD)
+    return subprocess.run([sys.executable, os.path.join(ROOT, "aesenc.py"), *args], input=stdin,
+                          capture_output=True, env=env)
+
+
+@pytest.fixture
+def encrypted(workdir):
+    data = os.urandom(300_000)
+    result = aesenc("encrypt", write_file(workdir / "data.bin", data), "-o", "data.enc", *CHEAP_KDF)
+    assert result.returncode == 0, result.stderr
+    return data, workdir / "data.enc"
+
+
+def test_pipe_round_trip(encrypted):
+    data, path = encrypted
+    result = aesenc("decrypt", stdin=path.read_bytes())
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == data
+
+
+def test_verify_file_and_stdin_without_history(workdir, encrypted):
+    _, path = encrypted
+    assert aesenc("verify", str(path)).returncode == 0
+    result = aesenc("verify", "--json", stdin=path.read_bytes())
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout)["verified_bytes"] == 300_000
+    assert aesenc("verify", "-", stdin=path.read_bytes()).returncode == 0
+    assert not (workdir / "encryption_history.db").exists()
+
+
+def test_verify_reports_damage_on_stdin(encrypted):
+    _, path = encrypted
+    damaged = bytearray(path.read_bytes())
+    damaged[len(damaged) // 2] ^= 0x01
+    result = aesenc("verify", stdin=bytes(damaged))
+    assert result.returncode == 1
+    assert b"<stdin>: CORRUPTED" in result.stderr
+    assert aesenc("verify", stdin=path.read_bytes()[:-1000]).returncode == 1
+
+
+def test_wrong_password_exits_1(encrypted):
+    _, path = encrypted
+    write_file(path.parent / "password.txt", b"wrong password\n")
+    result = aesenc("verify", str(path), "--password-file", str(path.parent / "password.txt"))
+    assert result.returncode == 1
@@ -0,0 +1,61 @@
+import os
+import zlib
+
+import pytest
+
+from backend import container
+from backend.compression import (CODEC_ZLIB, CompressionOptions, ChunkCompressor, decompress_chunk, sample_entropy,
+                                 zstandard)
+from backend.crypto_utils import CHUNK_SIZE, decrypt_file, decrypt_range, decrypt_stream, encrypt_file, encrypt_stream
+from conftest import PASSWORD, read_file, write_file
+
+CODECS = [CODEC_ZLIB] + (["zstd"] if zstandard is not None else [])
+TEXT = b"".join(b"line %d of a very repetitive log file\n" % i for i in range(40_000))
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_compressible_file_round_trips_smaller(workdir, codec):
+    encrypted = str(workdir / "log.enc")
+    encrypt_file(write_file(workdir / "log.txt", TEXT), PASSWORD, encrypted, chunk_size=CHUNK_SIZE,
+                 compression=CompressionOptions("always", codec))
+    with open(encrypted, "rb") as f:
+        assert container.read_header(f).flags & container.FLAG_COMPRESSED
+    assert os.path.getsize(encrypted) < len(TEXT) // 4
+    assert read_file(decrypt_file(encrypted, PASSWORD, str(workdir / "out"))) == TEXT
+
+
+@pytest.mark.parametrize("offset, length", [(0, 100), (CHUNK_SIZE - 10, 20), (len(TEXT) - 50, 100)])
+def test_range_decrypt_of_compressed_file(workdir, offset, length):
+    encrypted = str(workdir / "log.enc")
+    encrypt_file(write_file(workdir / "log.txt", TEXT), PASSWORD, encrypted, chunk_size=CHUNK_SIZE,
+                 compression=CompressionOptions("auto"))
+    assert decrypt_range(encrypted, PASSWORD, offset, length) == TEXT[offset:offset + length]
+
+
+def test_compressed_stream_framing_round_trips(workdir):
+    data = TEXT + os.urandom(CHUNK_SIZE + 5)  # Compressed chunks followed by stored ones
+    with open(write_file(workdir / "mixed.bin", data), "rb") as f:
+        encrypted = b"".join(encrypt_stream(f, PASSWORD, b".bin", compression=CompressionOptions("auto")))
+    with open(write_file(workdir / "mixed.enc", encrypted), "rb") as f:
+        header, pieces = decrypt_stream(f, PASSWORD)
+        assert header.flags & container.FLAG_COMPRESSED
+        assert b"".join(pieces) == data
+
+
+def test_auto_mode_stores_random_chunks_as_is():
+    compressor = ChunkCompressor(CompressionOptions("auto"))
+    chunk = os.urandom(CHUNK_SIZE)
+    assert sample_entropy(chunk) > 7.5
+    assert compressor.compress(chunk) == (0, chunk)
+    assert sample_entropy(TEXT[:CHUNK_SIZE]) < 5
+    flags, data = compressor.compress(TEXT[:CHUNK_SIZE])
+    assert flags and len(data) < CHUNK_SIZE // 4
+
+
+def test_decompression_is_capped_at_the_chunk_size():
+    flags, data = ChunkCompressor(CompressionOptions("always", CODEC_ZLIB)).compress(b"\0" * CHUNK_SIZE)
+    assert decompress_chunk(flags, data, CHUNK_SIZE) == b"\0" * CHUNK_SIZE
+    with pytest.raises(ValueError):
+        decompress_chunk(flags, data, CHUNK_SIZE - 1)
+    with pytest.raises(ValueError):
+        decompress_chunk(flags, zlib.compress(b"x")[:-2], CHUNK_SIZE)
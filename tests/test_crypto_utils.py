@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+from backend import container
+from backend.crypto_utils import (CHUNK_SIZE, KeySession, decrypt_file, decrypt_range, decrypt_stream, encrypt_file,
+                                  encrypt_stream, rekey)
+from conftest import PASSWORD, encrypt_legacy, flip_byte, read_file, write_file
+
+
+@pytest.mark.parametrize("size", [0, 1, CHUNK_SIZE, 3 * CHUNK_SIZE + 17])
+def test_round_trip_restores_content_and_extension(workdir, size):
+    data = os.urandom(size)
+    source = write_file(workdir / "report.txt", data)
+    encrypt_file(source, PASSWORD, str(workdir / "report.enc"))
+
+    result = decrypt_file(str(workdir / "report.enc"), PASSWORD, str(workdir / "out"))
+    assert result == str(workdir / "out.txt")
+    assert read_file(result) == data
+
+
+def test_decrypts_legacy_shared_iv_files(workdir):
+    data = os.urandom(2 * CHUNK_SIZE + 5)
+    encrypt_legacy(write_file(workdir / "old.pdf", data), PASSWORD, str(workdir / "old.enc"))
+    result = decrypt_file(str(workdir / "old.enc"), PASSWORD, str(workdir / "out"))
+    assert result == str(workdir / "out.pdf")
+    assert read_file(result) == data
+
+
+def test_wrong_password_fails_without_plaintext(workdir):
+    source = write_file(workdir / "a.bin", os.urandom(1000))
+    encrypt_file(source, PASSWORD, str(workdir / "a.enc"))
+    with open(workdir / "a.enc", "rb") as f:
+        assert container.read_header(f).kdf_id == container.KDF_ARGON2ID_WRAPPED
+
+    assert decrypt_file(str(workdir / "a.enc"), "wrong password", str(workdir / "out")) is None
+    assert not os.path.exists(workdir / "out.bin")
+
+
+def _layout(path):
+    with open(path, "rb") as f:
+        header = container.read_header(f)
+    return len(header.pack()), os.path.getsize(path)
+
+
+@pytest.mark.parametrize("where", ["chunk", "index", "trailer", "truncated"])
+def test_tampering_is_rejected(workdir, where):
+    source = write_file(workdir / "a.bin", os.urandom(3 * CHUNK_SIZE))
+    encrypted = str(workdir / "a.enc")
+    encrypt_file(source, PASSWORD, encrypted, chunk_size=CHUNK_SIZE)
+    data_offset, size = _layout(encrypted)
+    if where == "chunk":
+        flip_byte(encrypted, data_offset + CHUNK_SIZE + 10)
+    elif where == "index":
+        flip_byte(encrypted, size - container.TRAILER_SIZE - 1)
+    elif where == "trailer":
+        flip_byte(encrypted, size - container.TRAILER_SIZE)
+    else:
+        with open(encrypted, "r+b") as f:
+            f.truncate(data_offset + CHUNK_SIZE)
+
+    assert decrypt_file(encrypted, PASSWORD, str(workdir / "out")) is None
+
+
+def test_stream_round_trip_and_wrong_password(workdir):
+    data = os.urandom(5 * CHUNK_SIZE + 3)
+    with open(write_file(workdir / "a.bin", data), "rb") as f:
+        encrypted = b"".join(encrypt_stream(f, PASSWORD, b".bin"))
+    with open(write_file(workdir / "a.enc", encrypted), "rb") as f:
+        header, pieces = decrypt_stream(f, PASSWORD)
+        assert header.extension == b".bin"
+        assert b"".join(pieces) == data
+    with open(workdir / "a.enc", "rb") as f:
+        with pytest.raises(ValueError):
+            decrypt_stream(f, "wrong password")
+
+
+@pytest.mark.parametrize("offset, length", [(0, 10), (CHUNK_SIZE - 3, 10), (CHUNK_SIZE * 2, CHUNK_SIZE), (0, 10**9)])
+def test_decrypt_range_matches_slice(workdir, offset, length):
+    data = os.urandom(4 * CHUNK_SIZE + 100)
+    encrypt_file(write_file(workdir / "a.bin", data), PASSWORD, str(workdir / "a.enc"), chunk_size=CHUNK_SIZE)
+    assert decrypt_range(str(workdir / "a.enc"), PASSWORD, offset, length) == data[offset:offset + length]
+
+
+def test_rekey_rewraps_the_key_without_touching_the_data(workdir):
+    data = os.urandom(2 * CHUNK_SIZE)
+    encrypted = str(workdir / "a.enc")
+    encrypt_file(write_file(workdir / "a.bin", data), PASSWORD, encrypted, chunk_size=CHUNK_SIZE)
+    data_offset, _ = _layout(encrypted)
+    before = read_file(encrypted)
+
+    with pytest.raises(ValueError):
+        rekey(encrypted, "wrong password", "new password")
+    assert read_file(encrypted) == before
+
+    rekey(encrypted, PASSWORD, "new password")
+    after = read_file(encrypted)
+    assert len(after) == len(before) and after[data_offset:] == before[data_offset:]
+    assert decrypt_file(encrypted, PASSWORD, str(workdir / "old")) is None
+    assert read_file(decrypt_file(encrypted, "new password", str(workdir / "new"))) == data
+
+
+def test_session_files_decrypt_on_their_own_with_distinct_keys(workdir):
+    with KeySession(PASSWORD) as session:
+        for name in ("a", "b"):
+            encrypt_file(write_file(workdir / f"{name}.txt", name.encode() * 100), PASSWORD,
+                         str(workdir / f"{name}.enc"), session=session)
+    headers = []
+    for name in ("a", "b"):
+        with open(workdir / f"{name}.enc", "rb") as f:
+            headers.append(container.read_header(f))
+        decrypted = decrypt_file(str(workdir / f"{name}.enc"), PASSWORD, str(workdir / name))
+        assert read_file(decrypted) == name.encode() * 100
+    assert headers[0].salt == headers[1].salt  # One Argon2 run for the batch...
+    assert headers[0].wrapped_key != headers[1].wrapped_key  # ...but a random data key per file
@@ -0,0 +1,54 @@
+from backend.history import HistoryStore
+
+
+def test_events_are_batched_and_queried_newest_first(history):
+    for number in range(1200):  # More than one writer batch
+        history.record("ENCRYPTION", f"file{number}.txt", "SUCCESS", f"/out/file{number}.enc")
+    history.record("DECRYPTION", "file1.txt.enc", "FAILED - Incorrect password")
+
+    assert history.count() == 1201
+    newest = history.recent(2)
+    assert [event.event_type for event in newest] == ["DECRYPTION", "ENCRYPTION"]
+    assert (newest[0].status, newest[0].detail) == ("FAILED", "Incorrect password")
+    assert newest[1].filename == "file1199.txt"
+
+
+def test_filters_and_paging(history):
+    for number in range(30):
+        history.record("ENCRYPTION" if number % 3 else "DECRYPTION", f"report{number}.txt",
+                       "SUCCESS" if number % 5 else "FAILED - bad")
+
+    assert history.count(event_type="DECRYPTION") == 10
+    assert history.count(status="FAILED") == 6
+    assert [event.filename for event in history.query(search="report2")] == [
+        f"report{number}.txt" for number in (29, 28, 27, 26, 25, 24, 23, 22, 21, 20, 2)]
+
+    first = history.query(limit=12)
+    second = history.query(limit=12, before_id=first[-1].id)
+    rest = history.query(limit=12, before_id=second[-1].id)
+    assert len(first) == len(second) == 12 and len(rest) == 6
+    assert len({event.id for event in first + second + rest}) == 30
+    assert history.distinct("event_type") == ["DECRYPTION", "ENCRYPTION"]
+
+
+def test_events_survive_reopening(tmp_path):
+    store = HistoryStore(str(tmp_path / "other.db"), legacy_log=None)
+    store.record("REKEY", "a.enc", "SUCCESS")
+    store.close()
+    reopened = HistoryStore(str(tmp_path / "other.db"), legacy_log=None)
+    assert [event.event_type for event in reopened.recent()] == ["REKEY"]
+
+
+def test_legacy_text_log_is_imported_once(tmp_path):
+    log = tmp_path / "encryption_history.log"
+    log.write_text("[2024-01-02 03:04:05] ENCRYPTION - my - report.txt - SUCCESS - /out/report.enc\n"
+                   "[2024-01-02 03:04:06] DECRYPTION - a.enc - FAILED - Incorrect password - /out/a\n"
+                   "not a log line\n")
+    store = HistoryStore(str(tmp_path / "imported.db"), legacy_log=str(log))
+    events = store.query()
+    assert [(event.filename, event.status, event.detail, event.output_path) for event in events] == [
+        ("a.enc", "FAILED", "Incorrect password", "/out/a"),
+        ("my - report.txt", "SUCCESS", "", "/out/report.enc"),
+    ]
+    assert events[1].timestamp == "2024-01-02 03:04:05"
+    assert HistoryStore(str(tmp_path / "imported.db"), legacy_log=str(log)).count() == 2
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from backend.crypto_utils import CHUNK_SIZE, decrypt_file, encrypt_file
+from backend.incremental import update_encrypted_file
+from conftest import PASSWORD, read_file, write_file
+
+
+@pytest.fixture
+def incremental_file(workdir):
+    data = bytearray(os.urandom(4 * CHUNK_SIZE + 100))
+    source = write_file(workdir / "data.bin", data)
+    encrypted = str(workdir / "data.enc")
+    encrypt_file(source, PASSWORD, encrypted, chunk_size=CHUNK_SIZE, incremental=True)
+    return data, source, encrypted
+
+
+def _decrypted(workdir, encrypted):
+    return read_file(decrypt_file(encrypted, PASSWORD, str(workdir / "out")))
+
+
+def test_update_rewrites_only_changed_chunks(workdir, incremental_file):
+    data, source, encrypted = incremental_file
+    data[CHUNK_SIZE + 7] ^= 0xFF
+    write_file(source, data)
+
+    summary = update_encrypted_file(source, PASSWORD, encrypted)
+    assert summary["rewritten_chunks"] == 1
+    assert summary["rewritten_bytes"] == CHUNK_SIZE
+    assert summary["generation"] == 1
+    assert _decrypted(workdir, encrypted) == data
+
+    data[3 * CHUNK_SIZE] ^= 0xFF
+    write_file(source, data)
+    assert update_encrypted_file(source, PASSWORD, encrypted)["generation"] == 2
+    assert _decrypted(workdir, encrypted) == data
+
+
+def test_unchanged_input_rewrites_nothing(incremental_file):
+    _, source, encrypted = incremental_file
+    assert update_encrypted_file(source, PASSWORD, encrypted)["rewritten_chunks"] == 0
+
+
+@pytest.mark.parametrize("new_size", [2 * CHUNK_SIZE + 1, 6 * CHUNK_SIZE])
+def test_update_follows_size_changes(workdir, incremental_file, new_size):
+    data, source, encrypted = incremental_file
+    data = (bytes(data) + os.urandom(new_size))[:new_size]
+    write_file(source, data)
+    update_encrypted_file(source, PASSWORD, encrypted)
+    assert _decrypted(workdir, encrypted) == data
+
+
+def test_wrong_password_is_a_value_error_and_leaves_the_file(incremental_file):
+    _, source, encrypted = incremental_file
+    before = read_file(encrypted)
+    with pytest.raises(ValueError, match="Incorrect password or corrupted file"):
+        update_encrypted_file(source, "wrong password", encrypted)
+    assert read_file(encrypted) == before
+
+
+def test_plain_files_cannot_be_updated(workdir):
+    source = write_file(workdir / "data.bin", b"x" * 10)
+    encrypt_file(source, PASSWORD, str(workdir / "data.enc"))
+    with pytest.raises(ValueError, match="incremental"):
+        update_encrypted_file(source, PASSWORD, str(workdir / "data.enc"))
@@ -0,0 +1,62 @@
+import io
+import os
+import threading
+import time
+
+from backend.jobs import CANCELLED, SUCCEEDED, JobManager
+from conftest import PASSWORD, write_file
+
+
+def wait_finished(client, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f"/jobs/{job_id}").get_json()
+        if status["status"] not in ("queued", "running"):
+            return status
+        time.sleep(0.02)
+    raise AssertionError("job did not finish")
+
+
+def test_upload_job_round_trip(client):
+    data = os.urandom(100_000)
+    response = client.post("/jobs/encrypt", data={"file": (io.BytesIO(data), "a.bin"), "password": PASSWORD})
+    assert response.status_code == 202
+    assert wait_finished(client, response.get_json()["id"])["status"] == SUCCEEDED
+    encrypted = client.get(f"/jobs/{response.get_json()['id']}/result").get_data()
+
+    response = client.post("/jobs/decrypt", data={"file": (io.BytesIO(encrypted), "a.bin.enc"), "password": PASSWORD})
+    assert wait_finished(client, response.get_json()["id"])["status"] == SUCCEEDED
+    assert client.get(f"/jobs/{response.get_json()['id']}/result").get_data() == data
+
+
+def test_server_paths_are_confined_to_uploads(client, uploads_dir, workdir):
+    secret = write_file(workdir / "secret.txt", b"not for clients")
+    for fields in ({"input_path": secret}, {"input_path": "../secret.txt"}, {"input_path": "/etc/passwd"},
+                   {"input_path": "a.txt", "output_path": str(workdir / "out.enc")},
+                   {"input_path": "a.txt", "output_path": "../out.enc"}):
+        response = client.post("/jobs/encrypt", data={"password": PASSWORD, **fields})
+        assert response.status_code == 400, fields
+    assert not os.path.exists(workdir / "out.enc")
+
+    write_file(uploads_dir / "a.txt", b"inside")
+    response = client.post("/jobs/encrypt", data={"password": PASSWORD, "input_path": "a.txt"})
+    assert response.status_code == 202
+    assert wait_finished(client, response.get_json()["id"])["status"] == SUCCEEDED
+    assert os.path.exists(uploads_dir / "a.txt.enc")
+
+
+def test_cancel_racing_the_start_still_finishes_the_job():
+    manager = JobManager(max_running=1)
+    release = threading.Event()
+    cleaned = []
+    blocker = manager.submit("encrypt", "first", 0, lambda job: release.wait(5) and "done")
+    job = manager.submit("encrypt", "second", 0, lambda job: "never", cleanup=cleaned.append)
+    job.cancel_event.set()  # The pool already holds the job, so future.cancel() would not stop it
+    release.set()
+    blocker.future.result(5)
+    job.future.result(5)
+
+    assert job.status == CANCELLED
+    assert cleaned == [job]
+    assert manager.active_count() == 0
+    manager.shutdown()
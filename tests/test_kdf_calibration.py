@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+from backend import container, kdf_calibration
+from backend.crypto_utils import decrypt_file, default_kdf_params, encrypt_file
+from backend.kdf_calibration import KdfParams
+from backend.verify import verify_file
+from conftest import PASSWORD, write_file
+
+
+def forge_kdf_params(path, **params):
+    """Rewrites the (unauthenticated) key slot of an encrypted file in place."""
+    with open(path, "r+b") as f:
+        header = container.read_header(f)
+        for name, value in params.items():
+            setattr(header, name, value)
+        f.seek(0)
+        f.write(header.pack())
+
+
+@pytest.mark.parametrize("params", [
+    {"memory_cost": 2**32 - 1},
+    {"time_cost": 2**32 - 1},
+    {"parallelism": 255},
+    {"time_cost": 0},
+])
+def test_header_with_unreasonable_kdf_params_is_rejected_before_the_kdf(workdir, params):
+    encrypted = str(workdir / "data.enc")
+    encrypt_file(write_file(workdir / "data.bin", b"payload"), PASSWORD, encrypted)
+    forge_kdf_params(encrypted, **params)
+
+    with open(encrypted, "rb") as f, pytest.raises(ValueError, match="out of range"):
+        container.read_header(f)
+    start = time.perf_counter()
+    assert decrypt_file(encrypted, PASSWORD, str(workdir / "out")) is None
+    report = verify_file(encrypted, PASSWORD)
+    assert time.perf_counter() - start < 5
+    assert report["status"] == "corrupted"
+
+
+def test_new_files_refuse_parameters_readers_would_reject(workdir):
+    with pytest.raises(ValueError):
+        encrypt_file(write_file(workdir / "data.bin", b"x"), PASSWORD, str(workdir / "data.enc"),
+                     kdf_params=KdfParams(container.MAX_KDF_TIME_COST + 1, 8, 1))
+
+
+def test_saved_calibration_is_loaded_by_later_processes(monkeypatch, workdir):
+    monkeypatch.setattr(kdf_calibration, "measure", lambda params: 0.4)  # Already close to the target
+    chosen = kdf_calibration.calibrate_kdf(apply=False, save=True)
+    assert (workdir / kdf_calibration.CALIBRATION_FILE).exists()
+    assert default_kdf_params() != chosen  # Not applied in this process
+
+    monkeypatch.setattr(kdf_calibration, "_loaded", False)  # As if freshly started
+    assert default_kdf_params() == chosen
+
+    encrypted = str(workdir / "data.enc")
+    encrypt_file(write_file(workdir / "data.bin", b"payload"), PASSWORD, encrypted)
+    with open(encrypted, "rb") as f:
+        header = container.read_header(f)
+    assert (header.time_cost, header.memory_cost, header.parallelism) == chosen
+
+
+def test_unusable_saved_calibration_falls_back_to_defaults(workdir):
+    (workdir / kdf_calibration.CALIBRATION_FILE).write_text('{"time_cost": 1000, "memory_cost": 8, "parallelism": 1}')
+    assert kdf_calibration.load_params() is None
+    (workdir / kdf_calibration.CALIBRATION_FILE).write_text("not json")
+    assert kdf_calibration.load_params() is None
@@ -0,0 +1,57 @@
+import threading
+
+from backend.key_cache import KeyCache
+
+SALT = b"s" * 16
+PARAMS = (1, 8, 1)
+
+
+def test_keys_are_cached_per_password_salt_and_params():
+    cache = KeyCache()
+    calls = []
+
+    def derive():
+        calls.append(1)
+        return b"k" * 32
+
+    assert cache.get_or_derive("pw", SALT, PARAMS, derive) == b"k" * 32
+    assert cache.get_or_derive("pw", SALT, PARAMS, derive) == b"k" * 32
+    assert len(calls) == 1
+    assert cache.get("other", SALT, PARAMS) is None
+    assert cache.get("pw", b"t" * 16, PARAMS) is None
+    assert cache.get("pw", SALT, (2, 8, 1)) is None
+
+
+def test_expiry_eviction_and_clear_zero_the_keys():
+    cache = KeyCache(max_entries=2, ttl=-1)
+    cache.put("pw", SALT, PARAMS, b"k" * 32)
+    (_, buffer), = cache._entries.values()
+    assert cache.get("pw", SALT, PARAMS) is None  # Already expired
+    assert buffer == bytearray(32)
+
+    cache = KeyCache(max_entries=2)
+    for number in range(3):
+        cache.put(f"pw{number}", SALT, PARAMS, b"k" * 32)
+    assert len(cache) == 2 and cache.get("pw0", SALT, PARAMS) is None
+    buffers = [key for _, key in cache._entries.values()]
+    cache.clear()
+    assert len(cache) == 0 and all(key == bytearray(32) for key in buffers)
+
+
+def test_concurrent_requests_derive_once():
+    cache = KeyCache()
+    calls = []
+    started = threading.Event()
+
+    def derive():
+        calls.append(1)
+        started.wait(1)
+        return b"k" * 32
+
+    threads = [threading.Thread(target=cache.get_or_derive, args=("pw", SALT, PARAMS, derive)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    started.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
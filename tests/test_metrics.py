@@ -0,0 +1,43 @@
+import os
+
+from backend import metrics
+from backend.crypto_utils import decrypt_file, encrypt_file
+from conftest import PASSWORD, write_file
+
+
+def _stage_series(stage_name):
+    counts, total, count = metrics.STAGE_SECONDS._series.get((stage_name,), [[], 0.0, 0])
+    return list(counts), total, count
+
+
+def test_stage_timings_are_bucketed_in_constant_space():
+    operation = metrics.Operation("test", enabled=True)
+    square = operation.timed("test-square", lambda x: x * x)
+    assert [square(i) for i in range(10_000)][-1] == 9999 ** 2
+    assert list(operation.timed_iter("test-iter", range(10_000)))[-1] == 9999
+
+    stage_counts = operation._stages["test-square"]
+    assert stage_counts.count == 10_000
+    assert len(stage_counts.counts) == len(metrics.STAGE_SECONDS.buckets) + 1
+
+    operation.done(0)
+    counts, total, count = _stage_series("test-square")
+    assert count == sum(counts) == 10_000
+    assert total > 0
+    assert _stage_series("test-iter")[2] == 10_000
+
+
+def test_disabled_operation_leaves_functions_unwrapped():
+    operation = metrics.Operation("test", enabled=False)
+    func = len
+    assert operation.timed("read", func) is func
+
+
+def test_failed_decrypt_is_counted_and_prints_nothing(workdir, capsys, monkeypatch):
+    monkeypatch.setattr(metrics, "_enabled", True)
+    encrypt_file(write_file(workdir / "a.bin", os.urandom(100)), PASSWORD, str(workdir / "a.enc"))
+    before = metrics.OPERATION_ERRORS._values.get(("decrypt",), 0)
+    assert decrypt_file(str(workdir / "a.enc"), "wrong password", str(workdir / "out")) is None
+    assert decrypt_file(str(workdir / "missing.enc"), PASSWORD, str(workdir / "out")) is None
+    assert metrics.OPERATION_ERRORS._values.get(("decrypt",), 0) == before + 2
+    assert capsys.readouterr().out == ""
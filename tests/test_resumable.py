@@ -0,0 +1,41 @@
+import os
+
+from backend.crypto_utils import decrypt_file
+from backend.resumable import MAX_UPLOAD_SIZE
+from conftest import PASSWORD, read_file
+
+
+def test_parts_out_of_order_complete_into_a_decryptable_file(client, workdir):
+    part_size = 64 * 1024
+    data = os.urandom(3 * part_size + 123)
+    response = client.post("/uploads", json={"filename": "a.bin", "password": PASSWORD, "size": len(data),
+                                             "part_size": part_size})
+    assert response.status_code == 201
+    upload = response.get_json()
+    assert upload["part_count"] == 4
+
+    for number in (3, 1, 0):
+        body = data[number * part_size:(number + 1) * part_size]
+        assert client.put(f"/uploads/{upload['id']}/parts/{number}", data=body).status_code == 200
+    assert client.put(f"/uploads/{upload['id']}/parts/1", data=data[part_size:2 * part_size]).status_code == 409
+    assert client.put(f"/uploads/{upload['id']}/parts/2", data=b"short").status_code == 400
+    assert client.post(f"/uploads/{upload['id']}/complete").status_code == 409
+    assert client.get(f"/uploads/{upload['id']}").get_json()["missing_parts"] == [2]
+
+    assert client.put(f"/uploads/{upload['id']}/parts/2", data=data[2 * part_size:3 * part_size]).status_code == 200
+    assert client.post(f"/uploads/{upload['id']}/complete").status_code == 200
+    encrypted = client.get(f"/uploads/{upload['id']}/result").get_data()
+    with open(workdir / "a.enc", "wb") as f:
+        f.write(encrypted)
+    assert read_file(decrypt_file(str(workdir / "a.enc"), PASSWORD, str(workdir / "out"))) == data
+
+
+def test_output_path_is_confined_and_size_is_capped(client, workdir):
+    for output_path in (str(workdir / "escape.enc"), "../escape.enc"):
+        response = client.post("/uploads", json={"filename": "a.bin", "password": PASSWORD, "size": 10,
+                                                 "output_path": output_path})
+        assert response.status_code == 400
+    assert not os.path.exists(workdir / "escape.enc.upload")
+
+    response = client.post("/uploads", json={"filename": "a.bin", "password": PASSWORD, "size": MAX_UPLOAD_SIZE + 1})
+    assert response.status_code == 400
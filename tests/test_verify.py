@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from backend import container
+from backend.crypto_utils import CHUNK_SIZE, encrypt_file
+from backend.verify import (STATUS_CORRUPTED, STATUS_OK, STATUS_UNREADABLE, STATUS_WRONG_PASSWORD, inspect_file,
+                            verify_file, verify_stream)
+from conftest import PASSWORD, encrypt_legacy, flip_byte, write_file
+
+
+@pytest.fixture
+def encrypted(workdir):
+    path = str(workdir / "a.enc")
+    encrypt_file(write_file(workdir / "a.txt", os.urandom(4 * CHUNK_SIZE + 1)), PASSWORD, path,
+                 chunk_size=CHUNK_SIZE)
+    return path
+
+
+def test_intact_file_verifies_and_is_logged(encrypted, history):
+    report = verify_file(encrypted, PASSWORD)
+    assert (report["status"], report["chunks"], report["verified_bytes"]) == (STATUS_OK, 5, 4 * CHUNK_SIZE + 1)
+    assert [(event.event_type, event.status) for event in history.recent()] == [("VERIFY", "SUCCESS")]
+    verify_file(encrypted, PASSWORD, log=False)
+    assert history.count() == 1
+
+
+def test_every_damaged_chunk_is_listed(encrypted):
+    with open(encrypted, "rb") as f:
+        data_offset = len(container.read_header(f).pack())
+    for number in (1, 3):
+        flip_byte(encrypted, data_offset + number * (CHUNK_SIZE + 16) + 5)
+    report = verify_file(encrypted, PASSWORD)
+    assert report["status"] == STATUS_CORRUPTED
+    assert report["failed_chunks"] == [1, 3]
+    assert report["verified_bytes"] == 2 * CHUNK_SIZE + 1
+
+
+def test_wrong_password_and_truncation(encrypted):
+    assert verify_file(encrypted, "wrong password")["status"] == STATUS_WRONG_PASSWORD
+    with open(encrypted, "r+b") as f:
+        f.truncate(os.path.getsize(encrypted) - 5)
+    assert verify_file(encrypted, PASSWORD)["status"] == STATUS_CORRUPTED
+
+
+def test_legacy_files_verify(workdir):
+    encrypt_legacy(write_file(workdir / "old.txt", os.urandom(CHUNK_SIZE + 3)), PASSWORD, str(workdir / "old.enc"))
+    assert verify_file(str(workdir / "old.enc"), PASSWORD)["status"] == STATUS_OK
+    assert verify_file(str(workdir / "old.enc"), "wrong password")["status"] == STATUS_UNREADABLE
+
+
+def test_verify_stream(encrypted):
+    with open(encrypted, "rb") as f:
+        assert verify_stream(f, PASSWORD)["status"] == STATUS_OK
+    with open(encrypted, "rb") as f:
+        assert verify_stream(f, "wrong password")["status"] == STATUS_UNREADABLE
+
+
+def test_inspect_reads_only_the_header(encrypted):
+    info = inspect_file(encrypted)
+    assert info["format_version"] == 2
+    assert info["chunk_size"] == CHUNK_SIZE
+    assert info["extension"] == ".txt"
+    assert info["cipher"] == "aes-256-gcm"
+    assert info["data_bytes"] == 4 * CHUNK_SIZE + 1 + 5 * 16
+    assert info["kdf"]["time_cost"] >= 1